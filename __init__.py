@@ -110,6 +110,23 @@ JWT_TOKEN_NAME = os.environ.get("JWT_TOKEN_NAME") or "jwt_python_flask"
 app.config["SECRET_KEY"] = SECRET_KEY
 app.config["SESSION_COOKIE_NAME"] = SESSION_COOKIE_NAME
 app.config["JWT_TOKEN_NAME"] = JWT_TOKEN_NAME
+# Per-worker cache of verified tokens and user rows for the auth decorators (seconds, 0 disables)
+app.config["AUTH_CACHE_TTL"] = float(os.environ.get("AUTH_CACHE_TTL") or 60)
+app.config["AUTH_CACHE_MAX_ENTRIES"] = int(os.environ.get("AUTH_CACHE_MAX_ENTRIES") or 2048)
+# Robop login: short-lived access token (claims: id, uid, role) + rotating refresh token (seconds)
+app.config["ROBOP_ACCESS_TOKEN_TTL"] = int(os.environ.get("ROBOP_ACCESS_TOKEN_TTL") or 15 * 60)
+app.config["ROBOP_REFRESH_TOKEN_TTL"] = int(os.environ.get("ROBOP_REFRESH_TOKEN_TTL") or 12 * 60 * 60)
+# Single-use refresh tokens and logout revocation (RobopRevokedTokens table)
+app.config["ROBOP_TOKEN_REVOCATION"] = str(os.environ.get("ROBOP_TOKEN_REVOCATION", "1")).strip().lower() in {"1", "true", "yes", "y", "on"}
+# UserBadge keeps the best badge per module; also append every submitted badge to UserBadgeLog
+app.config["ROBOP_BADGE_LOG"] = str(os.environ.get("ROBOP_BADGE_LOG", "1")).strip().lower() in {"1", "true", "yes", "y", "on"}
+
+# Password hashing (see model/passwords.py): werkzeug method string with cost (default: werkzeug's
+# own, scrypt:32768:8:1), salt length, and worker processes that do the hashing off the request
+# thread (0 = inline; each worker is a forked process per gunicorn worker, so opt in)
+app.config["PASSWORD_HASH_METHOD"] = os.environ.get("PASSWORD_HASH_METHOD") or "scrypt"
+app.config["PASSWORD_SALT_LENGTH"] = int(os.environ.get("PASSWORD_SALT_LENGTH") or 16)
+app.config["PASSWORD_HASH_WORKERS"] = int(os.environ.get("PASSWORD_HASH_WORKERS") or 0)
 
 # In local dev over http, Secure cookies are not sent. Enable Secure+SameSite=None only in prod.
 _env_is_production = str(os.environ.get("IS_PRODUCTION", "")).strip().lower() in {
@@ -163,8 +180,39 @@ app.config["SQLALCHEMY_DATABASE_URI"] = dbURI
 app.config["SQLALCHEMY_BACKUP_URI"] = backupURI
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
+# -------------------------
+# Database engine profile (see api/db_tuning.py)
+# -------------------------
+# MySQL connection pool, per worker process
+app.config["DB_POOL_SIZE"] = int(os.environ.get("DB_POOL_SIZE") or 10)
+app.config["DB_MAX_OVERFLOW"] = int(os.environ.get("DB_MAX_OVERFLOW") or 20)
+app.config["DB_POOL_TIMEOUT"] = float(os.environ.get("DB_POOL_TIMEOUT") or 10)
+# Recycle before MySQL's wait_timeout / proxy idle cutoffs drop the connection (seconds)
+app.config["DB_POOL_RECYCLE"] = int(os.environ.get("DB_POOL_RECYCLE") or 280)
+app.config["DB_POOL_PRE_PING"] = (os.environ.get("DB_POOL_PRE_PING") or "true").lower() in ("1", "true", "yes", "on")
+# SQLite PRAGMAs applied to every connection
+app.config["SQLITE_JOURNAL_MODE"] = os.environ.get("SQLITE_JOURNAL_MODE") or "WAL"
+app.config["SQLITE_SYNCHRONOUS"] = os.environ.get("SQLITE_SYNCHRONOUS") or "NORMAL"
+app.config["SQLITE_BUSY_TIMEOUT_MS"] = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS") or 5000)
+app.config["SQLITE_CACHE_SIZE_KB"] = int(os.environ.get("SQLITE_CACHE_SIZE_KB") or 20000)
+app.config["SQLITE_MMAP_SIZE"] = int(os.environ.get("SQLITE_MMAP_SIZE") or 256 * 1024 * 1024)
+
+from api.db_tuning import engine_options, init_db_tuning
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config)
+
 db = SQLAlchemy(app)
-migrate = Migrate(app, db)
+init_db_tuning(app, db)
+# Absolute, so `flask db` and the boot-time upgrade work from any working directory
+migrate = Migrate(app, db, directory=os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations"))
+
+# -------------------------
+# Startup seeding (see model/seeding.py)
+# -------------------------
+# Run out-of-date schema/seed steps at boot, in whichever worker takes the lock first;
+# 0 only logs them, leaving `flask custom seed` to apply them
+app.config["DB_SEED_ON_BOOT"] = (os.environ.get("DB_SEED_ON_BOOT") or "true").lower() in ("1", "true", "yes", "on")
+# How long other workers wait for the seeding worker (seconds)
+app.config["DB_SEED_LOCK_TIMEOUT"] = int(os.environ.get("DB_SEED_LOCK_TIMEOUT") or 300)
 
 # -------------------------
 # Image upload settings
@@ -178,6 +226,13 @@ os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
 app.config["DATA_FOLDER"] = os.path.join(app.instance_path, "data")
 os.makedirs(app.config["DATA_FOLDER"], exist_ok=True)
 
+# -------------------------
+# Study tracker settings
+# -------------------------
+# Per-worker cache of /api/study/stats results (seconds, 0 disables); writes evict it
+app.config["STUDY_STATS_CACHE_TTL"] = float(os.environ.get("STUDY_STATS_CACHE_TTL") or 30)
+app.config["STUDY_STATS_CACHE_MAX_ENTRIES"] = int(os.environ.get("STUDY_STATS_CACHE_MAX_ENTRIES") or 1024)
+
 # -------------------------
 # GITHUB settings
 # -------------------------
@@ -190,6 +245,8 @@ app.config["GITHUB_TARGET_NAME"] = os.environ.get("GITHUB_TARGET_NAME") or "open
 # OpenAI (ChatGPT) settings
 # -------------------------
 app.config["OPENAI_SERVER"] = os.environ.get("OPENAI_SERVER") or "https://api.openai.com/v1/chat/completions"
+# Image generation endpoint (api/endgame_api.py); unset uses api.openai.com
+app.config["OPENAI_IMAGE_SERVER"] = os.environ.get("OPENAI_IMAGE_SERVER") or None
 app.config["OPENAI_API_KEY"] = os.environ.get("OPENAI_API_KEY") or None
 app.config["OPENAI_MODEL"] = os.environ.get("OPENAI_MODEL") or "gpt-4o-mini"
 
@@ -200,6 +257,10 @@ app.config["PIKA_SERVER"] = os.environ.get("PIKA_SERVER") or None
 app.config["PIKA_API_KEY"] = os.environ.get("PIKA_API_KEY") or None
 app.config["PIKA_STATUS_SERVER"] = os.environ.get("PIKA_STATUS_SERVER") or None
 app.config["PIKA_MODEL"] = os.environ.get("PIKA_MODEL") or None
+# Background polling of Pika status URLs (seconds)
+app.config["PIKA_POLL_INITIAL"] = float(os.environ.get("PIKA_POLL_INITIAL") or 1.5)
+app.config["PIKA_POLL_MAX"] = float(os.environ.get("PIKA_POLL_MAX") or 30)
+app.config["PIKA_JOB_TIMEOUT"] = float(os.environ.get("PIKA_JOB_TIMEOUT") or 600)
 
 # -------------------------
 # Endgame settings
@@ -214,6 +275,74 @@ app.config["FINAL_CODE_ANSWER"] = os.environ.get("FINAL_CODE_ANSWER") or (
     "If an action is unknown, handle it safely. "
     "When the loop ends, output the final result."
 )
+# Most final-answer verdicts kept in the GradeCache table (least recently used evicted)
+app.config["GRADE_CACHE_MAX_ENTRIES"] = int(os.environ.get("GRADE_CACHE_MAX_ENTRIES") or 5000)
+
+# -------------------------
+# Upstream AI provider guards (see api/upstream.py)
+# -------------------------
+# Overall time a request may spend waiting on AI providers (seconds)
+app.config["AI_LATENCY_BUDGET"] = float(os.environ.get("AI_LATENCY_BUDGET") or 15)
+# Circuit breaker: rolling window, trip thresholds, and cooldown before a trial call
+app.config["AI_BREAKER_WINDOW"] = float(os.environ.get("AI_BREAKER_WINDOW") or 60)
+app.config["AI_BREAKER_MIN_CALLS"] = int(os.environ.get("AI_BREAKER_MIN_CALLS") or 5)
+app.config["AI_BREAKER_ERROR_RATE"] = float(os.environ.get("AI_BREAKER_ERROR_RATE") or 0.5)
+app.config["AI_BREAKER_SLOW_SECONDS"] = float(os.environ.get("AI_BREAKER_SLOW_SECONDS") or 8)
+app.config["AI_BREAKER_SLOW_RATE"] = float(os.environ.get("AI_BREAKER_SLOW_RATE") or 0.5)
+app.config["AI_BREAKER_COOLDOWN"] = float(os.environ.get("AI_BREAKER_COOLDOWN") or 30)
+# Concurrency gate: calls in flight per provider, callers allowed to queue, and max queue wait (seconds)
+app.config["AI_MAX_IN_FLIGHT"] = int(os.environ.get("AI_MAX_IN_FLIGHT") or 8)
+app.config["AI_MAX_QUEUE"] = int(os.environ.get("AI_MAX_QUEUE") or 16)
+app.config["AI_QUEUE_TIMEOUT"] = float(os.environ.get("AI_QUEUE_TIMEOUT") or 5)
+# Per-provider tier overrides, e.g. AI_MAX_IN_FLIGHT_DEEPSEEK=4
+app.config["AI_PROVIDER_MAX_IN_FLIGHT"] = {
+    provider: int(os.environ[f"AI_MAX_IN_FLIGHT_{provider.upper()}"])
+    for provider in ("openai", "deepseek", "groq", "pika")
+    if os.environ.get(f"AI_MAX_IN_FLIGHT_{provider.upper()}")
+}
+
+# -------------------------
+# Rate limits for AI and code-execution routes (see api/rate_limit.py)
+# -------------------------
+app.config["RATE_LIMIT_ENABLED"] = str(os.environ.get("RATE_LIMIT_ENABLED", "1")).strip().lower() in {"1", "true", "yes", "y", "on"}
+# Use X-Real-IP / X-Forwarded-For for the client address (only behind a trusted proxy such as nginx)
+app.config["RATE_LIMIT_TRUST_PROXY"] = str(
+    os.environ.get("RATE_LIMIT_TRUST_PROXY", "1" if _env_is_production else "0")
+).strip().lower() in {"1", "true", "yes", "y", "on"}
+# "N/unit": bucket of N tokens refilled N per unit; override with e.g. RATE_LIMIT_AI_CHAT=20/minute
+_default_rate_limits = {
+    "ai_chat": "12/minute",
+    "ai_hints": "20/minute",
+    "chatgpt": "12/minute",
+    "groq": "12/minute",
+    "run_code": "30/minute",
+    "endgame_guidance": "6/minute",
+    "endgame_final_check": "20/minute",
+}
+app.config["RATE_LIMITS"] = {
+    group: os.environ.get(f"RATE_LIMIT_{group.upper()}") or spec
+    for group, spec in _default_rate_limits.items()
+}
+
+# -------------------------
+# AI chat history (see model/conversation.py)
+# -------------------------
+app.config["CHAT_HISTORY_TTL"] = int(os.environ.get("CHAT_HISTORY_TTL") or 6 * 60 * 60)  # seconds idle before expiry
+app.config["CHAT_HISTORY_MAX_TURNS"] = int(os.environ.get("CHAT_HISTORY_MAX_TURNS") or 12)  # kept verbatim
+app.config["CHAT_SUMMARY_MAX_CHARS"] = int(os.environ.get("CHAT_SUMMARY_MAX_CHARS") or 1500)
+app.config["CHAT_MESSAGE_MAX_CHARS"] = int(os.environ.get("CHAT_MESSAGE_MAX_CHARS") or 4000)
+app.config["CHAT_MAX_CONVERSATIONS"] = int(os.environ.get("CHAT_MAX_CONVERSATIONS") or 5000)
+
+# -------------------------
+# Logging (see api/logging_setup.py)
+# -------------------------
+app.config["LOG_LEVEL"] = (os.environ.get("LOG_LEVEL") or "INFO").upper()
+# Per-module levels, e.g. "api.upstream=DEBUG,werkzeug=WARNING"
+app.config["LOG_LEVELS"] = os.environ.get("LOG_LEVELS") or ""
+app.config["LOG_FORMAT"] = os.environ.get("LOG_FORMAT") or ("json" if app.config["IS_PRODUCTION"] else "text")
+# Fraction of requests whose DEBUG records are kept (1 keeps all)
+app.config["LOG_DEBUG_SAMPLE"] = float(os.environ.get("LOG_DEBUG_SAMPLE") or 1)
+app.config["LOG_QUEUE_SIZE"] = int(os.environ.get("LOG_QUEUE_SIZE") or 10000)
 
 # -------------------------
 # KASM settings
@@ -226,65 +355,10 @@ app.config["KASM_API_KEY_SECRET"] = os.environ.get("KASM_API_KEY_SECRET") or Non
 # GROQ settings
 # -------------------------
 app.config["GROQ_API_KEY"] = os.environ.get("GROQ_API_KEY") or None
+app.config["GROQ_SERVER"] = os.environ.get("GROQ_SERVER") or "https://api.groq.com/openai/v1/chat/completions"
 
+# -------------------------
+# DEEPSEEK settings
+# -------------------------
+app.config["DEEPSEEK_SERVER"] = os.environ.get("DEEPSEEK_SERVER") or "https://api.deepseek.com/v1/chat/completions"
 
-# ============================================================
-# ✅ PSEUDOCODE BANKS: register models + create tables + seed
-# ============================================================
-# WHY THIS IS NEEDED:
-# - SQLAlchemy only creates tables for models it has imported
-# - so we import the model modules, then run db.create_all()
-# - then seed question bank first, answer bank second
-
-def init_app_db_and_seed():
-    """
-    Call once at import/startup.
-    Creates tables and seeds pseudocode question+answer banks.
-    """
-    with app.app_context():
-        # Import models so SQLAlchemy "registers" them
-        try:
-            from model.pseudocode_bank import initPseudocodeQuestionBank  # noqa: F401
-        except Exception as e:
-            print("⚠️ Could not import model.pseudocode_bank:", e)
-            initPseudocodeQuestionBank = None
-
-        try:
-            # IMPORTANT: adjust import if your filename is different
-            # If your model file is model/pseudocodeanswer_bank.py this is correct:
-            from model.pseudocodeanswer_bank import initPseudocodeAnswerBank  # noqa: F401
-        except Exception as e:
-            print("⚠️ Could not import model.pseudocodeanswer_bank:", e)
-            initPseudocodeAnswerBank = None
-
-        # Create all tables for all imported models
-        try:
-            db.create_all()
-        except Exception as e:
-            print("❌ db.create_all() failed:", e)
-
-        # Seed question bank
-        if initPseudocodeQuestionBank:
-            try:
-                initPseudocodeQuestionBank(force_recreate=False)
-            except Exception as e:
-                print("⚠️ initPseudocodeQuestionBank failed:", e)
-
-        # Seed answer bank
-        if initPseudocodeAnswerBank:
-            try:
-                initPseudocodeAnswerBank(force_recreate=False)
-            except Exception as e:
-                print("⚠️ initPseudocodeAnswerBank failed:", e)
-
-        # Print tables to confirm
-        try:
-            from sqlalchemy import inspect
-            print("✅ DB URI:", app.config.get("SQLALCHEMY_DATABASE_URI"))
-            print("✅ Tables:", inspect(db.engine).get_table_names())
-        except Exception as e:
-            print("⚠️ Could not list tables:", e)
-
-
-# Run once on startup
-init_app_db_and_seed()
\ No newline at end of file
@@ -5,12 +5,14 @@ from datetime import datetime
 from api.jwt_authorize import token_required
 from model.github import GitHubUser, GitHubOrg
 from model.user import User
+import logging
 import time
 
 
 
 analytics_api = Blueprint('analytics_api', __name__, url_prefix='/api/analytics')
 api = Api(analytics_api)
+logger = logging.getLogger(__name__)
 
 
 
@@ -294,7 +296,7 @@ class AdminUserCommits(Resource):
         if remaining == 0:
             # If no requests remaining, calculate the time to wait
             wait_time = reset_time - time.time()
-            print(f"Rate limit exceeded. Waiting for {wait_time} seconds.")
+            logger.warning("GitHub rate limit exceeded. Waiting for %.0f seconds.", wait_time)
             time.sleep(wait_time + 5)  # Adding a buffer time to avoid immediate retry
             return True
         return False
@@ -308,7 +310,7 @@ class AdminUserCommits(Resource):
                 response = github_user_resource.get_commit_stats(user_uid, start_date, end_date)
 
                 if response.status_code == 500:
-                    print(f"Attempt {attempt + 1}: Server error, retrying...")
+                    logger.warning("Attempt %d: GitHub server error, retrying...", attempt + 1)
                     time.sleep(5 * (2 ** attempt))  # Exponential backoff
                 elif response.status_code == 403:
                     if self.check_rate_limit(response):
@@ -316,7 +318,7 @@ class AdminUserCommits(Resource):
                 else:
                     return response.json()  # Successfully processed the request
             except Exception as e:
-                print(f"Error occurred: {e}")
+                logger.warning("GitHub commit stats error: %s", e)
             attempt += 1
         return None  # If retries are exhausted
 
@@ -0,0 +1,139 @@
+# api/auth_cache.py
+"""
+Per-process caches for the auth decorators, so a guarded request does not
+decode the JWT and re-select the user row every time.
+
+- verify_token(): token -> decoded payload, kept until AUTH_CACHE_TTL or the
+  token's own "exp", whichever comes first.
+- cached_user(): (model, uid) -> user row. The row is kept detached and merged
+  into the request's session with load=False, which issues no SELECT.
+
+Rows are evicted when an ORM flush updates or deletes them (or their
+section/persona links). Each gunicorn worker has its own cache, so a change
+made in another worker - or by a bulk Query.update() - is seen at most
+AUTH_CACHE_TTL seconds later.
+"""
+from collections import OrderedDict
+import logging
+import threading
+import time
+
+import jwt
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from __init__ import app, db
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """Small thread-safe LRU map whose entries also expire."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def discard_where(self, predicate):
+        with self._lock:
+            for key in [k for k, (v, _) in self._data.items() if predicate(k, v)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+def _ttl() -> float:
+    return float(app.config.get("AUTH_CACHE_TTL") or 0)
+
+
+_max_entries = int(app.config.get("AUTH_CACHE_MAX_ENTRIES") or 2048)
+_tokens = TTLCache(_max_entries)
+_users = TTLCache(_max_entries)
+
+
+def verify_token(token: str) -> dict:
+    """jwt.decode() with the app secret, memoized for valid tokens. Raises jwt errors as before."""
+    payload = _tokens.get(token)
+    if payload is not None:
+        return payload
+
+    payload = jwt.decode(token, app.config["SECRET_KEY"], algorithms=["HS256"])
+    ttl = _ttl()
+    if "exp" in payload:
+        ttl = min(ttl, payload["exp"] - time.time())
+    _tokens.set(token, payload, ttl)
+    return payload
+
+
+def cached_user(model, uid):
+    """
+    The `model` row with this uid, attached to the current session, or None.
+    Cache hits cost no query; lazy relationships still load on first access.
+    """
+    key = (model.__name__, uid)
+    row = _users.get(key)
+    if row is None:
+        row = model.query.filter_by(_uid=uid).first()
+        if row is None:
+            return None
+        if _ttl() <= 0:
+            return row
+        # Keep a detached, fully loaded copy; the session gets its own merged instance
+        db.session.expunge(row)
+        _users.set(key, row, _ttl())
+        logger.debug("auth cache miss: %s uid=%s", model.__name__, uid)
+    return db.session.merge(row, load=False)
+
+
+def invalidate_user(model, user_id):
+    """Drop every cached `model` row with this primary key."""
+    _evict(model.__name__, user_id)
+
+
+def _evict(model_name, user_id):
+    _users.discard_where(lambda key, row: key[0] == model_name and row.id == user_id)
+
+
+def clear():
+    _tokens.clear()
+    _users.clear()
+
+
+# Association rows whose changes alter what the cached user carries: class name -> user model name
+_USER_LINKS = {"UserSection": "User", "UserPersona": "User"}
+
+
+@event.listens_for(Session, "after_flush")
+def _evict_changed_users(session, flush_context):
+    for obj in list(session.dirty) + list(session.deleted):
+        name = type(obj).__name__
+        if name in ("User", "RobopUser"):
+            _evict(name, obj.id)
+    for obj in list(session.new) + list(session.deleted):
+        owner = _USER_LINKS.get(type(obj).__name__)
+        if owner and getattr(obj, "user_id", None) is not None:
+            _evict(owner, obj.user_id)
@@ -2,7 +2,8 @@ from flask import request, current_app, g
 from flask_login import current_user
 from functools import wraps
 import jwt
-from model.robop_user import RobopUser  
+from model.robop_user import RobopUser
+from api import auth_cache
 
 
 def _get_token_from_request():
@@ -51,11 +52,7 @@ def auth_required(roles=None):
                     }, 401
 
                 try:
-                    data = jwt.decode(
-                        token,
-                        current_app.config["SECRET_KEY"],
-                        algorithms=["HS256"]
-                    )
+                    data = auth_cache.verify_token(token)
 
                     uid = data.get("_uid")
                     if not uid:
@@ -65,7 +62,7 @@ def auth_required(roles=None):
                             "error": "Unauthorized"
                         }, 401
 
-                    user = RobopUser.query.filter_by(_uid=uid).first()
+                    user = auth_cache.cached_user(RobopUser, uid)
                     if user is None:
                         return {
                             "message": "Invalid Authentication token!",
@@ -1,7 +1,10 @@
 from jinja2 import Template
+import logging
 import os
 from model.robop_user import RobopUser, UserBadge
 
+logger = logging.getLogger(__name__)
+
 def generate_jinja_backup():
     """Uses Jinja2 to create a JSON file that can be used for full recovery."""
     try:
@@ -41,5 +44,5 @@ def generate_jinja_backup():
             f.write(rendered_json)
         return True
     except Exception as e:
-        print(f"Jinja2 Error: {e}")
+        logger.exception("Jinja2 backup failed: %s", e)
         return False
\ No newline at end of file
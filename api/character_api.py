@@ -1,11 +1,13 @@
 from flask import Blueprint, request, jsonify, session
 from model.robop_user import RobopUser
 from __init__ import db
+import logging
 import time
 import random
 
 # Create Blueprint
 character_api = Blueprint('character_api', __name__, url_prefix='/api')
+logger = logging.getLogger(__name__)
 
 # -------------------------
 # UPDATE CHARACTER ROUTE
@@ -36,32 +38,30 @@ def update_character():
     if not uid:
         uid = f"player_{int(time.time())}_{random.randint(1000, 9999)}"
         session["robop_uid"] = uid
-        print(f"Created new session with UID: {uid}")
+        logger.debug("Created new session with UID: %s", uid)
 
     # 🧠 PROCESS - Get or create user
     user = RobopUser.query.filter_by(_uid=uid).first()
     if not user:
-        # Create new user with character info
+        # Create new guest user with character info (no password: guests never log in)
         user = RobopUser(
             uid=uid,
             first_name=character_name,
-            last_name=character_class,
-            password="temporary_password"
+            last_name=character_class
         )
         db.session.add(user)
-        print(f"Created new user: {uid}")
+        logger.info("Created new character user: %s", uid)
     else:
         # Update existing user
         user.first_name = character_name
         user.last_name = character_class
-        print(f"Updated existing user: {uid}")
+        logger.debug("Updated existing user: %s", uid)
 
     try:
         db.session.commit()
-        print(f"Database committed successfully for {uid}")
     except Exception as e:
         db.session.rollback()
-        print(f"Database error: {str(e)}")
+        logger.exception("Saving character for %s failed", uid)
         return jsonify({
             "success": False,
             "error": f"Database error: {str(e)}"
@@ -0,0 +1,186 @@
+# api/db_tuning.py
+"""
+Engine profile for the app database.
+
+engine_options() turns the DB_* / SQLITE_* settings in __init__.py into
+SQLALCHEMY_ENGINE_OPTIONS:
+  MySQL   pool_size, max_overflow, pool_timeout, pool_recycle, pool_pre_ping
+  SQLite  the driver's lock wait (timeout)
+
+init_db_tuning() then hooks the engine:
+  - every new SQLite connection runs the configured PRAGMAs (WAL journal,
+    synchronous, busy_timeout, cache_size, mmap_size), so readers no longer
+    wait behind a writer and a busy writer is retried instead of failing
+    with "database is locked";
+  - pool events feed per-process metrics (connections, checkouts, in use,
+    how long connections are held, lock errors), reported by db_stats().
+"""
+import threading
+import time
+
+from sqlalchemy import event
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured database URI."""
+    uri = config.get("SQLALCHEMY_DATABASE_URI") or ""
+    if uri.startswith("sqlite"):
+        return {"connect_args": {"timeout": int(config["SQLITE_BUSY_TIMEOUT_MS"]) / 1000}}
+    return {
+        "pool_size": int(config["DB_POOL_SIZE"]),
+        "max_overflow": int(config["DB_MAX_OVERFLOW"]),
+        "pool_timeout": float(config["DB_POOL_TIMEOUT"]),
+        "pool_recycle": int(config["DB_POOL_RECYCLE"]),
+        "pool_pre_ping": bool(config["DB_POOL_PRE_PING"]),
+    }
+
+
+def sqlite_pragmas(config):
+    """PRAGMA name -> value run on each new SQLite connection, in order."""
+    return {
+        "journal_mode": config["SQLITE_JOURNAL_MODE"],
+        "synchronous": config["SQLITE_SYNCHRONOUS"],
+        "busy_timeout": int(config["SQLITE_BUSY_TIMEOUT_MS"]),
+        # Negative cache_size is in KiB rather than pages
+        "cache_size": -int(config["SQLITE_CACHE_SIZE_KB"]),
+        "mmap_size": int(config["SQLITE_MMAP_SIZE"]),
+    }
+
+
+class PoolMetrics:
+    """Counters fed by pool events. One per process; gunicorn workers report separately."""
+
+    HOLD_BUCKETS = (0.005, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.invalidated = 0
+        self.lock_errors = 0
+        self.in_use = 0
+        self.peak_in_use = 0
+        self._hold_counts = [0] * (len(self.HOLD_BUCKETS) + 1)
+        self._hold_sum = 0.0
+
+    def on_connect(self):
+        with self._lock:
+            self.connects += 1
+
+    def on_checkout(self):
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+
+    def on_checkin(self, held):
+        with self._lock:
+            self.in_use = max(0, self.in_use - 1)
+            if held is None:
+                return
+            self._hold_sum += held
+            for i, bound in enumerate(self.HOLD_BUCKETS):
+                if held <= bound:
+                    self._hold_counts[i] += 1
+                    break
+            else:
+                self._hold_counts[-1] += 1
+
+    def on_invalidate(self):
+        with self._lock:
+            self.invalidated += 1
+
+    def on_lock_error(self):
+        with self._lock:
+            self.lock_errors += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            # Cumulative buckets, Prometheus style: count of holds <= bound
+            buckets, running = {}, 0
+            for bound, count in zip(list(self.HOLD_BUCKETS) + ["+Inf"], self._hold_counts):
+                running += count
+                buckets[str(bound)] = running
+            return {
+                "connections_opened": self.connects,
+                "checkouts": self.checkouts,
+                "in_use": self.in_use,
+                "peak_in_use": self.peak_in_use,
+                "invalidated": self.invalidated,
+                "lock_errors": self.lock_errors,
+                "hold_seconds": {
+                    "buckets": buckets,
+                    "count": running,
+                    "sum": round(self._hold_sum, 3),
+                },
+            }
+
+
+metrics = PoolMetrics()
+_engine = None
+
+
+def init_db_tuning(app, db):
+    """Attach PRAGMAs and metrics to the app engine. Call before anything connects."""
+    global _engine
+    with app.app_context():
+        engine = db.engine
+    if _engine is engine:
+        return
+    _engine = engine
+    pragmas = sqlite_pragmas(app.config) if engine.dialect.name == "sqlite" else {}
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        metrics.on_connect()
+        if pragmas:
+            cursor = dbapi_connection.cursor()
+            try:
+                for name, value in pragmas.items():
+                    cursor.execute(f"PRAGMA {name}={value}")
+            finally:
+                cursor.close()
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checked_out_at"] = time.monotonic()
+        metrics.on_checkout()
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        started = connection_record.info.pop("checked_out_at", None)
+        metrics.on_checkin(time.monotonic() - started if started is not None else None)
+
+    @event.listens_for(engine, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        metrics.on_invalidate()
+
+    @event.listens_for(engine, "handle_error")
+    def _on_error(context):
+        if "database is locked" in str(context.original_exception):
+            metrics.on_lock_error()
+
+
+def db_stats() -> dict:
+    """Pool configuration and state, event metrics, and (SQLite) the PRAGMAs in effect."""
+    if _engine is None:
+        return {"configured": False}
+    pool = _engine.pool
+    stats = {
+        "dialect": _engine.dialect.name,
+        "pool": {
+            "class": type(pool).__name__,
+            "status": pool.status(),
+        },
+        "metrics": metrics.snapshot(),
+    }
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        if hasattr(pool, name):
+            stats["pool"][name] = getattr(pool, name)()
+    if _engine.dialect.name == "sqlite":
+        with _engine.connect() as connection:
+            stats["pragmas"] = {
+                name: connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+                for name in ("journal_mode", "synchronous", "busy_timeout", "cache_size", "mmap_size")
+            }
+    return stats
@@ -1,14 +1,20 @@
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
 from datetime import datetime
+from difflib import SequenceMatcher
+from functools import lru_cache
+import hashlib
 import json
 import re
-import time
 from urllib.parse import quote
 
 import requests
 from flask import Blueprint, jsonify, request, current_app
 
 from __init__ import db
-from model.endgame import Player, Badge, PlayerBadge
+from model.endgame import Player, Badge, PlayerBadge, GradeCache, LeaderboardEntry
+from model.conversation import Conversation
+from api.video_api import submit_video_job
+from api import upstream
 
 endgame_api = Blueprint("endgame_api", __name__)
 
@@ -17,6 +23,10 @@ def _get_json():
     return request.get_json(silent=True) or {}
 
 
+def _request_budget():
+    return upstream.Deadline(current_app.config.get("AI_LATENCY_BUDGET") or 15)
+
+
 def _normalize_answer(answer: str) -> str:
     if not answer:
         return ""
@@ -68,7 +78,7 @@ def _strip_code_blocks(text: str) -> str:
     return " ".join(text.split())
 
 
-def _call_openai(prompt: str, text: str, strip_code_blocks: bool = True) -> str:
+def _call_openai(prompt: str, text: str, strip_code_blocks: bool = True, budget=None) -> str:
     api_key = current_app.config.get("OPENAI_API_KEY")
     model = current_app.config.get("OPENAI_MODEL") or "gpt-4o-mini"
     server = current_app.config.get("OPENAI_SERVER") or "https://api.openai.com/v1/chat/completions"
@@ -85,14 +95,16 @@ def _call_openai(prompt: str, text: str, strip_code_blocks: bool = True) -> str:
     }
 
     try:
-        response = requests.post(
+        response = upstream.post(
+            "openai",
             server,
             headers={
                 "Content-Type": "application/json",
                 "Authorization": f"Bearer {api_key}"
             },
             json=payload,
-            timeout=20
+            timeout=20,
+            budget=budget
         )
         if response.status_code != 200:
             return ""
@@ -105,81 +117,6 @@ def _call_openai(prompt: str, text: str, strip_code_blocks: bool = True) -> str:
         return ""
 
 
-def _find_video_url(payload):
-    if isinstance(payload, str) and payload.startswith("http") and re.search(r"\.(mp4|mov|webm)(\?|$)", payload):
-        return payload
-    if isinstance(payload, dict):
-        for value in payload.values():
-            found = _find_video_url(value)
-            if found:
-                return found
-    if isinstance(payload, list):
-        for item in payload:
-            found = _find_video_url(item)
-            if found:
-                return found
-    return ""
-
-
-def _call_pika_video(prompt: str) -> dict:
-    api_key = current_app.config.get("PIKA_API_KEY")
-    server = current_app.config.get("PIKA_SERVER")
-    status_server = current_app.config.get("PIKA_STATUS_SERVER")
-    model = current_app.config.get("PIKA_MODEL")
-    if not api_key or not server:
-        return {"success": False, "message": "Video generation is not configured (PIKA_SERVER/PIKA_API_KEY missing)"}
-
-    payload = {"prompt": prompt}
-    if model:
-        payload["model"] = model
-
-    try:
-        response = requests.post(
-            server,
-            headers={
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {api_key}"
-            },
-            json=payload,
-            timeout=30
-        )
-        if response.status_code != 200:
-            return {"success": False, "message": "PIKA request failed"}
-        pika_json = response.json()
-        video_url = _find_video_url(pika_json)
-        if video_url:
-            return {"success": True, "video_url": video_url}
-
-        request_id = pika_json.get("id") or pika_json.get("request_id") or pika_json.get("job_id")
-        status_url = pika_json.get("status_url")
-        if request_id and status_server and not status_url:
-            status_url = f"{status_server.rstrip('/')}/{request_id}"
-
-        if status_url:
-            for _ in range(2):
-                time.sleep(1.5)
-                status_response = requests.get(
-                    status_url,
-                    headers={"Authorization": f"Bearer {api_key}"},
-                    timeout=20
-                )
-                if status_response.status_code != 200:
-                    continue
-                status_json = status_response.json()
-                status_video_url = _find_video_url(status_json)
-                if status_video_url:
-                    return {"success": True, "video_url": status_video_url}
-
-        return {
-            "success": True,
-            "video_status": "pending",
-            "video_request_id": request_id,
-            "video_status_url": status_url
-        }
-    except (requests.RequestException, ValueError, KeyError, TypeError):
-        return {"success": False, "message": "PIKA error"}
-
-
 def _generate_fallback_svg() -> str:
         svg = """
         <svg xmlns='http://www.w3.org/2000/svg' width='900' height='320' viewBox='0 0 900 320'>
@@ -237,7 +174,8 @@ def _call_openai_image(prompt: str) -> str:
     }
 
     try:
-        response = requests.post(
+        response = upstream.post(
+            "openai",
             server,
             headers={
                 "Content-Type": "application/json",
@@ -261,6 +199,11 @@ def _call_openai_image(prompt: str) -> str:
         return ""
 
 
+@lru_cache(maxsize=1024)
+def _similarity(normalized_answer: str, normalized_expected: str) -> float:
+    return SequenceMatcher(None, normalized_answer, normalized_expected).ratio()
+
+
 def _fallback_grade(answer: str) -> dict:
     expected = current_app.config.get("FINAL_CODE_ANSWER", "")
     normalized_answer = _normalize_answer(answer)
@@ -271,9 +214,7 @@ def _fallback_grade(answer: str) -> dict:
         return {"correct": False, "message": "Answer is required", "steps": []}
     if normalized_answer == normalized_expected:
         return {"correct": True, "message": "Correct", "steps": []}
-    from difflib import SequenceMatcher
-    similarity = SequenceMatcher(None, normalized_answer, normalized_expected).ratio()
-    if similarity >= 0.9:
+    if _similarity(normalized_answer, normalized_expected) >= 0.9:
         return {"correct": True, "message": "Correct", "steps": []}
     return {
         "correct": False,
@@ -286,17 +227,34 @@ def _fallback_grade(answer: str) -> dict:
     }
 
 
-def _grade_final_answer(answer: str) -> dict:
-    result = None
-    prompt = (
-        "You are grading a student's final code answer. "
-        "Return ONLY valid JSON with this schema: "
-        "{\"verdict\":\"Correct\"|\"Incorrect\",\"explanation\":string,\"steps\":string[]}\n"
-        "If verdict is Correct, explanation should be 'Correct' and steps must be an empty array. "
-        "If verdict is Incorrect, provide a short explanation and 3-6 numbered fix steps as strings."
-    )
+GRADING_PROMPT = (
+    "You are grading a student's final code answer. "
+    "Return ONLY valid JSON with this schema: "
+    "{\"verdict\":\"Correct\"|\"Incorrect\",\"explanation\":string,\"steps\":string[]}\n"
+    "If verdict is Correct, explanation should be 'Correct' and steps must be an empty array. "
+    "If verdict is Incorrect, provide a short explanation and 3-6 numbered fix steps as strings."
+)
+
+
+def _grading_fingerprint() -> str:
+    """Changes whenever the expected answer, grading prompt or model changes."""
+    parts = [
+        current_app.config.get("FINAL_CODE_ANSWER") or "",
+        GRADING_PROMPT,
+        current_app.config.get("OPENAI_MODEL") or "",
+    ]
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
 
-    openai_text = _call_openai(prompt, f"Student answer:\n{answer}")
+
+def _grade_final_answer(answer: str, budget=None) -> dict:
+    normalized = _normalize_answer(answer)
+    fingerprint = _grading_fingerprint()
+    cached = GradeCache.lookup(normalized, fingerprint)
+    if cached:
+        return cached
+
+    result = None
+    openai_text = _call_openai(GRADING_PROMPT, f"Student answer:\n{answer}", budget=budget)
     if openai_text:
         parsed = _extract_json(openai_text)
         verdict = (parsed.get("verdict") or "").strip().lower()
@@ -319,10 +277,81 @@ def _grade_final_answer(answer: str) -> dict:
                     ]
                 }
 
-    return result or _fallback_grade(answer)
+    if result is None:
+        # Not cached: a fallback verdict should be replaced once OpenAI is reachable
+        return _fallback_grade(answer)
+
+    GradeCache.store(normalized, fingerprint, result)
+    return result
 
 
-def _generate_guidance(answer: str) -> dict:
+FALLBACK_GUIDANCE_STEPS = [
+    "Gather the ordered list of actions and define what the result represents.",
+    "Loop once per action, in order.",
+    "Use if/else decisions to interpret the current action.",
+    "Update the running result based on that action.",
+    "Output the final result after the loop ends."
+]
+
+FALLBACK_VIDEO_PROMPT = (
+    "Create a short, friendly educational walkthrough video for a coding maze game. "
+    "Title: Walkthrough Video. "
+    f"Key steps: {'; '.join(FALLBACK_GUIDANCE_STEPS[:6])}."
+)
+
+# Upstream legs of a guidance request run here so the shared deadline can cut them off
+_fanout_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="endgame-fanout")
+
+# The fallback video prompt never changes, so once its video is ready it is reused
+_fallback_video_cache = {}
+
+
+def _in_app_context(fn, *args, **kwargs):
+    app = current_app._get_current_object()
+
+    def run():
+        with app.app_context():
+            return fn(*args, **kwargs)
+    return run
+
+
+def _fallback_video_result() -> dict:
+    cached = _fallback_video_cache.get("result")
+    if cached:
+        return cached
+    result = submit_video_job(FALLBACK_VIDEO_PROMPT)
+    if result.get("success") and result.get("video_url"):
+        _fallback_video_cache["result"] = result
+    return result
+
+
+def _video_fields(result: dict, notice: str) -> dict:
+    fields = {
+        "video_notice": notice,
+        "video_url": "",
+        "video_status": "",
+        "video_request_id": "",
+        "video_status_url": ""
+    }
+    if result.get("success") and result.get("video_url"):
+        fields["video_url"] = result.get("video_url")
+        fields["video_notice"] = "Generated a real video walkthrough."
+    elif result.get("video_status") == "pending":
+        fields["video_status"] = "pending"
+        fields["video_request_id"] = result.get("video_request_id") or ""
+        fields["video_status_url"] = result.get("video_status_url") or ""
+        fields["video_notice"] = "Video is generating. Please try again in a moment."
+    elif result.get("message"):
+        fields["video_notice"] = result.get("message")
+    return fields
+
+
+def _generate_guidance(answer: str, budget=None) -> dict:
+    """
+    Ask OpenAI for a walkthrough within one deadline. If it has not answered
+    by then, or answered with nothing usable, the fallback walkthrough (and its
+    cached video) is returned, with "partial": True on a timeout.
+    """
     prompt = (
         "You are a tutoring assistant for beginners. Provide a step-by-step walkthrough "
         "that explains how to build a solution and how the code is written, without giving full code or pseudocode. "
@@ -335,7 +364,18 @@ def _generate_guidance(answer: str) -> dict:
         "Keep steps short, actionable, and avoid revealing a full solution."
     )
 
-    openai_text = _call_openai(prompt, f"Student context:\n{answer}")
+    deadline = budget or upstream.Deadline(current_app.config.get("AI_LATENCY_BUDGET") or 15)
+    openai_future = _fanout_pool.submit(
+        _in_app_context(_call_openai, prompt, f"Student context:\n{answer}", budget=deadline)
+    )
+
+    timed_out = False
+    try:
+        openai_text = openai_future.result(timeout=deadline.remaining())
+    except FuturesTimeout:
+        openai_text = ""
+        timed_out = True
+
     if openai_text:
         parsed = _extract_json(openai_text)
         title = (parsed.get("title") or "Walkthrough").strip() or "Walkthrough"
@@ -373,56 +413,31 @@ def _generate_guidance(answer: str) -> dict:
                 {"title": f"Step {index + 1}", "narration": step, "on_screen": step}
                 for index, step in enumerate(cleaned_steps[:8])
             ]
-        video_notice = "Generated step-by-step video narration from your walkthrough."
 
         if cleaned_steps:
-            durations = [7 for _ in cleaned_steps[:8]]
-            video_url = ""
-            video_status = ""
-            video_request_id = ""
-            video_status_url = ""
             pika_prompt = (
                 "Create a short, friendly educational walkthrough video for a coding maze game. "
                 f"Title: {video_title}. "
                 "Keep it concise, motivational, and beginner-friendly. "
                 f"Key steps: {'; '.join(cleaned_steps[:6])}."
             )
-            pika_result = _call_pika_video(pika_prompt)
-            if pika_result.get("success") and pika_result.get("video_url"):
-                video_url = pika_result.get("video_url")
-                video_notice = "Generated a real video walkthrough."
-            elif pika_result.get("video_status") == "pending":
-                video_status = "pending"
-                video_request_id = pika_result.get("video_request_id") or ""
-                video_status_url = pika_result.get("video_status_url") or ""
-                video_notice = "Video is generating. Please try again in a moment."
-            elif pika_result.get("message"):
-                video_notice = pika_result.get("message")
+            # Queuing the job is a quick local write; Pika itself is polled in the background
+            pika_result = submit_video_job(pika_prompt)
 
             return {
                 "success": True,
                 "title": title,
                 "steps": cleaned_steps[:8],
-                "durations": durations,
+                "durations": [7 for _ in cleaned_steps[:8]],
                 "ui_steps": cleaned_ui_steps[:6],
                 "video": {
                     "title": video_title,
                     "scenes": cleaned_scenes[:8]
                 },
-                "video_notice": video_notice,
-                "video_url": video_url,
-                "video_status": video_status,
-                "video_request_id": video_request_id,
-                "video_status_url": video_status_url
+                "partial": False,
+                **_video_fields(pika_result, "Generated step-by-step video narration from your walkthrough.")
             }
 
-    fallback_steps = [
-        "Gather the ordered list of actions and define what the result represents.",
-        "Loop once per action, in order.",
-        "Use if/else decisions to interpret the current action.",
-        "Update the running result based on that action.",
-        "Output the final result after the loop ends."
-    ]
     fallback_ui_steps = [
         "Type your current understanding into the answer box.",
         "Click Generate Walkthrough to get guided steps.",
@@ -437,43 +452,27 @@ def _generate_guidance(answer: str) -> dict:
         {"title": "Update", "narration": "Update the running result after each action.", "on_screen": "Update the result."},
         {"title": "Output", "narration": "Output the final result after the loop.", "on_screen": "Output the final result."}
     ]
-    fallback_notice = "Generated step-by-step video narration from fallback guidance."
-    fallback_video_url = ""
-    fallback_video_status = ""
-    fallback_video_request_id = ""
-    fallback_video_status_url = ""
-    fallback_prompt = (
-        "Create a short, friendly educational walkthrough video for a coding maze game. "
-        "Title: Walkthrough Video. "
-        f"Key steps: {'; '.join(fallback_steps[:6])}."
-    )
-    fallback_result = _call_pika_video(fallback_prompt)
-    if fallback_result.get("success") and fallback_result.get("video_url"):
-        fallback_video_url = fallback_result.get("video_url")
-        fallback_notice = "Generated a real video walkthrough."
-    elif fallback_result.get("video_status") == "pending":
-        fallback_video_status = "pending"
-        fallback_video_request_id = fallback_result.get("video_request_id") or ""
-        fallback_video_status_url = fallback_result.get("video_status_url") or ""
-        fallback_notice = "Video is generating. Please try again in a moment."
-    elif fallback_result.get("message"):
-        fallback_notice = fallback_result.get("message")
+    fallback_result = _fallback_video_cache.get("result")
+    if not fallback_result:
+        fallback_video_future = _fanout_pool.submit(_in_app_context(_fallback_video_result))
+        try:
+            # Give the local job write a moment even if OpenAI used up the budget
+            fallback_result = fallback_video_future.result(timeout=max(deadline.remaining(), 1.0))
+        except FuturesTimeout:
+            fallback_result = {"success": False, "message": "Video is unavailable right now."}
 
     return {
         "success": True,
         "title": "Walkthrough",
-        "steps": fallback_steps,
-        "durations": [7 for _ in fallback_steps],
+        "steps": FALLBACK_GUIDANCE_STEPS,
+        "durations": [7 for _ in FALLBACK_GUIDANCE_STEPS],
         "ui_steps": fallback_ui_steps,
         "video": {
             "title": "Walkthrough Video",
             "scenes": fallback_scenes
         },
-        "video_notice": fallback_notice,
-        "video_url": fallback_video_url,
-        "video_status": fallback_video_status,
-        "video_request_id": fallback_video_request_id,
-        "video_status_url": fallback_video_status_url
+        "partial": timed_out,
+        **_video_fields(fallback_result, "Generated step-by-step video narration from fallback guidance.")
     }
 
 
@@ -504,7 +503,7 @@ def _chat_response(message: str, history: list, role: str = "") -> dict:
             "Highlight key choices, what they learned, and the outcome in simple language. "
             f"Conversation context:\n{history_text}\nUser request: {message}"
         )
-        video_result = _call_pika_video(video_prompt)
+        video_result = submit_video_job(video_prompt)
         if video_result.get("success") and video_result.get("video_url"):
             return {
                 "success": True,
@@ -515,7 +514,9 @@ def _chat_response(message: str, history: list, role: str = "") -> dict:
             return {
                 "success": True,
                 "reply": "Your video is generating. Please ask again in a moment.",
-                "video_status": "pending"
+                "video_status": "pending",
+                "video_job_id": video_result.get("video_job_id"),
+                "video_status_url": video_result.get("video_status_url")
             }
         if video_result.get("message"):
             return {
@@ -705,7 +706,7 @@ def final_check(player_id):
     if len(answer) > max_len:
         answer = answer[:max_len]
 
-    result = _grade_final_answer(answer)
+    result = _grade_final_answer(answer, budget=_request_budget())
 
     player.final_answer = answer
     player.final_correct = result["correct"]
@@ -740,7 +741,7 @@ def final_check_frontend():
         if not player:
             return jsonify({"correct": False, "message": "Player not found", "steps": []}), 404
 
-    result = _grade_final_answer(answer)
+    result = _grade_final_answer(answer, budget=_request_budget())
 
     if player:
         player.final_answer = answer
@@ -847,7 +848,7 @@ def generate_guidance(player_id):
     data = _get_json()
     answer = (data.get("answer") or "").strip()
 
-    result = _generate_guidance(answer)
+    result = _generate_guidance(answer, budget=_request_budget())
     return jsonify(result), 200
 
 
@@ -867,8 +868,19 @@ def chat_with_ai(player_id):
 
     history = data.get("history") if isinstance(data.get("history"), list) else []
 
+    # Prefer the server-side history; a bare "history" list is still accepted
+    conversation_id = data.get("conversation_id")
+    conversation = None
+    if conversation_id or not history:
+        conversation = Conversation.open(conversation_id, kind=f"endgame:{player_id}")
+        history = conversation.context()
+
     role = (data.get("role") or "").strip()
     result = _chat_response(message, history, role)
+
+    if conversation is not None and result.get("reply"):
+        conversation.record(message, result["reply"])
+        result["conversation_id"] = conversation.id
     return jsonify(result), 200
 
 
@@ -877,29 +889,44 @@ def chat_with_ai_api(player_id):
     return chat_with_ai(player_id)
 
 
+def _leaderboard_item(entry, player, rank):
+    return {
+        "rank": rank,
+        "player": player.to_dict(),
+        "total_attempts": entry.total_attempts,
+    }
+
+
 @endgame_api.route("/leaderboard", methods=["GET"])
 def leaderboard():
-    players = Player.query.all()
-    payload = []
-
-    for player in players:
-        total_attempts = (
-            db.session.query(db.func.sum(PlayerBadge.attempts))
-            .filter(PlayerBadge.player_id == player.id)
-            .scalar()
-        ) or 0
-
-        payload.append({
-            "player": player.to_dict(),
-            "total_attempts": total_attempts,
-        })
-
-    payload.sort(
-        key=lambda item: (
-            item["player"]["completed_at"] is None,
-            item["player"]["completed_at"] or "",
-            item["total_attempts"],
-        )
-    )
+    """
+    Top of the leaderboard from the materialized LeaderboardEntries table.
+    ?limit=K (default 50, max 500) and ?offset=N page through it;
+    ?player_id=X adds that player's own rank as "me".
+    """
+    limit = min(max(request.args.get("limit", 50, type=int) or 50, 1), 500)
+    offset = max(request.args.get("offset", 0, type=int) or 0, 0)
+
+    # One extra row tells us whether there is a next page without counting the table
+    rows = LeaderboardEntry.page(limit + 1, offset)
+    payload = [_leaderboard_item(entry, player, offset + i + 1) for i, (entry, player) in enumerate(rows[:limit])]
+    body = {
+        "success": True,
+        "leaderboard": payload,
+        "limit": limit,
+        "offset": offset,
+        "has_more": len(rows) > limit,
+    }
+
+    player_id = request.args.get("player_id", type=int)
+    if player_id is not None:
+        entry = LeaderboardEntry.query.get(player_id)
+        player = Player.query.get(player_id) if entry else None
+        body["me"] = _leaderboard_item(entry, player, entry.rank()) if player else None
+
+    return jsonify(body), 200
+
 
-    return jsonify({"success": True, "leaderboard": payload}), 200
+@endgame_api.route("/api/endgame/leaderboard", methods=["GET"])
+def leaderboard_api():
+    return leaderboard()
@@ -1,3 +1,4 @@
+import logging
 import os
 import requests
 from flask import Blueprint, request, jsonify, session 
@@ -7,6 +8,7 @@ from __init__ import app, db
 
 feedback_api = Blueprint('feedback_api', __name__, url_prefix='/api/feedback')
 api = Api(feedback_api)
+logger = logging.getLogger(__name__)
 
 GITHUB_REPO = "Open-Coding-Society/pages"  
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
@@ -54,9 +56,9 @@ class FeedbackAPI:
                     feedback.github_issue_url = github_url
                     db.session.commit()
                 else:
-                    print("GitHub Issue creation failed:", response.json())
+                    logger.warning("GitHub issue creation failed: %s", response.json())
             except Exception as e:
-                print("GitHub API error:", str(e))
+                logger.warning("GitHub API error: %s", e)
 
             return jsonify(feedback.read())
 
@@ -92,9 +94,9 @@ class FeedbackAPI:
                             issue_data = response.json()
                             status = issue_data.get("state", "Unknown").capitalize()  # Open or Closed
                         else:
-                            print(f"GitHub issue fetch failed for issue {issue_number}: {response.status_code}")
+                            logger.warning("GitHub issue fetch failed for issue %s: %s", issue_number, response.status_code)
                 except Exception as e:
-                    print(f"Error checking issue status: {e}")
+                    logger.warning("Error checking issue status: %s", e)
 
                 result.append({
                     "title": fb.title,
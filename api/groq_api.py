@@ -1,6 +1,6 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_restful import Api, Resource
-import requests
+from api import upstream
 
 groq_api = Blueprint('groq_api', __name__, url_prefix='/api')
 api = Api(groq_api)
@@ -20,8 +20,9 @@ class GroqAPI:
                 return {'message': 'API key not configured'}, 500
 
             try:
-                response = requests.post(
-                    "https://api.groq.com/openai/v1/chat/completions",
+                response = upstream.post(
+                    "groq",
+                    current_app.config.get('GROQ_SERVER') or "https://api.groq.com/openai/v1/chat/completions",
                     headers={
                         'Authorization': f'Bearer {api_key}',
                         'Content-Type': 'application/json'
@@ -30,10 +31,13 @@ class GroqAPI:
                         "model": "llama3-8b-8192",
                         "messages": messages,
                         "temperature": 0.7
-                    }
+                    },
+                    timeout=30
                 )
                 response.raise_for_status()
                 return jsonify(response.json())
+            except upstream.ProviderUnavailable:
+                return {'message': 'Groq API is temporarily unavailable. Please try again shortly.'}, 503
             except Exception as e:
                 return {'message': f'Error contacting Groq API: {str(e)}'}, 500
 
@@ -3,6 +3,7 @@ from functools import wraps
 import jwt
 from model.user import User
 from model.robop_user import RobopUser
+from api import auth_cache
 
 def _looks_like_jwt(token: str) -> bool:
     return isinstance(token, str) and token.count(".") == 2
@@ -41,18 +42,22 @@ def token_required(roles=None):
                 return {"message": "Authentication Token is missing!", "data": None, "error": "Unauthorized"}, 401
 
             try:
-                data = jwt.decode(token, current_app.config["SECRET_KEY"], algorithms=["HS256"])
+                data = auth_cache.verify_token(token)
+
+                # Refresh tokens only mint access tokens at /api/robop/refresh, whatever carries them
+                if data.get("type") == "refresh":
+                    return {"message": "Invalid Authentication token!", "data": None, "error": "Unauthorized"}, 401
 
                 if source == "robop_cookie":
                     uid = data.get("uid")
                     if not uid:
                         return {"message": "Invalid Authentication token!", "data": None, "error": "Unauthorized"}, 401
-                    current_user = RobopUser.query.filter_by(_uid=uid).first()
+                    current_user = auth_cache.cached_user(RobopUser, uid)
                 else:
                     uid = data.get("_uid")
                     if not uid:
                         return {"message": "Invalid Authentication token!", "data": None, "error": "Unauthorized"}, 401
-                    current_user = User.query.filter_by(_uid=uid).first()
+                    current_user = auth_cache.cached_user(User, uid)
 
                 if current_user is None:
                     return {"message": "Invalid Authentication token!", "data": None, "error": "Unauthorized"}, 401
@@ -0,0 +1,168 @@
+# api/logging_setup.py
+"""
+Central logging for the app: modules log with logging.getLogger(__name__)
+instead of print().
+
+Request threads only put records on an in-memory queue (QueueHandler); a
+background QueueListener thread formats and writes them, so a slow stdout
+never blocks a request. When the queue is full, records are dropped and
+counted rather than waiting.
+
+Every record carries the request id: the incoming X-Request-ID header, or a
+fresh one, also echoed back on the response.
+
+Settings (see __init__.py):
+  LOG_LEVEL          root level, e.g. INFO
+  LOG_LEVELS         per-module overrides, "api.upstream=DEBUG,werkzeug=WARNING"
+  LOG_FORMAT         "json" (one object per line) or "text"
+  LOG_DEBUG_SAMPLE   fraction of requests whose DEBUG records are kept (1 = all)
+  LOG_QUEUE_SIZE     max records buffered before dropping
+"""
+import atexit
+import copy
+from datetime import datetime, timezone
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import sys
+import uuid
+import zlib
+
+from flask import g, has_request_context, request
+from flask.logging import default_handler
+
+REQUEST_ID_HEADER = "X-Request-ID"
+_REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+# LogRecord attributes that are not user-supplied `extra=` fields
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+_listener = None
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamp records with the current request id ("-" outside a request)."""
+
+    def filter(self, record):
+        if not hasattr(record, "request_id"):
+            record.request_id = g.get("request_id", "-") if has_request_context() else "-"
+        return True
+
+
+class DebugSamplingFilter(logging.Filter):
+    """
+    Keep DEBUG records for only a fraction of requests. The choice is made per
+    request id, so a sampled request keeps all of its debug lines.
+    """
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.rate >= 1:
+            return True
+        request_id = getattr(record, "request_id", "-")
+        if request_id == "-":
+            return random.random() < self.rate
+        return (zlib.crc32(request_id.encode()) % 10000) < self.rate * 10000
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; `extra=` fields are included as keys."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_FIELDS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks: a full queue drops the record."""
+
+    dropped = 0
+
+    def prepare(self, record):
+        # Merge args now (they may not be safe to touch later), but keep the traceback separate
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
+
+def _parse_levels(spec):
+    levels = {}
+    for part in (spec or "").split(","):
+        name, _, level = part.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def init_logging(app):
+    """Route all logging through the queue, and tag requests with an id."""
+    global _listener
+    if _listener is not None:
+        return
+
+    if app.config.get("LOG_FORMAT") == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter("%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s")
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(formatter)
+
+    handler = DroppingQueueHandler(queue.Queue(maxsize=int(app.config.get("LOG_QUEUE_SIZE") or 10000)))
+    # Filters run in the calling thread, where the request context is available
+    handler.addFilter(RequestIdFilter())
+    handler.addFilter(DebugSamplingFilter(float(app.config.get("LOG_DEBUG_SAMPLE", 1))))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(app.config.get("LOG_LEVEL") or "INFO")
+    for name, level in _parse_levels(app.config.get("LOG_LEVELS")).items():
+        logging.getLogger(name).setLevel(level)
+
+    # Let app.logger propagate to the queue instead of writing to stderr itself
+    app.logger.removeHandler(default_handler)
+
+    _listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=False)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    @app.before_request
+    def _assign_request_id():
+        incoming = request.headers.get(REQUEST_ID_HEADER, "")
+        g.request_id = incoming if _REQUEST_ID_RE.match(incoming) else uuid.uuid4().hex
+
+    @app.after_request
+    def _echo_request_id(response):
+        if "request_id" in g:
+            response.headers[REQUEST_ID_HEADER] = g.request_id
+        return response
@@ -5,11 +5,13 @@ Handles CRUD operations for micro blog posts, replies, reactions, and topics
 from flask import Blueprint, request, jsonify, g
 from flask_restful import Api, Resource
 from api.jwt_authorize import token_required
-from model.microblog import MicroBlog, Topic
+from model.microblog import MicroBlog, Topic, FEED_PAGE_SIZE, REPLY_PAGE_SIZE
 from __init__ import db
+import logging
 
 
 microblog_api = Blueprint('microblog_api', __name__, url_prefix='/api')
+logger = logging.getLogger(__name__)
 api = Api(microblog_api)
 
 
@@ -80,31 +82,44 @@ class MicroBlogAPI:
        def get(self):
            """Get micro blog posts with optional filtering"""
            # Query parameters
-           limit = request.args.get('limit', 200, type=int)
+           limit = request.args.get('limit', FEED_PAGE_SIZE, type=int)
+           cursor = request.args.get('cursor')
            topic_id = request.args.get('topicId', type=int)
            page_path = request.args.get('pagePath')
            user_id = request.args.get('userId', type=int)
            search = request.args.get('search')
           
            try:
+               next_cursor = None
                if search:
-                   microblogs = MicroBlog.search_content(search, limit)
+                   microblogs, next_offset = MicroBlog.search(
+                       search, limit=limit, offset=request.args.get('offset', 0, type=int),
+                       viewer_id=g.current_user.id
+                   )
+                   return jsonify({
+                       'microblogs': microblogs,
+                       'count': len(microblogs),
+                       'nextOffset': next_offset
+                   })
                elif topic_id:
-                   microblogs = MicroBlog.get_by_topic(topic_id, limit)
+                   microblogs, next_cursor = MicroBlog.feed(topic_id=topic_id, limit=limit, cursor=cursor, viewer_id=g.current_user.id)
                elif page_path:
                    topic = Topic.get_by_page_path(page_path)
                    if topic:
-                       microblogs = MicroBlog.get_by_topic(topic.id, limit)
+                       microblogs, next_cursor = MicroBlog.feed(topic_id=topic.id, limit=limit, cursor=cursor, viewer_id=g.current_user.id)
                    else:
                        microblogs = []
                elif user_id:
-                   microblogs = MicroBlog.get_by_user(user_id, limit)
+                   microblogs, next_cursor = MicroBlog.feed(user_id=user_id, limit=limit, cursor=cursor, viewer_id=g.current_user.id)
                else:
-                   microblogs = MicroBlog.get_all(limit)
+                   microblogs, next_cursor = MicroBlog.feed(limit=limit, cursor=cursor, viewer_id=g.current_user.id)
                return jsonify({
                    'microblogs': microblogs,
-                   'count': len(microblogs)
+                   'count': len(microblogs),
+                   'nextCursor': next_cursor
                })
+           except ValueError as e:
+               return {'message': str(e)}, 400
            except Exception as e:
                return {'message': f'Error retrieving micro blog posts: {str(e)}'}, 500
       
@@ -221,8 +236,19 @@ class MicroBlogAPI:
            microblog = MicroBlog.get_by_id(post_id)
            if not microblog:
                return {'message': 'MicroBlog post not found'}, 404
-           replies = microblog.get_replies()
-           return jsonify({'replies': replies, 'count': len(replies)})
+           try:
+               replies, next_cursor = microblog.get_replies(
+                   limit=request.args.get('limit', REPLY_PAGE_SIZE, type=int),
+                   cursor=request.args.get('cursor')
+               )
+           except ValueError as e:
+               return {'message': str(e)}, 400
+           return jsonify({
+               'replies': replies,
+               'count': len(replies),
+               'replyCount': microblog._reply_count,
+               'nextCursor': next_cursor
+           })
   
    class _Reaction(Resource):
        """Handle reactions to micro blog posts"""
@@ -234,9 +260,7 @@ class MicroBlogAPI:
 
 
            # --- Debug info (helps diagnose issues) ---
-           print("DEBUG current_user:", current_user)
-           print("DEBUG current_user.id:", getattr(current_user, "id", None))
-           print("DEBUG body:", body)
+           logger.debug("reaction: user_id=%s body=%s", getattr(current_user, "id", None), body)
 
 
            # --- Validate request body ---
@@ -271,19 +295,14 @@ class MicroBlogAPI:
            # --- Add the reaction ---
            try:
                microblog.add_reaction(user_id, reaction_type)
-
-
-               # Refresh the record to make sure we return updated data
-               from __init__ import db
-               db.session.refresh(microblog)
-
-
                return jsonify({
                    'message': 'Reaction added successfully',
                    'microblog': microblog.read()
                })
 
 
+           except ValueError as e:
+               return {'message': str(e)}, 400
            except Exception as e:
                return {'message': f'Error adding reaction: {str(e)}'}, 500
 
@@ -389,6 +408,8 @@ class TopicAPI:
            page_key = request.args.get('pageKey')
            active_only = request.args.get('activeOnly', 'true').lower() == 'true'
            search = request.args.get('search')
+           limit = request.args.get('limit', 50, type=int)
+           offset = request.args.get('offset', 0, type=int)
           
            try:
                if page_path:
@@ -409,7 +430,7 @@ class TopicAPI:
                       
                elif search:
                    # Search topics
-                   topics = Topic.search_by_title(search)
+                   topics = Topic.search_by_title(search, limit=limit, offset=offset)
                   
                else:
                    # Get all topics
@@ -473,7 +494,8 @@ class TopicAPI:
                pass  # No auth provided, continue as anonymous
           
            # Query parameters
-           limit = request.args.get('limit', 20, type=int)
+           limit = request.args.get('limit', FEED_PAGE_SIZE, type=int)
+           cursor = request.args.get('cursor')
           
            try:
                # Get topic by page key
@@ -490,7 +512,7 @@ class TopicAPI:
               
                # Get recent posts for this topic
                user_id = current_user.id if current_user else None
-               posts = topic.get_recent_posts(limit=limit, user_id=user_id)
+               posts, next_cursor = MicroBlog.feed(topic_id=topic.id, limit=limit, cursor=cursor, viewer_id=user_id)
               
                # Check if user can post more messages
                can_post = False
@@ -501,10 +523,13 @@ class TopicAPI:
                    'topic': topic.read(),
                    'microblogs': posts,
                    'count': len(posts),
+                   'nextCursor': next_cursor,
                    'canPost': can_post,
                    'userPostCount': topic.get_user_post_count(user_id) if user_id else 0
                })
               
+           except ValueError as e:
+               return {'message': str(e)}, 400
            except Exception as e:
                return {'message': f'Error retrieving page microblogs: {str(e)}'}, 500
 
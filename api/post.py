@@ -5,7 +5,7 @@ Flask REST API endpoints for creating, reading, updating, and deleting posts
 from flask import Blueprint, request, jsonify, g
 from flask_restful import Api, Resource
 from __init__ import db
-from model.post import Post
+from model.post import Post, THREAD_PAGE_SIZE
 from model.user import User
 from api.jwt_authorize import token_required
 
@@ -14,6 +14,19 @@ from api.jwt_authorize import token_required
 post_api = Blueprint('post_api', __name__, url_prefix='/api/post')
 api = Api(post_api)
 
+# List endpoints return a plain JSON array; the cursor for the next page rides in this header
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+
+def _thread_page(**filters):
+    """One page of threads for ?limit=&cursor=, as a flask_restful (body, status, headers) tuple"""
+    posts, next_cursor = Post.load_threads(
+        limit=request.args.get('limit', THREAD_PAGE_SIZE, type=int),
+        cursor=request.args.get('cursor'),
+        **filters
+    )
+    return posts, 200, ({NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {})
+
 
 class PostAPI(Resource):
     """
@@ -75,13 +88,14 @@ class PostListAPI(Resource):
     """
     def get(self):
         """
-        Get all top-level posts with their replies
-        Returns posts in reverse chronological order
+        Get a page of top-level posts with their replies
+        Returns posts in reverse chronological order (?limit=, ?cursor=)
         Public endpoint - anyone can view posts
         """
         try:
-            posts = Post.get_all()
-            return posts, 200
+            return _thread_page()
+        except ValueError as e:
+            return {'message': str(e)}, 400
         except Exception as e:
             return {'message': f'Error fetching posts: {str(e)}'}, 500
 
@@ -101,8 +115,9 @@ class PostPageAPI(Resource):
             if not page_url:
                 return {'message': 'Page URL is required'}, 400
             
-            posts = Post.get_by_page(page_url)
-            return posts, 200
+            return _thread_page(page_url=page_url)
+        except ValueError as e:
+            return {'message': str(e)}, 400
         except Exception as e:
             return {'message': f'Error fetching posts: {str(e)}'}, 500
 
@@ -246,6 +261,27 @@ class PostReplyAPI(Resource):
             return {'message': f'Error creating reply: {str(e)}'}, 500
 
 
+class PostSearchAPI(Resource):
+    """
+    GET API - Full-text search over posts and replies
+    Public endpoint - No authentication required
+    """
+    def get(self):
+        """Search posts: ?q=words&limit=&offset= (best match first)"""
+        query = request.args.get('q', '').strip()
+        if not query:
+            return {'message': 'Search query (q) is required'}, 400
+        try:
+            posts, next_offset = Post.search(
+                query,
+                limit=request.args.get('limit', THREAD_PAGE_SIZE, type=int),
+                offset=request.args.get('offset', 0, type=int)
+            )
+            return {'posts': posts, 'count': len(posts), 'nextOffset': next_offset}, 200
+        except Exception as e:
+            return {'message': f'Error searching posts: {str(e)}'}, 500
+
+
 class PostUserAPI(Resource):
     """
     GET API - Get all posts by a specific user
@@ -259,8 +295,9 @@ class PostUserAPI(Resource):
             if not user:
                 return {'message': 'User not found'}, 404
             
-            posts = Post.get_by_user(user_id)
-            return posts, 200
+            return _thread_page(user_id=user_id)
+        except ValueError as e:
+            return {'message': str(e)}, 400
         except Exception as e:
             return {'message': f'Error fetching user posts: {str(e)}'}, 500
 
@@ -272,4 +309,5 @@ api.add_resource(PostPageAPI, '/page')  # GET /api/post/page?url=...
 api.add_resource(PostDetailAPI, '/<int:post_id>')  # GET/PUT/DELETE /api/post/{id}
 api.add_resource(PostReplyAPI, '/reply')  # POST /api/post/reply
 api.add_resource(PostUserAPI, '/user/<int:user_id>')  # GET /api/post/user/{id}
+api.add_resource(PostSearchAPI, '/search')  # GET /api/post/search?q=...
 
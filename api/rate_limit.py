@@ -0,0 +1,197 @@
+# api/rate_limit.py
+"""
+Token-bucket rate limiting for the AI and code-execution endpoints.
+
+Buckets are keyed by route group + caller, where the caller is the
+authenticated user when a valid JWT is present and the client IP otherwise.
+Bucket state lives in a small SQLite file under DATA_FOLDER, so every gunicorn
+worker on the host draws from the same buckets (the main database may be
+MySQL and is not used for this).
+
+Limits are set per route group in app.config["RATE_LIMITS"] as "N/unit"
+(unit = second, minute or hour): a bucket holds N tokens and refills N per
+unit. Responses carry RateLimit-Limit / RateLimit-Remaining / RateLimit-Reset
+headers, and 429 responses add Retry-After.
+"""
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+
+import jwt
+from flask import g, jsonify, request
+
+# Flask endpoint -> route group. Aliased routes share a group (and a bucket).
+ROUTE_GROUPS = {
+    "robop_api.ai_chat": "ai_chat",
+    "robop_api.generate_hints": "ai_hints",
+    "chatgpt_api._ask": "chatgpt",
+    "groq_api._generate": "groq",
+    "python_exec_api.pythonexec": "run_code",
+    "javascript_exec_api.javascriptexec": "run_code",
+    "endgame_api.generate_guidance": "endgame_guidance",
+    "endgame_api.generate_guidance_api": "endgame_guidance",
+    "endgame_api.final_check": "endgame_final_check",
+    "endgame_api.final_check_api": "endgame_final_check",
+    "endgame_api.final_check_frontend": "endgame_final_check",
+}
+
+UNIT_SECONDS = {"second": 1, "minute": 60, "hour": 3600}
+UNIT_ALIASES = {
+    "s": "second", "sec": "second", "secs": "second", "second": "second", "seconds": "second",
+    "m": "minute", "min": "minute", "mins": "minute", "minute": "minute", "minutes": "minute",
+    "h": "hour", "hr": "hour", "hrs": "hour", "hour": "hour", "hours": "hour",
+}
+
+# Buckets untouched this long are full again and can be dropped
+STALE_AFTER_SECONDS = 24 * 3600
+
+
+def parse_limit(spec: str):
+    """'12/minute' -> (capacity 12, refill 0.2 tokens per second); a bare '12' is per minute."""
+    count, slash, unit = (spec or "").partition("/")
+    unit = unit.strip().lower()
+    if slash and unit not in UNIT_ALIASES:
+        raise ValueError(f"Bad rate limit {spec!r}: unit must be second, minute or hour")
+    try:
+        capacity = int(count)
+    except ValueError:
+        raise ValueError(f"Bad rate limit {spec!r}: count must be an integer") from None
+    seconds = UNIT_SECONDS[UNIT_ALIASES[unit] if slash else "minute"]
+    return capacity, capacity / seconds
+
+
+class TokenBucketStore:
+    """Bucket state in a SQLite file shared by all worker processes."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=2.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def take(self, key, capacity, refill_per_second, cost=1.0):
+        """
+        Atomically refill and try to take `cost` tokens.
+        Returns (allowed, tokens_left, seconds_until_next_token).
+        """
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                tokens = float(capacity)
+            else:
+                tokens = min(float(capacity), row[0] + (now - row[1]) * refill_per_second)
+
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            conn.execute(
+                "INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (key, tokens, now)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        if random.random() < 0.001:
+            conn.execute("DELETE FROM buckets WHERE updated < ?", (now - STALE_AFTER_SECONDS,))
+
+        wait = 0.0 if tokens >= cost else (cost - tokens) / refill_per_second
+        return allowed, tokens, wait
+
+
+def _client_ip(app):
+    if app.config.get("RATE_LIMIT_TRUST_PROXY"):
+        real_ip = request.headers.get("X-Real-IP")
+        if real_ip:
+            return real_ip.strip()
+        if request.access_route:
+            return request.access_route[0]
+    return request.remote_addr or "unknown"
+
+
+def _caller_identity(app):
+    """'user:<uid>' for a valid JWT (robop cookie, bearer, or main cookie), else 'ip:<addr>'."""
+    candidates = [request.cookies.get("ROBOP_JWT")]
+    auth = request.headers.get("Authorization", "")
+    if auth.lower().startswith("bearer "):
+        candidates.append(auth.split(" ", 1)[1].strip())
+    candidates.append(request.cookies.get(app.config.get("JWT_TOKEN_NAME") or "jwt"))
+
+    for token in candidates:
+        if not token or token.count(".") != 2:
+            continue
+        try:
+            payload = jwt.decode(token, app.config["SECRET_KEY"], algorithms=["HS256"])
+        except jwt.InvalidTokenError:
+            continue
+        uid = payload.get("uid") or payload.get("_uid")
+        if uid:
+            return f"user:{uid}"
+    return f"ip:{_client_ip(app)}"
+
+
+def init_rate_limiter(app):
+    store = TokenBucketStore(os.path.join(app.config["DATA_FOLDER"], "rate_limits.db"))
+    limits = {group: parse_limit(spec) for group, spec in (app.config.get("RATE_LIMITS") or {}).items()}
+
+    @app.before_request
+    def _enforce_rate_limit():
+        if request.method == "OPTIONS" or not app.config.get("RATE_LIMIT_ENABLED", True):
+            return None
+        group = ROUTE_GROUPS.get(request.endpoint)
+        if group is None or group not in limits:
+            return None
+
+        capacity, refill = limits[group]
+        key = f"{group}:{_caller_identity(app)}"
+        try:
+            allowed, remaining, wait = store.take(key, capacity, refill)
+        except sqlite3.Error as exc:
+            # Never take the endpoint down because the limiter store is busy
+            app.logger.warning("Rate limiter unavailable, allowing request: %s", exc)
+            return None
+
+        reset = math.ceil((capacity - remaining) / refill) if remaining < capacity else 0
+        g.rate_limit_headers = {
+            "RateLimit-Limit": str(capacity),
+            "RateLimit-Remaining": str(int(remaining)),
+            "RateLimit-Reset": str(reset),
+        }
+        if allowed:
+            return None
+
+        retry_after = max(1, math.ceil(wait))
+        response = jsonify({
+            "success": False,
+            "message": f"Too many requests. Please wait {retry_after}s and try again.",
+            "retry_after": retry_after
+        })
+        response.status_code = 429
+        response.headers["Retry-After"] = str(retry_after)
+        return response
+
+    @app.after_request
+    def _add_rate_limit_headers(response):
+        for name, value in (getattr(g, "rate_limit_headers", None) or {}).items():
+            response.headers[name] = value
+        return response
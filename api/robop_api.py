@@ -1,20 +1,25 @@
 # api/robop_api.py
 
 from flask import Blueprint, request, jsonify, make_response, current_app, g
-from model.robop_user import RobopUser, BadgeThreshold, UserBadge, StationHint
+from model.robop_user import (
+    RobopUser, BadgeThreshold, UserBadge, StationHint, Progress, RobopRevokedToken,
+    upsert_best_badges, BADGE_BATCH_MAX, PROGRESS_BATCH_MAX,
+)
 from model.pseudocode_bank import PseudocodeQuestionBank
+from model.conversation import Conversation
 import requests
 import json
 import os
 import re
 import jwt
-from datetime import datetime, timedelta
-from api.robop_jwt_authorize import robop_token_required
-import traceback
+from datetime import datetime
+from api.robop_jwt_authorize import robop_token_required, issue_tokens, ROBOP_JWT_COOKIE, ROBOP_REFRESH_COOKIE
+from api import upstream
+import logging
 from __init__ import db, app
 
 robop_api = Blueprint("robop_api", __name__, url_prefix="/api/robop")
-ROBOP_JWT_COOKIE = "ROBOP_JWT"
+logger = logging.getLogger(__name__)
 
 # ----------------------------
 # Helpers
@@ -42,9 +47,11 @@ def _preflight_ok():
 
 @robop_api.route("/login", methods=["OPTIONS"])
 @robop_api.route("/logout", methods=["OPTIONS"])
+@robop_api.route("/refresh", methods=["OPTIONS"])
 @robop_api.route("/me", methods=["OPTIONS"])
 @robop_api.route("/register", methods=["OPTIONS"])
 @robop_api.route("/assign_badge", methods=["OPTIONS"])
+@robop_api.route("/badges/batch", methods=["OPTIONS"])
 @robop_api.route("/fetch_badges", methods=["OPTIONS"])
 @robop_api.route("/badge_thresholds", methods=["OPTIONS"])
 @robop_api.route("/autofill", methods=["OPTIONS"])
@@ -54,6 +61,7 @@ def _preflight_ok():
 @robop_api.route("/ai_health", methods=["OPTIONS"])
 @robop_api.route("/progress", methods=["OPTIONS"])
 @robop_api.route("/progress/", methods=["OPTIONS"])
+@robop_api.route("/progress/batch", methods=["OPTIONS"])
 def robop_preflight():
     return _preflight_ok()
 
@@ -118,47 +126,65 @@ def login():
     if not user or not user.is_password(password):
         return jsonify({"success": False, "message": "Invalid credentials"}), 401
 
-    # Issue JWT
-    exp = datetime.utcnow() + timedelta(hours=12)
-    token = jwt.encode(
-        {"uid": user.uid, "exp": exp},
-        current_app.config["SECRET_KEY"],
-        algorithm="HS256"
-    )
-
+    access, refresh_token = issue_tokens(user)
     resp = jsonify({
         "success": True,
         "message": "Login successful.",
-        "user": user.to_dict()
+        "user": user.to_dict(),
+        "access_expires_in": current_app.config["ROBOP_ACCESS_TOKEN_TTL"]
+    })
+    _set_auth_cookies(resp, access, refresh_token)
+    return resp, 200
+
+
+@robop_api.route("/refresh", methods=["POST"])
+def refresh():
+    """Rotate the token pair: a valid, unrevoked refresh cookie buys a new access + refresh token."""
+    token = request.cookies.get(ROBOP_REFRESH_COOKIE)
+    if not token:
+        return jsonify({"success": False, "message": "Missing refresh token"}), 401
+    try:
+        payload = jwt.decode(token, current_app.config["SECRET_KEY"], algorithms=["HS256"])
+    except jwt.InvalidTokenError:
+        return jsonify({"success": False, "message": "Invalid refresh token"}), 401
+    if payload.get("type") != "refresh" or not payload.get("jti"):
+        return jsonify({"success": False, "message": "Invalid refresh token"}), 401
+
+    if current_app.config.get("ROBOP_TOKEN_REVOCATION"):
+        # Each refresh token is single-use; a replayed one is rejected
+        if not RobopRevokedToken.revoke(payload["jti"], datetime.utcfromtimestamp(payload["exp"])):
+            return jsonify({"success": False, "message": "Refresh token already used"}), 401
+
+    # Picks up role changes and deleted accounts at every rotation
+    user = RobopUser.query.filter_by(_uid=payload.get("uid")).first()
+    if not user:
+        return jsonify({"success": False, "message": "User not found"}), 401
+
+    access, refresh_token = issue_tokens(user)
+    resp = jsonify({
+        "success": True,
+        "message": "Token refreshed.",
+        "access_expires_in": current_app.config["ROBOP_ACCESS_TOKEN_TTL"]
     })
+    _set_auth_cookies(resp, access, refresh_token)
+    return resp, 200
 
+
+def _set_auth_cookies(resp, access, refresh_token):
     is_production = current_app.config.get("IS_PRODUCTION", False)
+    access_age = current_app.config["ROBOP_ACCESS_TOKEN_TTL"]
+    refresh_age = current_app.config["ROBOP_REFRESH_TOKEN_TTL"]
 
     # IMPORTANT cookie settings:
     # - cross-site (pages.opencodingsociety.com -> flask.opencodingsociety.com) requires SameSite=None; Secure=True
+    # - the refresh cookie is only sent to the robop API (refresh/logout)
     if is_production:
-        resp.set_cookie(
-            ROBOP_JWT_COOKIE,
-            token,
-            max_age=12*60*60,
-            secure=True,
-            httponly=True,
-            samesite="None",
-            path="/",
-            domain=".opencodingsociety.com"
-        )
+        cookie_args = dict(secure=True, httponly=True, samesite="None", domain=".opencodingsociety.com")
     else:
-        resp.set_cookie(
-            ROBOP_JWT_COOKIE,
-            token,
-            max_age=12*60*60,
-            secure=False,
-            httponly=False,   # you can set True in dev too if you don’t need JS access
-            samesite="Lax",
-            path="/"
-        )
-
-    return resp, 200
+        # you can set httponly=True in dev too if you don’t need JS access
+        cookie_args = dict(secure=False, httponly=False, samesite="Lax")
+    resp.set_cookie(ROBOP_JWT_COOKIE, access, max_age=access_age, path="/", **cookie_args)
+    resp.set_cookie(ROBOP_REFRESH_COOKIE, refresh_token, max_age=refresh_age, path="/api/robop", **cookie_args)
 
 
 @robop_api.route("/logout", methods=["POST"])
@@ -166,14 +192,30 @@ def logout():
     resp = jsonify({"success": True, "message": "Logged out."})
     is_production = current_app.config.get("IS_PRODUCTION", False)
 
+    # Revoke the refresh token so a copied cookie cannot mint new access tokens
+    token = request.cookies.get(ROBOP_REFRESH_COOKIE)
+    if token and current_app.config.get("ROBOP_TOKEN_REVOCATION"):
+        try:
+            payload = jwt.decode(token, current_app.config["SECRET_KEY"], algorithms=["HS256"])
+            if payload.get("jti"):
+                RobopRevokedToken.revoke(payload["jti"], datetime.utcfromtimestamp(payload["exp"]))
+        except jwt.InvalidTokenError:
+            pass
+
     if is_production:
         resp.set_cookie(
             ROBOP_JWT_COOKIE, "", max_age=0,
             secure=True, httponly=True, samesite="None",
             path="/", domain=".opencodingsociety.com"
         )
+        resp.set_cookie(
+            ROBOP_REFRESH_COOKIE, "", max_age=0,
+            secure=True, httponly=True, samesite="None",
+            path="/api/robop", domain=".opencodingsociety.com"
+        )
     else:
         resp.set_cookie(ROBOP_JWT_COOKIE, "", max_age=0, path="/")
+        resp.set_cookie(ROBOP_REFRESH_COOKIE, "", max_age=0, path="/api/robop")
 
     return resp, 200
 
@@ -205,45 +247,84 @@ def get_thresholds():
     return jsonify([t.to_dict() for t in thresholds]), 200
 
 
+def _parse_badge(item):
+    """Badge fields from a request dict with integer sector/module/attempts, or None if malformed"""
+    if not isinstance(item, dict) or None in [item.get(k) for k in ("sector_id", "module_id", "attempts", "badge_name")]:
+        return None
+    try:
+        return {
+            "sector_id": int(item["sector_id"]),
+            "module_id": int(item["module_id"]),
+            "attempts": int(item["attempts"]),
+            "used_autofill": bool(item.get("used_autofill")),
+            "badge_name": str(item["badge_name"])[:64],
+        }
+    except (TypeError, ValueError):
+        return None
+
+
 @robop_api.route("/assign_badge", methods=["POST"])
 @robop_token_required()
 def assign_badge():
     user = g.robop_user
-    data = _get_json()
-    sector_id = data.get("sector_id")
-    module_id = data.get("module_id")
-    attempts = data.get("attempts")
-    used_autofill = data.get("used_autofill")
-    badge_name = data.get("badge_name")
-
-    if None in [sector_id, module_id, attempts, badge_name]:
+    badge = _parse_badge(_get_json())
+    if badge is None:
         return jsonify({"success": False, "message": "Missing required badge metrics"}), 400
 
-    new_badge = UserBadge(
-        user_id=user.id,
-        sector_id=sector_id,
-        module_id=module_id,
-        attempts=attempts,
-        used_autofill=bool(used_autofill),
-        badge_name=badge_name
-    )
-    db.session.add(new_badge)
-    db.session.commit()
-    return jsonify({"success": True, "message": f"Badge '{badge_name}' saved!"}), 201
-    
-@robop_api.route("/progress", methods=["GET"], strict_slashes=False)
+    # Keeps only the best badge for this module, so repeated calls no longer pile up rows
+    upsert_best_badges(user.id, [badge], log=current_app.config.get("ROBOP_BADGE_LOG", True))
+    return jsonify({"success": True, "message": f"Badge '{badge['badge_name']}' saved!"}), 201
+
+
+@robop_api.route("/badges/batch", methods=["POST"])
 @robop_token_required()
-def get_progress():
-    user = g.robop_user  
+def assign_badges_batch():
+    """Upsert several badges at once: {"badges": [{"sector_id", "module_id", "attempts", "used_autofill", "badge_name"}, ...]}"""
+    user = g.robop_user
+    items = _get_json().get("badges")
+
+    if not isinstance(items, list) or not items:
+        return jsonify({"success": False, "message": "badges must be a non-empty list"}), 400
+    if len(items) > BADGE_BATCH_MAX:
+        return jsonify({"success": False, "message": f"At most {BADGE_BATCH_MAX} badges per request"}), 400
+    badges = [_parse_badge(item) for item in items]
+    if None in badges:
+        return jsonify({"success": False, "message": "Missing required badge metrics"}), 400
+
+    results = upsert_best_badges(user.id, badges, log=current_app.config.get("ROBOP_BADGE_LOG", True))
+    return jsonify({
+        "success": True,
+        "badges": [dict(badge.to_dict(), status=status) for badge, status in results],
+    }), 200
+
 
-    if not user.progress:
-        from model.robop_user import Progress
-        progress = Progress(user_id=user.id)
+def _get_or_create_progress(user_id):
+    """The user's Progress row; a new one is flushed, and committed with the rest of the request"""
+    progress = Progress.query.filter_by(user_id=user_id).first()
+    if not progress:
+        progress = Progress(user_id=user_id)
         db.session.add(progress)
-        db.session.commit()
-        db.session.refresh(user)  # optional: ensures relationship is updated
+        db.session.flush()
+    return progress
 
-    return jsonify({"success": True, "progress": user.progress.to_dict()}), 200
+
+def _parse_completion(item):
+    """(sector, module, score) from a {"sector", "module", "score"} dict, or None if malformed"""
+    if not isinstance(item, dict) or item.get("sector") is None or item.get("module") is None:
+        return None
+    try:
+        return int(item["sector"]), int(item["module"]), int(item.get("score") or 0)
+    except (TypeError, ValueError):
+        return None
+
+
+@robop_api.route("/progress", methods=["GET"], strict_slashes=False)
+@robop_token_required()
+def get_progress():
+    user = g.robop_user
+    progress = _get_or_create_progress(user.id)
+    db.session.commit()
+    return jsonify({"success": True, "progress": progress.to_dict()}), 200
 
 
 @robop_api.route("/progress", methods=["POST"], strict_slashes=False)
@@ -252,26 +333,46 @@ def update_progress():
     user = g.robop_user  
     data = _get_json()
 
-    sector = data.get("sector")
-    module = data.get("module")
-    score = data.get("score", 0)
+    completion = _parse_completion(data)
+    if completion is None:
+        return jsonify({"success": False, "message": "Missing or invalid sector or module"}), 400
+    sector, module, score = completion
+
+    progress = _get_or_create_progress(user.id)
+    progress.complete_module(sector, module, score)
+    db.session.commit()
 
-    if sector is None or module is None:
-        return jsonify({"success": False, "message": "Missing sector or module"}), 400
+    return jsonify({
+        "success": True,
+        "message": f"Progress updated for sector {sector}, module {module}",
+        "progress": progress.to_dict()
+    }), 200
 
-    if not user.progress:
-        from model.robop_user import Progress
-        progress = Progress(user_id=user.id)
-        db.session.add(progress)
-        db.session.commit()
-        db.session.refresh(user)  # optional
 
-    user.progress.complete_module(sector, module, score)
+@robop_api.route("/progress/batch", methods=["POST"])
+@robop_token_required()
+def update_progress_batch():
+    """Record several completions at once: {"modules": [{"sector", "module", "score"}, ...]}"""
+    user = g.robop_user
+    items = _get_json().get("modules")
+
+    if not isinstance(items, list) or not items:
+        return jsonify({"success": False, "message": "modules must be a non-empty list"}), 400
+    if len(items) > PROGRESS_BATCH_MAX:
+        return jsonify({"success": False, "message": f"At most {PROGRESS_BATCH_MAX} modules per request"}), 400
+    completions = [_parse_completion(item) for item in items]
+    if None in completions:
+        return jsonify({"success": False, "message": "Every module needs an integer sector and module"}), 400
+
+    progress = _get_or_create_progress(user.id)
+    added = progress.complete_modules(completions)
+    db.session.commit()
 
     return jsonify({
         "success": True,
-        "message": f"Progress updated for sector {sector}, module {module}",
-        "progress": user.progress.to_dict()
+        "message": f"Progress updated for {len(completions)} modules ({added} newly completed)",
+        "newly_completed": added,
+        "progress": progress.to_dict()
     }), 200
 
 # ---------------------------
@@ -506,8 +607,8 @@ def autofill_answer():
 
 # ========== DeepSeek AI Chat Integration ==========
 
-DEEPSEEK_API_KEY = "sk-b8001a4de18b463d8b59233263b479d7"
-DEEPSEEK_API_URL = "https://api.deepseek.com/v1/chat/completions"
+DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY", "sk-b8001a4de18b463d8b59233263b479d7")
+DEEPSEEK_API_URL = app.config["DEEPSEEK_SERVER"]
 
 SECTOR_CONTEXTS = {
     1: {
@@ -644,6 +745,11 @@ Remember: Adapt your response based on what the student asks."""
 def ai_chat():
     """
     Main AI chat endpoint with question details support.
+
+    History is kept server-side: send "conversation_id" from the previous
+    response (or omit it to start a new conversation) plus only the new
+    user_message. Clients that still send "conversation_history" without a
+    conversation_id get the old stateless behaviour.
     """
     data = _get_json()
 
@@ -651,6 +757,7 @@ def ai_chat():
     question_num = data.get("question_num")
     user_message = data.get("user_message", "").strip()
     conversation_history = data.get("conversation_history", [])
+    conversation_id = data.get("conversation_id")
     question_details = data.get("question_details", {})  # ✅ 新增
 
     if sector_id is None or question_num is None or not user_message:
@@ -671,7 +778,11 @@ def ai_chat():
 
         messages = [{"role": "system", "content": system_prompt}]
 
-        if conversation_history:
+        conversation = None
+        if conversation_id or not conversation_history:
+            conversation = Conversation.open(conversation_id, kind="robop_ai_chat")
+            messages.extend(conversation.context())
+        elif conversation_history:
             messages.extend(conversation_history[-20:])
 
         messages.append({"role": "user", "content": user_message})
@@ -695,11 +806,13 @@ def ai_chat():
             "top_p": 0.95
         }
 
-        response = requests.post(
+        response = upstream.post(
+            "deepseek",
             DEEPSEEK_API_URL,
             headers=headers,
             json=payload,
-            timeout=30
+            timeout=30,
+            budget=upstream.Deadline(current_app.config.get("AI_LATENCY_BUDGET") or 15)
         )
 
         if response.status_code != 200:
@@ -729,13 +842,24 @@ def ai_chat():
                 "message": "Empty response from AI"
             }), 500
 
-        return jsonify({
+        response_body = {
             "success": True,
             "ai_response": ai_message,
             "sector_id": sector_id,
             "question_num": question_num,
             "usage": result.get("usage", {})
-        }), 200
+        }
+        if conversation is not None:
+            conversation.record(user_message, ai_message)
+            response_body["conversation_id"] = conversation.id
+
+        return jsonify(response_body), 200
+
+    except upstream.ProviderUnavailable:
+        return jsonify({
+            "success": False,
+            "message": "AI service is temporarily unavailable. Please try again shortly."
+        }), 503
 
     except requests.Timeout:
         return jsonify({
@@ -744,7 +868,7 @@ def ai_chat():
         }), 504
 
     except Exception as e:
-        print(f"AI Chat Error: {str(e)}")
+        logger.exception("AI chat failed")
         return jsonify({
             "success": False,
             "message": f"Internal server error: {str(e)}"
@@ -757,7 +881,9 @@ def ai_health_check():
         "success": True,
         "service": "DeepSeek AI Chat",
         "status": "configured",
-        "api_key_present": bool(DEEPSEEK_API_KEY and DEEPSEEK_API_KEY != "YOUR_API_KEY_HERE")
+        "api_key_present": bool(DEEPSEEK_API_KEY and DEEPSEEK_API_KEY != "YOUR_API_KEY_HERE"),
+        "providers": upstream.breaker_states(),
+        "concurrency": upstream.concurrency_states()
     }), 200
 
 
@@ -765,9 +891,9 @@ def ai_health_check():
 # AI HINTS (Groq)
 # ---------------------------
 
-def call_ai_api(question_text):
+def call_ai_api(question_text, budget=None):
     api_key = os.getenv("GROQ_API_KEY", "YOUR API KEY HERE")
-    url = "https://api.groq.com/openai/v1/chat/completions"
+    url = current_app.config.get("GROQ_SERVER") or "https://api.groq.com/openai/v1/chat/completions"
 
     prompt = (
         "Provide a list of 3 short hints for the following programming question. "
@@ -776,7 +902,8 @@ def call_ai_api(question_text):
     )
 
     try:
-        response = requests.post(
+        response = upstream.post(
+            "groq",
             url,
             headers={
                 "Authorization": f"Bearer {api_key}",
@@ -788,7 +915,8 @@ def call_ai_api(question_text):
                 "temperature": 0.7,
                 "max_tokens": 150
             },
-            timeout=10
+            timeout=10,
+            budget=budget
         )
 
         if response.status_code != 200:
@@ -816,7 +944,7 @@ def call_ai_api(question_text):
         ]
 
     except Exception as e:
-        print(f"AI API Error: {e}")
+        logger.warning("AI hint generation failed, using default hints: %s", e)
         return [
             "Consider the input requirements.",
             "Think about the algorithm steps.",
@@ -901,13 +1029,11 @@ def generate_hints():
 @robop_api.route("/users", methods=["POST"])
 def create_user():
     try:
-        print("✅ HIT create_user() in robop_api.py")
         data = request.get_json(silent=True) or {}
-        print("POST /robop/api/users received:", data)
 
         # HARDEN: whitelist fields (prevents email forever)
         allowed = {k: data.get(k) for k in ("uid", "first_name", "last_name", "password")}
-        print("POST /robop/api/users allowed:", allowed)
+        logger.debug("POST /robop/api/users fields: %s", sorted(k for k, v in allowed.items() if v is not None))
 
         user = RobopUser(**{k: v for k, v in allowed.items() if v is not None})
 
@@ -915,5 +1041,5 @@ def create_user():
         return jsonify(success=True)
 
     except Exception as e:
-        traceback.print_exc()  # <-- this will show the exact file/line passing email
+        logger.exception("create_user failed")  # shows the exact file/line passing email
         return jsonify(success=False, error=str(e)), 400
\ No newline at end of file
@@ -1,44 +1,106 @@
+import logging
+import uuid
 import jwt
+from datetime import datetime, timedelta
 from functools import wraps
 from flask import request, jsonify, current_app, g
-from model.robop_user import RobopUser  
+from model.robop_user import RobopUser
+from api import auth_cache
+
+logger = logging.getLogger(__name__)
+
+ROBOP_JWT_COOKIE = "ROBOP_JWT"
+ROBOP_REFRESH_COOKIE = "ROBOP_REFRESH"
+
+
+class RobopPrincipal:
+    """
+    The signed-in robop user as described by the access token's claims.
+
+    `id`, `uid` and `role` come straight from the token, so guards need no
+    query. Any other attribute (progress, badges, to_dict, ...) loads the
+    RobopUser row on first use via the auth cache; call load() to get the
+    ORM object itself.
+    """
+
+    def __init__(self, id, uid, role=None):
+        self.id = id
+        self.uid = uid
+        self.role = role
+        self._user = None
+
+    def load(self):
+        if self._user is None:
+            self._user = auth_cache.cached_user(RobopUser, self.uid)
+        return self._user
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        user = self.load()
+        if user is None:
+            raise AttributeError(name)
+        return getattr(user, name)
+
+
+def issue_tokens(user):
+    """Return (access_token, refresh_token) for a RobopUser."""
+    now = datetime.utcnow()
+    secret = current_app.config["SECRET_KEY"]
+    role = getattr(user, "role", None) or "User"
+
+    access = jwt.encode({
+        "type": "access",
+        "uid": user.uid,
+        "id": user.id,
+        "role": role,
+        "iat": now,
+        "exp": now + timedelta(seconds=current_app.config["ROBOP_ACCESS_TOKEN_TTL"]),
+    }, secret, algorithm="HS256")
+
+    refresh = jwt.encode({
+        "type": "refresh",
+        "uid": user.uid,
+        "id": user.id,
+        "jti": uuid.uuid4().hex,
+        "iat": now,
+        "exp": now + timedelta(seconds=current_app.config["ROBOP_REFRESH_TOKEN_TTL"]),
+    }, secret, algorithm="HS256")
+    return access, refresh
+
 
 def robop_token_required():
     def decorator(fn):
         @wraps(fn)
         def wrapper(*args, **kwargs):
-            print("cookies keys:", list(request.cookies.keys()))
-            print("ROBOP_JWT present:", "ROBOP_JWT" in request.cookies)
-            print("ROBOP_JWT prefix:", (request.cookies.get("ROBOP_JWT", "")[:20]))
-
-            token = request.cookies.get("ROBOP_JWT")
+            token = request.cookies.get(ROBOP_JWT_COOKIE)
             if not token:
                 return jsonify({"success": False, "message": "Missing token"}), 401
 
             try:
-                payload = jwt.decode(
-                    token,
-                    current_app.config["SECRET_KEY"],
-                    algorithms=["HS256"]
-                )
-                print("jwt payload:", payload)
+                payload = auth_cache.verify_token(token)
+            except jwt.ExpiredSignatureError:
+                return jsonify({"success": False, "message": "Token expired", "error": "token_expired"}), 401
             except Exception as e:
-                print("JWT decode error:", repr(e))
+                logger.debug("ROBOP_JWT rejected: %r", e)
                 return jsonify({"success": False, "message": "Invalid token"}), 401
 
             uid = payload.get("uid")
-            if not uid:
+            if not uid or payload.get("type") == "refresh":
                 return jsonify({"success": False, "message": "Token missing uid"}), 401
 
-            user = RobopUser.query.filter_by(_uid=uid).first()
-            print("found user?", bool(user), "uid:", uid)
-
-            if not user:
-                return jsonify({"success": False, "message": "User not found"}), 401
+            if payload.get("type") == "access" and payload.get("id") is not None:
+                user = RobopPrincipal(payload["id"], uid, payload.get("role"))
+            else:
+                # Legacy uid-only login tokens, until they expire
+                user = auth_cache.cached_user(RobopUser, uid)
+                if not user:
+                    logger.debug("ROBOP_JWT user not found: uid=%s", uid)
+                    return jsonify({"success": False, "message": "User not found"}), 401
 
             g.robop_user = user
             g.current_user = user
             return fn(*args, **kwargs)
 
         return wrapper
-    return decorator
\ No newline at end of file
+    return decorator
@@ -1,13 +1,27 @@
 from flask import Blueprint, request, jsonify
 from flask_login import current_user, login_required
+from sqlalchemy import event
+from sqlalchemy.orm import Session
 from model.study import Study
-from __init__ import db
+from api.auth_cache import TTLCache
+from __init__ import app, db
 import json
 from datetime import datetime
 
 # Create a Blueprint for the study API
 study_api = Blueprint('study_api', __name__, url_prefix='/api/study')
 
+# Short-lived per-process cache of /stats results, keyed by user id (None = all records)
+_stats_cache = TTLCache(int(app.config.get("STUDY_STATS_CACHE_MAX_ENTRIES") or 1024))
+
+
+@event.listens_for(Session, "after_flush")
+def _evict_study_stats(session, flush_context):
+    # Any added, changed or deleted record changes its owner's stats and the all-records stats
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Study):
+            _stats_cache.discard_where(lambda key, value: key is None or key == obj.user_id)
+
 # Route to add a new study record or update an existing one
 @study_api.route('', methods=['POST'])
 def add_study_record():
@@ -83,46 +97,13 @@ def get_study_stats():
         # Check if a user is logged in (optional)
         user_id = current_user.id if current_user.is_authenticated else None
         
-        # Base query depending on whether we're filtering by user
-        if user_id and request.args.get('all') != 'true':
-            total_count = Study.query.filter_by(user_id=user_id).count()
-            completed_count = Study.query.filter_by(user_id=user_id, studied=True).count()
-        else:
-            total_count = Study.query.count()
-            completed_count = Study.query.filter_by(studied=True).count()
-        
-        # Calculate completion percentage
-        completion_percentage = (completed_count / total_count * 100) if total_count > 0 else 0
-        
-        # Get topic-specific stats
-        topic_stats = {}
-        if user_id and request.args.get('all') != 'true':
-            topics = db.session.query(Study.topic).filter_by(user_id=user_id).distinct().all()
-        else:
-            topics = db.session.query(Study.topic).distinct().all()
-        
-        for topic_tuple in topics:
-            topic = topic_tuple[0]
-            if user_id and request.args.get('all') != 'true':
-                topic_total = Study.query.filter_by(user_id=user_id, topic=topic).count()
-                topic_completed = Study.query.filter_by(user_id=user_id, topic=topic, studied=True).count()
-            else:
-                topic_total = Study.query.filter_by(topic=topic).count()
-                topic_completed = Study.query.filter_by(topic=topic, studied=True).count()
-            
-            topic_stats[topic] = {
-                'total': topic_total,
-                'completed': topic_completed,
-                'percentage': (topic_completed / topic_total * 100) if topic_total > 0 else 0
-            }
-        
-        # Return the statistics
-        return jsonify({
-            'total_topics': total_count,
-            'completed_topics': completed_count,
-            'completion_percentage': completion_percentage,
-            'topic_stats': topic_stats
-        }), 200
+        # Stats for the current user, or for every record
+        key = user_id if user_id and request.args.get('all') != 'true' else None
+        stats = _stats_cache.get(key)
+        if stats is None:
+            stats = Study.stats(key)
+            _stats_cache.set(key, stats, float(app.config.get("STUDY_STATS_CACHE_TTL") or 0))
+        return jsonify(stats), 200
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
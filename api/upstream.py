@@ -0,0 +1,356 @@
+# api/upstream.py
+"""
+Guards for outbound calls to AI providers (DeepSeek, Groq, OpenAI, Pika).
+
+Each provider gets a circuit breaker that watches a rolling window of recent
+calls. When too many of them fail or run slow the breaker opens and callers
+fail fast instead of waiting out the full HTTP timeout; after a cooldown a
+single trial call is let through to decide whether to close again.
+
+Each provider also gets a concurrency gate: at most N calls in flight, with a
+short bounded wait queue behind them. Callers that cannot get a slot within
+AI_QUEUE_TIMEOUT (or the request's Deadline) fail fast with ProviderBusyError
+instead of piling onto a provider that is already answering with 429s.
+
+A Deadline carries an overall latency budget across several upstream calls.
+
+The errors raised here subclass requests.RequestException, so existing
+`except requests.RequestException` fallbacks keep working unchanged.
+"""
+from collections import deque
+import threading
+import time
+
+import requests
+
+from __init__ import app
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class ProviderUnavailable(requests.RequestException):
+    """Base for the fail-fast errors raised before a provider is called."""
+
+    def __init__(self, provider, reason):
+        super().__init__(f"{provider} is temporarily unavailable ({reason})")
+        self.provider = provider
+
+
+class CircuitOpenError(ProviderUnavailable):
+    """Raised instead of calling a provider whose breaker is open."""
+
+    def __init__(self, provider):
+        super().__init__(provider, "circuit open")
+
+
+class ProviderBusyError(ProviderUnavailable):
+    """Raised when the provider's wait queue is full or the wait timed out."""
+
+    def __init__(self, provider, reason="too many concurrent calls"):
+        super().__init__(provider, reason)
+
+
+class BudgetExceeded(requests.Timeout):
+    """Raised when a Deadline has no time left for another upstream call."""
+
+
+class Deadline:
+    """Overall latency budget shared by every upstream call in one request."""
+
+    def __init__(self, seconds):
+        self.seconds = float(seconds)
+        self.expires_at = time.monotonic() + self.seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, cap) -> float:
+        """Per-call timeout: the call's own cap, clipped to what is left of the budget."""
+        left = self.remaining()
+        if left <= 0:
+            raise BudgetExceeded("Latency budget exhausted")
+        return min(float(cap), left)
+
+
+class CircuitBreaker:
+    def __init__(self, name, window_seconds=60.0, min_calls=5, error_rate=0.5,
+                 slow_call_seconds=8.0, slow_call_rate=0.5, cooldown_seconds=30.0):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.cooldown_seconds = cooldown_seconds
+
+        self._lock = threading.Lock()
+        self._calls = deque()  # (timestamp, ok, latency)
+        self._state = STATE_CLOSED
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._opened_count = 0
+        self._rejected_count = 0
+
+    def _trim(self, now):
+        cutoff = now - self.window_seconds
+        while self._calls and self._calls[0][0] < cutoff:
+            self._calls.popleft()
+
+    def _rates(self):
+        total = len(self._calls)
+        if not total:
+            return 0.0, 0.0, 0.0
+        errors = sum(1 for _, ok, _ in self._calls if not ok)
+        slow = sum(1 for _, _, latency in self._calls if latency >= self.slow_call_seconds)
+        latencies = sorted(latency for _, _, latency in self._calls)
+        p95 = latencies[min(total - 1, int(total * 0.95))]
+        return errors / total, slow / total, p95
+
+    def _open(self, now):
+        self._state = STATE_OPEN
+        self._opened_at = now
+        self._trial_in_flight = False
+        self._opened_count += 1
+
+    def allow(self) -> bool:
+        """True if a call may go out now."""
+        with self._lock:
+            now = time.monotonic()
+            if self._state == STATE_OPEN and now - self._opened_at >= self.cooldown_seconds:
+                self._state = STATE_HALF_OPEN
+                self._trial_in_flight = False
+            if self._state == STATE_CLOSED:
+                return True
+            if self._state == STATE_HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self._rejected_count += 1
+            return False
+
+    def record(self, ok: bool, latency: float):
+        with self._lock:
+            now = time.monotonic()
+            ok = ok and latency < self.slow_call_seconds
+            if self._state == STATE_HALF_OPEN:
+                if ok:
+                    self._state = STATE_CLOSED
+                    self._calls.clear()
+                else:
+                    self._open(now)
+                return
+
+            self._calls.append((now, ok, latency))
+            self._trim(now)
+            if self._state == STATE_CLOSED and len(self._calls) >= self.min_calls:
+                error_rate, slow_rate, _ = self._rates()
+                if error_rate >= self.error_rate or slow_rate >= self.slow_call_rate:
+                    self._open(now)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            error_rate, slow_rate, p95 = self._rates()
+            retry_in = 0.0
+            if self._state == STATE_OPEN:
+                retry_in = max(0.0, self.cooldown_seconds - (now - self._opened_at))
+            return {
+                "state": self._state,
+                "calls_in_window": len(self._calls),
+                "error_rate": round(error_rate, 3),
+                "slow_call_rate": round(slow_rate, 3),
+                "p95_latency_seconds": round(p95, 3),
+                "retry_in_seconds": round(retry_in, 1),
+                "times_opened": self._opened_count,
+                "rejected_calls": self._rejected_count,
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(provider: str) -> CircuitBreaker:
+    with _breakers_lock:
+        breaker = _breakers.get(provider)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                provider,
+                window_seconds=float(app.config.get("AI_BREAKER_WINDOW") or 60),
+                min_calls=int(app.config.get("AI_BREAKER_MIN_CALLS") or 5),
+                error_rate=float(app.config.get("AI_BREAKER_ERROR_RATE") or 0.5),
+                slow_call_seconds=float(app.config.get("AI_BREAKER_SLOW_SECONDS") or 8),
+                slow_call_rate=float(app.config.get("AI_BREAKER_SLOW_RATE") or 0.5),
+                cooldown_seconds=float(app.config.get("AI_BREAKER_COOLDOWN") or 30),
+            )
+            _breakers[provider] = breaker
+        return breaker
+
+
+def breaker_states() -> dict:
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return {name: breaker.snapshot() for name, breaker in sorted(breakers.items())}
+
+
+class ConcurrencyGate:
+    """
+    Bounded concurrency for one provider: `max_in_flight` calls at a time,
+    up to `max_queue` callers waiting (first come, first served) behind them.
+    """
+
+    # Upper bounds (seconds) of the wait-time histogram buckets; the last is +Inf
+    WAIT_BUCKETS = (0.005, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, provider, max_in_flight, max_queue, queue_timeout):
+        self.provider = provider
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._waiters = deque()
+        self._peak_in_flight = 0
+        self._peak_queued = 0
+        self._acquired = 0
+        self._queue_full = 0
+        self._timed_out = 0
+        self._wait_counts = [0] * (len(self.WAIT_BUCKETS) + 1)
+        self._wait_sum = 0.0
+
+    def acquire(self, timeout=None):
+        """Take a slot, waiting at most `timeout` (default queue_timeout) seconds."""
+        timeout = self.queue_timeout if timeout is None else min(timeout, self.queue_timeout)
+        started = time.monotonic()
+        with self._cond:
+            if self._in_flight < self.max_in_flight and not self._waiters:
+                self._take_slot(0.0)
+                return
+            if len(self._waiters) >= self.max_queue:
+                self._queue_full += 1
+                raise ProviderBusyError(self.provider)
+
+            ticket = object()
+            self._waiters.append(ticket)
+            self._peak_queued = max(self._peak_queued, len(self._waiters))
+            try:
+                while self._waiters[0] is not ticket or self._in_flight >= self.max_in_flight:
+                    remaining = started + timeout - time.monotonic()
+                    if remaining <= 0:
+                        self._timed_out += 1
+                        raise ProviderBusyError(self.provider, "timed out waiting for a free slot")
+                    self._cond.wait(remaining)
+            finally:
+                self._waiters.remove(ticket)
+                # The next waiter in line may be able to go now
+                self._cond.notify_all()
+            self._take_slot(time.monotonic() - started)
+
+    def release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def _take_slot(self, waited):
+        self._in_flight += 1
+        self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+        self._acquired += 1
+        self._wait_sum += waited
+        for i, bound in enumerate(self.WAIT_BUCKETS):
+            if waited <= bound:
+                self._wait_counts[i] += 1
+                break
+        else:
+            self._wait_counts[-1] += 1
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            # Cumulative buckets, Prometheus style: count of waits <= bound
+            buckets, running = {}, 0
+            for bound, count in zip(list(self.WAIT_BUCKETS) + ["+Inf"], self._wait_counts):
+                running += count
+                buckets[str(bound)] = running
+            return {
+                "max_in_flight": self.max_in_flight,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "queued": len(self._waiters),
+                "peak_in_flight": self._peak_in_flight,
+                "peak_queued": self._peak_queued,
+                "acquired": self._acquired,
+                "rejected_queue_full": self._queue_full,
+                "rejected_timeout": self._timed_out,
+                "wait_seconds": {
+                    "buckets": buckets,
+                    "count": self._acquired,
+                    "sum": round(self._wait_sum, 3),
+                },
+            }
+
+
+_gates = {}
+_gates_lock = threading.Lock()
+
+
+def get_gate(provider: str) -> ConcurrencyGate:
+    with _gates_lock:
+        gate = _gates.get(provider)
+        if gate is None:
+            per_provider = app.config.get("AI_PROVIDER_MAX_IN_FLIGHT") or {}
+            gate = ConcurrencyGate(
+                provider,
+                max_in_flight=int(per_provider.get(provider) or app.config.get("AI_MAX_IN_FLIGHT") or 8),
+                max_queue=int(app.config.get("AI_MAX_QUEUE") or 16),
+                queue_timeout=float(app.config.get("AI_QUEUE_TIMEOUT") or 5),
+            )
+            _gates[provider] = gate
+        return gate
+
+
+def concurrency_states() -> dict:
+    with _gates_lock:
+        gates = dict(_gates)
+    return {name: gate.snapshot() for name, gate in sorted(gates.items())}
+
+
+def _is_upstream_failure(response) -> bool:
+    return response.status_code >= 500 or response.status_code == 429
+
+
+def post(provider: str, url: str, *, timeout, budget=None, **kwargs) -> requests.Response:
+    """
+    requests.post() through the provider's concurrency gate and circuit breaker.
+
+    Raises ProviderBusyError when no slot frees up in time, CircuitOpenError
+    without touching the network when the breaker is open, and BudgetExceeded
+    when `budget` has run out.
+    """
+    breaker = get_breaker(provider)
+    gate = get_gate(provider)
+    if budget:
+        budget.timeout(timeout)  # raises BudgetExceeded before we queue
+    gate.acquire(timeout=budget.remaining() if budget else None)
+    try:
+        # Anything that can raise before the request goes ahead of allow():
+        # a granted half-open trial must always end in record()
+        effective_timeout = budget.timeout(timeout) if budget else timeout
+        # Checked after queueing so a half-open trial call is never stranded
+        if not breaker.allow():
+            raise CircuitOpenError(provider)
+
+        started = time.monotonic()
+        try:
+            response = requests.post(url, timeout=effective_timeout, **kwargs)
+        except BaseException:
+            breaker.record(False, time.monotonic() - started)
+            raise
+        breaker.record(not _is_upstream_failure(response), time.monotonic() - started)
+        return response
+    finally:
+        gate.release()
@@ -6,6 +6,8 @@ from __init__ import app, db
 from api.jwt_authorize import token_required
 from model.user import User
 from model.github import GitHubUser
+from model.passwords import is_password_hash
+import logging
 import os
 
 user_api = Blueprint('user_api', __name__,
@@ -13,6 +15,7 @@ user_api = Blueprint('user_api', __name__,
 
 # API docs https://flask-restful.readthedocs.io/en/latest/api.html
 api = Api(user_api)
+logger = logging.getLogger(__name__)
 
 class UserAPI:        
     class _ID(Resource):  # Individual identification API operation
@@ -49,7 +52,7 @@ class UserAPI:
                     user_obj = User.query.filter_by(_uid=uid).first()
                     # Process sections if provided
                     if user_obj is not None:
-                        print("Creating:", user_obj.uid)
+                        logger.debug("Bulk create: adding sections for %s", user_obj.uid)
                         abbreviations = [section["abbreviation"] for section in user.get('sections', [])]
                         if len(abbreviations) > 0:  # Check if the list is not empty
                             section_obj = user_obj.add_sections(abbreviations)
@@ -100,7 +103,7 @@ class UserAPI:
             #1: Setup minimal User object using __init__ method
             password = body.get('password')
             if password is not None:
-                if len(password) < 8 and not password.startswith("pbkdf2:sha256:"):
+                if len(password) < 8 and not is_password_hash(password):
                     return {'message': 'Password must be at least 8 characters'}, 400
                 user_obj = User(name=name, uid=uid, password=password)
             else:
@@ -396,7 +399,7 @@ class UserAPI:
                                 path='/',
                                 samesite='Lax'
                             )
-                        print(f"Token set: {token}")
+                        logger.debug("Token set for %s", user._uid)
                         return resp 
                     except Exception as e:
                         return {
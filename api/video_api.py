@@ -0,0 +1,320 @@
+# api/video_api.py
+"""
+Background Pika video generation.
+
+Request handlers call submit_video_job(prompt), which records a VideoJob row
+and returns immediately. A daemon thread in each worker process submits queued
+jobs to Pika and polls the provider status URL with exponential backoff.
+Clients follow progress through GET /api/video/<job_id>.
+"""
+from datetime import datetime, timedelta
+import os
+import random
+import re
+import threading
+
+import requests
+from flask import Blueprint, jsonify
+from sqlalchemy.exc import IntegrityError
+
+from __init__ import app, db
+from api import upstream
+from model.video_job import VideoJob, prompt_key
+
+video_api = Blueprint("video_api", __name__)
+
+# Jobs that failed are retried when the same prompt is submitted again,
+# but not more often than this.
+FAILED_RETRY_AFTER = timedelta(seconds=60)
+# How long a worker holds a job while it is talking to Pika.
+CLAIM_LEASE = timedelta(seconds=60)
+# Longest the worker sleeps when nothing is due.
+IDLE_WAIT_SECONDS = 30.0
+BATCH_SIZE = 10
+
+_worker_lock = threading.Lock()
+_worker_wakeup = threading.Event()
+_worker_pid = None
+
+
+def _find_video_url(payload):
+    if isinstance(payload, str) and payload.startswith("http") and re.search(r"\.(mp4|mov|webm)(\?|$)", payload):
+        return payload
+    if isinstance(payload, dict):
+        for value in payload.values():
+            found = _find_video_url(value)
+            if found:
+                return found
+    if isinstance(payload, list):
+        for item in payload:
+            found = _find_video_url(item)
+            if found:
+                return found
+    return ""
+
+
+def _status_path(job_id) -> str:
+    return f"/api/video/{job_id}"
+
+
+def _job_result(job: VideoJob) -> dict:
+    """Shape a job the way callers of the old synchronous _call_pika_video expect."""
+    if job.status == VideoJob.STATUS_READY and job.video_url:
+        return {"success": True, "video_url": job.video_url, "video_job_id": job.id}
+    if job.status == VideoJob.STATUS_FAILED:
+        return {"success": False, "message": job.error or "PIKA error", "video_job_id": job.id}
+    return {
+        "success": True,
+        "video_status": "pending",
+        "video_job_id": job.id,
+        "video_request_id": job.id,
+        "video_status_url": _status_path(job.id)
+    }
+
+
+def submit_video_job(prompt: str) -> dict:
+    """
+    Queue a video for `prompt` and return without waiting on Pika.
+    Identical prompts share a single job.
+    """
+    api_key = app.config.get("PIKA_API_KEY")
+    server = app.config.get("PIKA_SERVER")
+    model = app.config.get("PIKA_MODEL")
+    if not api_key or not server:
+        return {"success": False, "message": "Video generation is not configured (PIKA_SERVER/PIKA_API_KEY missing)"}
+
+    key = prompt_key(prompt, model)
+    now = datetime.utcnow()
+    job = VideoJob.query.filter_by(prompt_hash=key).first()
+
+    if job is None:
+        job = VideoJob(prompt_hash=key, prompt=prompt, model=model, next_poll_at=now)
+        db.session.add(job)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Another request queued the same prompt first
+            db.session.rollback()
+            job = VideoJob.query.filter_by(prompt_hash=key).first()
+    elif job.status == VideoJob.STATUS_FAILED and (job.updated_at or now) <= now - FAILED_RETRY_AFTER:
+        job.status = VideoJob.STATUS_QUEUED
+        job.error = None
+        job.polls = 0
+        job.provider_request_id = None
+        job.status_url = None
+        job.next_poll_at = now
+        job.created_at = now
+        job.updated_at = now
+        db.session.commit()
+
+    if job is None:
+        return {"success": False, "message": "PIKA error"}
+
+    if not job.is_done:
+        _ensure_worker()
+        _worker_wakeup.set()
+    return _job_result(job)
+
+
+# ----------------------------
+# Worker
+# ----------------------------
+
+def _backoff(polls: int) -> timedelta:
+    initial = float(app.config.get("PIKA_POLL_INITIAL") or 1.5)
+    ceiling = float(app.config.get("PIKA_POLL_MAX") or 30)
+    delay = min(ceiling, initial * (2 ** max(polls - 1, 0)))
+    return timedelta(seconds=delay * random.uniform(0.9, 1.1))
+
+
+def _pika_headers(json_body=False) -> dict:
+    headers = {"Authorization": f"Bearer {app.config.get('PIKA_API_KEY')}"}
+    if json_body:
+        headers["Content-Type"] = "application/json"
+    return headers
+
+
+def _finish(job: VideoJob, status: str, video_url=None, error=None):
+    job.status = status
+    job.video_url = video_url
+    job.error = error
+    job.updated_at = datetime.utcnow()
+
+
+def _reschedule(job: VideoJob, now: datetime):
+    job.polls += 1
+    job.updated_at = now
+    timeout = float(app.config.get("PIKA_JOB_TIMEOUT") or 600)
+    if job.created_at and (now - job.created_at).total_seconds() > timeout:
+        _finish(job, VideoJob.STATUS_FAILED, error="Video generation timed out")
+        return
+    job.next_poll_at = now + _backoff(job.polls)
+
+
+def _submit_to_pika(job: VideoJob):
+    payload = {"prompt": job.prompt}
+    if job.model:
+        payload["model"] = job.model
+    now = datetime.utcnow()
+    try:
+        response = upstream.post(
+            "pika",
+            app.config.get("PIKA_SERVER"),
+            headers=_pika_headers(json_body=True),
+            json=payload,
+            timeout=30
+        )
+    except requests.RequestException:
+        _reschedule(job, now)
+        return
+
+    if response.status_code != 200:
+        _finish(job, VideoJob.STATUS_FAILED, error="PIKA request failed")
+        return
+
+    try:
+        pika_json = response.json()
+    except ValueError:
+        _finish(job, VideoJob.STATUS_FAILED, error="PIKA error")
+        return
+
+    video_url = _find_video_url(pika_json)
+    if video_url:
+        _finish(job, VideoJob.STATUS_READY, video_url=video_url)
+        return
+
+    if not isinstance(pika_json, dict):
+        _finish(job, VideoJob.STATUS_FAILED, error="PIKA error")
+        return
+
+    request_id = pika_json.get("id") or pika_json.get("request_id") or pika_json.get("job_id")
+    status_url = pika_json.get("status_url")
+    status_server = app.config.get("PIKA_STATUS_SERVER")
+    if request_id and status_server and not status_url:
+        status_url = f"{status_server.rstrip('/')}/{request_id}"
+
+    if not status_url:
+        _finish(job, VideoJob.STATUS_FAILED, error="PIKA returned no status URL")
+        return
+
+    job.status = VideoJob.STATUS_RUNNING
+    job.provider_request_id = str(request_id) if request_id else None
+    job.status_url = status_url
+    job.polls = 0
+    _reschedule(job, now)
+
+
+def _poll_pika(job: VideoJob):
+    now = datetime.utcnow()
+    try:
+        response = requests.get(job.status_url, headers=_pika_headers(), timeout=20)
+        status_json = response.json() if response.status_code == 200 else None
+    except (requests.RequestException, ValueError):
+        status_json = None
+
+    if status_json is not None:
+        video_url = _find_video_url(status_json)
+        if video_url:
+            _finish(job, VideoJob.STATUS_READY, video_url=video_url)
+            return
+        provider_status = str(status_json.get("status") or "").lower() if isinstance(status_json, dict) else ""
+        if provider_status in {"failed", "error", "cancelled", "canceled"}:
+            _finish(job, VideoJob.STATUS_FAILED, error="PIKA reported a failed video")
+            return
+
+    _reschedule(job, now)
+
+
+def _claim(job: VideoJob, now: datetime) -> bool:
+    """Take a short lease on a job so only one process works on it."""
+    claimed = (
+        VideoJob.query
+        .filter(VideoJob.id == job.id, VideoJob.next_poll_at == job.next_poll_at)
+        .update({"next_poll_at": now + CLAIM_LEASE}, synchronize_session=False)
+    )
+    db.session.commit()
+    return claimed == 1
+
+
+def _run_due_jobs() -> float:
+    """Process jobs that are due and return how long to sleep before the next pass."""
+    now = datetime.utcnow()
+    active = (VideoJob.STATUS_QUEUED, VideoJob.STATUS_RUNNING)
+    due = (
+        VideoJob.query
+        .filter(VideoJob.status.in_(active), VideoJob.next_poll_at <= now)
+        .order_by(VideoJob.next_poll_at.asc())
+        .limit(BATCH_SIZE)
+        .all()
+    )
+
+    for job in due:
+        if not _claim(job, now):
+            continue
+        db.session.refresh(job)
+        if job.status == VideoJob.STATUS_QUEUED:
+            _submit_to_pika(job)
+        else:
+            _poll_pika(job)
+        db.session.commit()
+
+    if len(due) == BATCH_SIZE:
+        return 0.0
+
+    next_job = (
+        VideoJob.query
+        .filter(VideoJob.status.in_(active))
+        .order_by(VideoJob.next_poll_at.asc())
+        .first()
+    )
+    if next_job is None:
+        return IDLE_WAIT_SECONDS
+    wait = (next_job.next_poll_at - datetime.utcnow()).total_seconds()
+    return min(max(wait, 0.0), IDLE_WAIT_SECONDS)
+
+
+def _worker_loop():
+    while True:
+        try:
+            with app.app_context():
+                delay = _run_due_jobs()
+        except Exception as exc:
+            app.logger.warning("Video worker error: %s", exc)
+            delay = IDLE_WAIT_SECONDS
+        _worker_wakeup.wait(delay)
+        _worker_wakeup.clear()
+
+
+def _ensure_worker():
+    """Start the polling thread once per process (gunicorn forks after import)."""
+    global _worker_pid
+    if _worker_pid == os.getpid():
+        return
+    with _worker_lock:
+        if _worker_pid == os.getpid():
+            return
+        thread = threading.Thread(target=_worker_loop, name="pika-video-worker", daemon=True)
+        thread.start()
+        _worker_pid = os.getpid()
+
+
+# ----------------------------
+# Routes
+# ----------------------------
+
+@video_api.route("/video/<int:job_id>", methods=["GET"])
+def get_video_job(job_id):
+    job = VideoJob.query.get(job_id)
+    if not job:
+        return jsonify({"success": False, "message": "Video job not found"}), 404
+
+    if not job.is_done:
+        # Resume polling in this process if the job outlived the one that queued it
+        _ensure_worker()
+
+    return jsonify({"success": True, "job": job.to_dict()}), 200
+
+
+@video_api.route("/api/video/<int:job_id>", methods=["GET"])
+def get_video_job_api(job_id):
+    return get_video_job(job_id)
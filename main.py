@@ -1,5 +1,4 @@
 # imports from flask
-from datetime import datetime
 from urllib.parse import urljoin, urlparse
 import os
 import requests
@@ -11,6 +10,8 @@ from flask import (
 )
 from flask_login import current_user, login_user, logout_user, login_required
 from flask.cli import AppGroup
+from flask_migrate import upgrade as db_upgrade
+import click
 from werkzeug.security import generate_password_hash
 from dotenv import load_dotenv
 from api.jwt_authorize import token_required
@@ -19,7 +20,7 @@ from api.jwt_authorize import token_required
 from flask_cors import CORS
 
 # import "objects" from "this" project
-from __init__ import app, db, login_manager  # Key Flask objects
+from __init__ import app, db, login_manager, migrate  # Key Flask objects
 # API endpoints
 from api.user import user_api
 from api.python_exec_api import python_exec_api
@@ -56,14 +57,21 @@ from model.study import Study, initStudies
 from model.classroom import Classroom
 from model.persona import Persona, initPersonas, initPersonaUsers
 from model.post import Post, init_posts
-from model.microblog import MicroBlog, Topic, initMicroblogs
+from model.search import init_search, reindex as reindex_search
+from model.microblog import MicroBlog, Topic, initMicroblogs, migrate_microblog_data
 from hacks.jokes import initJokes
 from api.robop_api import robop_api
-from model.robop_user import RobopUser, UserBadge, initRobopUsers
+from model.robop_user import RobopUser, initRobopUsers, robop_user_badge_summary, ROBOP_USER_SORTS
 from api.endgame_api import endgame_api
 from api.debug_challenge_api import debug_challenge_api
+from api.video_api import video_api
+from api.rate_limit import init_rate_limiter
+from api.logging_setup import init_logging
+from model.passwords import init_password_pool
+from api.db_tuning import db_stats
 from model.endgame import init_endgame_data
 from model.debug_challenge import init_debug_challenge_data
+from model.seeding import Seed, seed_on_boot, check_seeds, run_seeds
 
 # Load environment variables
 load_dotenv()
@@ -86,6 +94,7 @@ CORS(
     resources={r"/*": {"origins": "*"}},
     supports_credentials=True,
     allow_headers=["Content-Type", "Authorization"],
+    expose_headers=["RateLimit-Limit", "RateLimit-Remaining", "RateLimit-Reset", "Retry-After", "X-Request-ID", "X-Next-Cursor"],
     methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
 )
 
@@ -112,19 +121,41 @@ app.register_blueprint(post_api)
 app.register_blueprint(robop_api)
 app.register_blueprint(endgame_api)
 app.register_blueprint(debug_challenge_api)
+app.register_blueprint(video_api)
 # app.register_blueprint(announcement_api) ##temporary revert
 #app.register_blueprint(pseudocode_bank_api)
 app.register_blueprint(pseudocodeanswer_bank_api)
 app.register_blueprint(character_api)
 
+# Fork the password hashing workers while this process is still single-threaded
+init_password_pool()
+
+# Queue-based logging with request ids (before other request hooks, so they log with the id)
+init_logging(app)
+
+# Token-bucket limits on AI and code-execution routes
+init_rate_limiter(app)
+
+# Seed manifest, run in order: a step reruns only when its source files change (see model/seeding.py)
+SEEDS = [
+    Seed("schema", db.create_all, None),
+    Seed("migrations", db_upgrade, [migrate.directory]),
+    Seed("robop_users", initRobopUsers, [initRobopUsers]),
+    Seed("endgame", init_endgame_data, [init_endgame_data]),
+    Seed("pseudocode_questions", lambda: initPseudocodeQuestionBank(force_recreate=True), [initPseudocodeQuestionBank]),
+    Seed("pseudocode_answers", lambda: initPseudocodeAnswerBank(force_recreate=True),
+         [initPseudocodeQuestionBank, initPseudocodeAnswerBank]),
+    Seed("debug_challenges", init_debug_challenge_data, [init_debug_challenge_data]),
+    Seed("microblog_data", migrate_microblog_data, [migrate_microblog_data]),
+    Seed("search", init_search, [init_search]),
+]
+
 # Jokes file initialization
 with app.app_context():
     initJokes()
-    initRobopUsers()
-    init_endgame_data()
-    initPseudocodeQuestionBank(force_recreate=True)
-    initPseudocodeAnswerBank(force_recreate=True)
-    init_debug_challenge_data()
+
+# One version check per worker; out-of-date steps run in a single worker
+seed_on_boot(SEEDS)
 
 login_manager.login_view = "login"
 
@@ -175,7 +206,7 @@ def page_not_found(e):
 
 @app.route('/')
 def index():
-    print("Home:", current_user)
+    app.logger.debug("Home: %s", current_user)
     return render_template("index.html")
 
 @app.route('/ending/<int:player_id>')
@@ -314,74 +345,23 @@ def add_robop_user():
 
 @app.route("/robop/users")
 def robop_users():
-    users = RobopUser.query.order_by(RobopUser.id.asc()).all()
-
-    # Badge tier ranking (higher = better)
-    # Anything unknown (like "Seed Badge") becomes 0
-    BADGE_RANK = {
-        "Gold": 4,
-        "Silver": 3,
-        "Bronze": 2,
-        "Participant": 1,
-    }
-
-    def badge_rank(name: str) -> int:
-        return BADGE_RANK.get((name or "").strip(), 0)
-
-    def best_badge_key(ub: UserBadge):
-        """
-        Sort key where "best" means:
-        - Higher badge tier is better
-        - Fewer attempts is better
-        - Not using autofill is better
-        - More recent is better
-        """
-        tier = badge_rank(getattr(ub, "_badge_name", ""))
-        attempts = getattr(ub, "_attempts", 10**9)
-        used_autofill = bool(getattr(ub, "_used_autofill", False))
-        dt = getattr(ub, "_date_earned", None) or datetime.min
-
-        # We want max() by this key, so keep "good" values higher:
-        # -tier? No, tier already higher is better
-        # -attempts: fewer is better -> invert attempts
-        # used_autofill: False better -> invert to 1/0
-        return (tier, -attempts, 0 if used_autofill else 1, dt)
-
-    robop_user_data = []
-
-    for u in users:
-        # Use relationship if available; otherwise fall back to query
-        badges = list(getattr(u, "badges", []) or [])
-        badges.sort(key=lambda b: getattr(b, "_date_earned", datetime.min), reverse=True)
-
-        badge_count = len(badges)
-        last_earned = badges[0] if badges else None
-        best_badge = max(badges, key=best_badge_key) if badges else None
-
-        robop_user_data.append({
-            "id": u.id,
-            "uid": u.uid,
-            "first_name": u.first_name,
-            "last_name": u.last_name,
-            "created": u._created.isoformat() if getattr(u, "_created", None) else None,
-            "last_login": u._last_login.isoformat() if getattr(u, "_last_login", None) else None,
-
-            "badge_count": badge_count,
-
-            # best badge details
-            "best_badge": best_badge._badge_name if best_badge else None,
-            "best_sector": best_badge._sector_id if best_badge else None,
-            "best_module": best_badge._module_id if best_badge else None,
-            "best_attempts": best_badge._attempts if best_badge else None,
-            "best_used_autofill": best_badge._used_autofill if best_badge else None,
-            "best_earned": best_badge._date_earned.isoformat() if best_badge and best_badge._date_earned else None,
-
-            # last earned details
-            "last_badge": last_earned._badge_name if last_earned else None,
-            "last_earned": last_earned._date_earned.isoformat() if last_earned and last_earned._date_earned else None,
-        })
-
-    return render_template("robop_users.html", robop_user_data=robop_user_data)
+    # Server-side paging and sorting; badge summaries are aggregated in SQL
+    page = max(request.args.get("page", 1, type=int) or 1, 1)
+    per_page = min(max(request.args.get("per_page", 50, type=int) or 50, 1), 500)
+    sort = request.args.get("sort", "id")
+    if sort not in ROBOP_USER_SORTS:
+        sort = "id"
+    direction = "desc" if request.args.get("dir") == "desc" else "asc"
+
+    robop_user_data, total = robop_user_badge_summary(page, per_page, sort, direction == "desc")
+    pages = max((total + per_page - 1) // per_page, 1)
+
+    return render_template(
+        "robop_users.html",
+        robop_user_data=robop_user_data,
+        page=page, pages=pages, per_page=per_page, total=total,
+        sort=sort, direction=direction
+    )
 
 @app.route('/uploads/<path:filename>')
 def uploaded_file(filename):
@@ -410,6 +390,14 @@ def reset_password(user_id):
         return jsonify({'message': 'Password reset successfully'}), 200
     return jsonify({'error': 'Password reset failed'}), 500
 
+@app.route('/api/db/health')
+@token_required("Admin")
+def db_health():
+    """Connection pool state and metrics for this worker, plus the SQLite PRAGMAs in effect. Admin only."""
+    if getattr(g.current_user, 'role', None) != 'Admin':
+        return jsonify({'message': 'Unauthorized.'}), 401
+    return jsonify(db_stats())
+
 # Create an AppGroup for custom commands
 custom_cli = AppGroup('custom', help='Custom commands')
 
@@ -420,6 +408,24 @@ def generate_data():
     initPersonas()
     initPersonaUsers()
 
+@custom_cli.command('seed')
+@click.option('--force', is_flag=True, help='Rerun every step, not only the out-of-date ones.')
+def seed_command(force):
+    """Create missing tables and run the out-of-date seed steps."""
+    ran = run_seeds(SEEDS, force=force)
+    print(f"Ran seed steps: {', '.join(ran)}" if ran else "Seed data is current")
+
+@custom_cli.command('seed_status')
+def seed_status_command():
+    """List the seed steps whose data changed since they last ran."""
+    pending = check_seeds(SEEDS)
+    print(f"Out of date: {', '.join(pending)}" if pending else "Seed data is current")
+
+@custom_cli.command('reindex_search')
+def reindex_search_command():
+    """Rebuild the full-text indexes for microblogs, posts and topics."""
+    reindex_search()
+
 app.cli.add_command(custom_cli)
 
 # ✅ Run server on a stable port (frontend expects 8320)
@@ -0,0 +1,64 @@
+"""Indexes for the hot per-user / per-player lookups
+
+Revision ID: 3f1c9a2b7d4e
+Revises:
+Create Date: 2026-10-19 09:00:00.000000
+
+Tables are still created by db.create_all() at startup, which only adds
+indexes to tables it creates. This revision brings existing databases up to
+the indexes declared on the models. Each index is created only when missing,
+and tables that do not exist yet are skipped (create_all will build them with
+their indexes), so it is safe to run against any database state.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c9a2b7d4e'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+# (table, index name, columns), matching the __table_args__ on each model
+INDEXES = [
+    ('UserBadge', 'ix_UserBadge_user_date', ['user_id', '_date_earned']),
+    ('PlayerBadges', 'ix_PlayerBadges_player_time', ['player_id', 'timestamp']),
+    ('DebugBadgeEarned', 'ix_DebugBadgeEarned_player_time', ['player_id', 'timestamp']),
+    ('DebugHintUsage', 'ix_DebugHintUsage_player_level_challenge', ['player_id', 'level', 'challenge_id']),
+    ('DebugHintUsage', 'ix_DebugHintUsage_player_level_updated', ['player_id', 'level', 'updated_at']),
+    ('microblogs', 'ix_microblogs_timestamp_id', ['_timestamp', 'id']),
+    ('microblogs', 'ix_microblogs_topic_timestamp_id', ['_topic_id', '_timestamp', 'id']),
+    ('microblogs', 'ix_microblogs_user_timestamp_id', ['_user_id', '_timestamp', 'id']),
+    ('posts', 'ix_posts_parent_timestamp_id', ['_parent_id', '_timestamp', 'id']),
+    ('posts', 'ix_posts_page_parent_timestamp_id', ['_page_url', '_parent_id', '_timestamp', 'id']),
+    ('posts', 'ix_posts_user_parent_timestamp_id', ['_user_id', '_parent_id', '_timestamp', 'id']),
+    ('study', 'ix_study_user_topic', ['user_id', 'topic']),
+    ('feedbacks', 'ix_feedbacks_github_username_created', ['github_username', 'created_at']),
+]
+
+
+def _existing():
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+    return tables, {
+        (table, index['name'])
+        for table in tables
+        for index in inspector.get_indexes(table)
+    }
+
+
+def upgrade():
+    tables, indexes = _existing()
+    for table, name, columns in INDEXES:
+        if table in tables and (table, name) not in indexes:
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    tables, indexes = _existing()
+    for table, name, columns in reversed(INDEXES):
+        if (table, name) in indexes:
+            op.drop_index(name, table_name=table)
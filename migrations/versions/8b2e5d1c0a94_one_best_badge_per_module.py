@@ -0,0 +1,78 @@
+"""One best UserBadge row per (user, sector, module)
+
+Revision ID: 8b2e5d1c0a94
+Revises: 3f1c9a2b7d4e
+Create Date: 2026-10-19 11:00:00.000000
+
+Before the badge upsert, every submission added a UserBadge row. This copies
+all existing rows into UserBadgeLog (when that table exists and is still
+empty), keeps only the best row per module, in the order of
+best_badge_order(), and then adds the unique index that the upsert relies on.
+The downgrade only drops the index; removed duplicates stay in UserBadgeLog.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b2e5d1c0a94'
+down_revision = '3f1c9a2b7d4e'
+branch_labels = None
+depends_on = None
+
+
+INDEX = 'uq_UserBadge_user_sector_module'
+COLUMNS = ['user_id', '_sector_id', '_module_id']
+# Same tiers as BADGE_RANK in model/robop_user.py
+BADGE_RANK = {'Gold': 4, 'Silver': 3, 'Bronze': 2, 'Participant': 1}
+
+badges = sa.table(
+    'UserBadge',
+    sa.column('id'), sa.column('user_id'), sa.column('_sector_id'), sa.column('_module_id'),
+    sa.column('_attempts'), sa.column('_used_autofill'), sa.column('_badge_name'), sa.column('_date_earned'),
+)
+log = sa.table(
+    'UserBadgeLog',
+    sa.column('user_id'), sa.column('_sector_id'), sa.column('_module_id'),
+    sa.column('_attempts'), sa.column('_used_autofill'), sa.column('_badge_name'), sa.column('_date_earned'),
+)
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = inspector.get_table_names()
+    if 'UserBadge' not in tables:
+        return
+    if INDEX in {index['name'] for index in inspector.get_indexes('UserBadge')}:
+        return
+
+    if 'UserBadgeLog' in tables and bind.execute(sa.select(sa.func.count()).select_from(log)).scalar() == 0:
+        history = [c.name for c in log.columns]
+        bind.execute(log.insert().from_select(history, sa.select(*[badges.c[name] for name in history])))
+
+    tier = sa.case(
+        *[(sa.func.trim(badges.c._badge_name) == name, rank) for name, rank in BADGE_RANK.items()],
+        else_=0,
+    )
+    ranked = sa.select(
+        badges.c.id,
+        sa.func.row_number().over(
+            partition_by=[badges.c[name] for name in COLUMNS],
+            order_by=[tier.desc(), badges.c._attempts.asc(), badges.c._used_autofill.asc(),
+                      badges.c._date_earned.desc(), badges.c.id.desc()],
+        ).label('rn'),
+    ).subquery()
+    # Selecting through a derived table lets MySQL delete from the table it reads
+    keep = sa.select(ranked.c.id).where(ranked.c.rn == 1).subquery()
+    bind.execute(badges.delete().where(badges.c.id.not_in(sa.select(keep.c.id))))
+
+    op.create_index(INDEX, 'UserBadge', COLUMNS, unique=True)
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'UserBadge' in inspector.get_table_names() and \
+            INDEX in {index['name'] for index in inspector.get_indexes('UserBadge')}:
+        op.drop_index(INDEX, table_name='UserBadge')
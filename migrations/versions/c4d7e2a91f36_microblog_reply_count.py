@@ -0,0 +1,41 @@
+"""microblogs._reply_count
+
+Revision ID: c4d7e2a91f36
+Revises: 8b2e5d1c0a94
+Create Date: 2026-10-19 14:00:00.000000
+
+Replies moved to microblog_replies with a denormalized count on the post.
+Tables created after that change already have the column; older ones get
+it here, defaulting to 0. migrate_json_replies() (microblog_data seed step)
+then backfills counts for replies still stored in the post's JSON.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d7e2a91f36'
+down_revision = '8b2e5d1c0a94'
+branch_labels = None
+depends_on = None
+
+
+def _columns():
+    inspector = sa.inspect(op.get_bind())
+    if 'microblogs' not in inspector.get_table_names():
+        return None
+    return {column['name'] for column in inspector.get_columns('microblogs')}
+
+
+def upgrade():
+    columns = _columns()
+    if columns is not None and '_reply_count' not in columns:
+        op.add_column('microblogs', sa.Column('_reply_count', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    columns = _columns()
+    if columns is not None and '_reply_count' in columns:
+        with op.batch_alter_table('microblogs') as batch_op:
+            batch_op.drop_column('_reply_count')
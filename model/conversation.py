@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta
+import re
+import uuid
+
+from __init__ import app, db
+
+
+class Conversation(db.Model):
+    """
+    Server-side chat history, so clients only send the newest message.
+
+    Only the most recent turns are kept verbatim; older turns are folded into a
+    short text summary, which keeps both the row and the upstream prompt bounded.
+    Conversations idle longer than CHAT_HISTORY_TTL are dropped.
+    """
+    __tablename__ = "Conversations"
+
+    id = db.Column(db.String(32), primary_key=True)
+    kind = db.Column(db.String(32), nullable=False)
+    summary = db.Column(db.Text, nullable=False, default="")
+    turns = db.Column(db.JSON, nullable=False, default=list)
+    turn_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    @staticmethod
+    def _ttl() -> timedelta:
+        return timedelta(seconds=float(app.config.get("CHAT_HISTORY_TTL") or 6 * 60 * 60))
+
+    @classmethod
+    def open(cls, conversation_id, kind: str) -> "Conversation":
+        """
+        Return the live conversation with this id, or a new unsaved one if the
+        id is missing, unknown, expired, or belongs to a different chat.
+        """
+        conversation = cls.query.get(str(conversation_id)) if conversation_id else None
+        if conversation is not None and conversation.kind == kind:
+            if conversation.updated_at >= datetime.utcnow() - cls._ttl():
+                return conversation
+            db.session.delete(conversation)
+            db.session.commit()
+        return cls(id=uuid.uuid4().hex, kind=kind, summary="", turns=[], turn_count=0)
+
+    def context(self) -> list:
+        """Messages to replay upstream: the summary (if any) followed by recent turns."""
+        messages = []
+        if self.summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation: {self.summary}"})
+        messages.extend(self.turns or [])
+        return messages
+
+    def record(self, user_message: str, reply: str):
+        """Append one user/assistant exchange, compact old turns, and save."""
+        limit = int(app.config.get("CHAT_MESSAGE_MAX_CHARS") or 4000)
+        turns = list(self.turns or []) + [
+            {"role": "user", "content": (user_message or "")[:limit]},
+            {"role": "assistant", "content": (reply or "")[:limit]},
+        ]
+        self.turn_count = (self.turn_count or 0) + 2
+        self.turns = self._compact(turns)
+        self.updated_at = datetime.utcnow()
+
+        is_new = self not in db.session
+        if is_new:
+            db.session.add(self)
+        db.session.commit()
+        if is_new:
+            prune_conversations()
+
+    def _compact(self, turns: list) -> list:
+        keep = int(app.config.get("CHAT_HISTORY_MAX_TURNS") or 12)
+        if len(turns) <= keep:
+            return turns
+
+        older, recent = turns[:-keep], turns[-keep:]
+        notes = [_summarize_turn(turn) for turn in older]
+        summary = " ".join(part for part in [self.summary] + notes if part)
+
+        max_chars = int(app.config.get("CHAT_SUMMARY_MAX_CHARS") or 1500)
+        if len(summary) > max_chars:
+            # Keep the most recent part of the summary
+            summary = "…" + summary[-(max_chars - 1):]
+        self.summary = summary
+        return recent
+
+
+def _summarize_turn(turn: dict) -> str:
+    """One short line per turn: the first sentence, trimmed."""
+    speaker = "Student" if turn.get("role") == "user" else "Assistant"
+    text = " ".join(str(turn.get("content") or "").split())
+    if not text:
+        return ""
+    first = re.split(r"(?<=[.!?])\s", text, maxsplit=1)[0]
+    if len(first) > 160:
+        first = first[:157].rstrip() + "..."
+    return f"{speaker}: {first}"
+
+
+def prune_conversations():
+    """Delete expired conversations and cap how many are kept."""
+    cutoff = datetime.utcnow() - Conversation._ttl()
+    Conversation.query.filter(Conversation.updated_at < cutoff).delete(synchronize_session=False)
+
+    max_rows = int(app.config.get("CHAT_MAX_CONVERSATIONS") or 5000)
+    overflow = Conversation.query.count() - max_rows
+    if overflow > 0:
+        oldest = (
+            db.session.query(Conversation.id)
+            .order_by(Conversation.updated_at.asc())
+            .limit(overflow)
+            .subquery()
+        )
+        Conversation.query.filter(Conversation.id.in_(db.select(oldest.c.id))).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def init_conversations():
+    with app.app_context():
+        db.create_all()
@@ -46,6 +46,9 @@ class DebugBadge(db.Model):
 
 class DebugBadgeEarned(db.Model):
     __tablename__ = "DebugBadgeEarned"
+    __table_args__ = (
+        db.Index("ix_DebugBadgeEarned_player_time", "player_id", "timestamp"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     player_id = db.Column(db.Integer, db.ForeignKey("Players.id"), nullable=False)
@@ -69,6 +72,10 @@ class DebugBadgeEarned(db.Model):
 
 class DebugHintUsage(db.Model):
     __tablename__ = "DebugHintUsage"
+    __table_args__ = (
+        db.Index("ix_DebugHintUsage_player_level_challenge", "player_id", "level", "challenge_id"),
+        db.Index("ix_DebugHintUsage_player_level_updated", "player_id", "level", "updated_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     player_id = db.Column(db.Integer, db.ForeignKey("Players.id"), nullable=False)
@@ -1,4 +1,9 @@
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+import hashlib
+
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
 
 from __init__ import app, db
 
@@ -50,6 +55,9 @@ class Badge(db.Model):
 
 class PlayerBadge(db.Model):
     __tablename__ = "PlayerBadges"
+    __table_args__ = (
+        db.Index("ix_PlayerBadges_player_time", "player_id", "timestamp"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     player_id = db.Column(db.Integer, db.ForeignKey("Players.id"), nullable=False)
@@ -68,6 +76,198 @@ class PlayerBadge(db.Model):
         }
 
 
+class GradeCache(db.Model):
+    """
+    Final-answer verdicts keyed by the normalized answer text.
+
+    `fingerprint` identifies the expected answer and grading prompt the verdict
+    was produced under, so changing either makes old rows unreachable; each
+    process deletes them on its first store under a new fingerprint.
+    Least recently used rows beyond GRADE_CACHE_MAX_ENTRIES are evicted every
+    TRIM_EVERY stores, so the table may briefly run that far over the cap.
+    """
+    __tablename__ = "GradeCache"
+
+    id = db.Column(db.Integer, primary_key=True)
+    answer_hash = db.Column(db.String(64), unique=True, nullable=False, index=True)
+    fingerprint = db.Column(db.String(64), nullable=False, index=True)
+    correct = db.Column(db.Boolean, nullable=False)
+    message = db.Column(db.Text, nullable=False)
+    steps = db.Column(db.JSON, nullable=False, default=list)
+    hits = db.Column(db.Integer, default=0, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    # Don't rewrite the row on every hit; recency this coarse is enough for LRU
+    TOUCH_INTERVAL = timedelta(seconds=60)
+    # Stores between LRU trims in this process
+    TRIM_EVERY = 100
+
+    _purged_fingerprint = None
+    _stores = 0
+
+    @staticmethod
+    def key(normalized_answer: str, fingerprint: str) -> str:
+        return hashlib.sha256(f"{fingerprint}\n{normalized_answer}".encode("utf-8")).hexdigest()
+
+    @classmethod
+    def lookup(cls, normalized_answer: str, fingerprint: str):
+        row = cls.query.filter_by(answer_hash=cls.key(normalized_answer, fingerprint)).first()
+        if row is None:
+            return None
+        now = datetime.utcnow()
+        if row.last_used_at is None or now - row.last_used_at >= cls.TOUCH_INTERVAL:
+            row.hits += 1
+            row.last_used_at = now
+            db.session.commit()
+        return {"correct": row.correct, "message": row.message, "steps": list(row.steps or [])}
+
+    @classmethod
+    def store(cls, normalized_answer: str, fingerprint: str, result: dict):
+        row = cls(
+            answer_hash=cls.key(normalized_answer, fingerprint),
+            fingerprint=fingerprint,
+            correct=bool(result.get("correct")),
+            message=result.get("message") or "",
+            steps=list(result.get("steps") or []),
+        )
+        db.session.add(row)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Same answer graded concurrently; keep the first verdict
+            db.session.rollback()
+            return
+        if fingerprint != cls._purged_fingerprint:
+            cls.query.filter(cls.fingerprint != fingerprint).delete(synchronize_session=False)
+            db.session.commit()
+            cls._purged_fingerprint = fingerprint
+            cls._stores = 0
+        if cls._stores % cls.TRIM_EVERY == 0:
+            cls._evict()
+        cls._stores += 1
+
+    @classmethod
+    def _evict(cls):
+        max_rows = int(app.config.get("GRADE_CACHE_MAX_ENTRIES") or 5000)
+        overflow = cls.query.count() - max_rows
+        if overflow > 0:
+            oldest = (
+                db.session.query(cls.id)
+                .order_by(cls.last_used_at.asc())
+                .limit(overflow)
+                .subquery()
+            )
+            cls.query.filter(cls.id.in_(db.select(oldest.c.id))).delete(synchronize_session=False)
+        db.session.commit()
+
+
+class LeaderboardEntry(db.Model):
+    """
+    Materialized leaderboard row per player, kept in sync on every ORM flush
+    that touches a Player or PlayerBadge (see _sync_leaderboard below).
+
+    Ordering is completed players first, earliest completion first, then
+    fewest total attempts; the composite index serves pages in that order.
+    """
+    __tablename__ = "LeaderboardEntries"
+    __table_args__ = (
+        db.Index("ix_LeaderboardEntries_order", "incomplete", "completed_at", "total_attempts", "player_id"),
+    )
+
+    # No FK: rows are refreshed after the flush that deletes their player
+    player_id = db.Column(db.Integer, primary_key=True)
+    incomplete = db.Column(db.Integer, nullable=False, default=1)
+    completed_at = db.Column(db.DateTime, nullable=True)
+    total_attempts = db.Column(db.Integer, nullable=False, default=0)
+
+    @classmethod
+    def ordering(cls):
+        return [cls.incomplete.asc(), cls.completed_at.asc(), cls.total_attempts.asc(), cls.player_id.asc()]
+
+    @classmethod
+    def page(cls, limit, offset=0):
+        """[(entry, player)] for one page, best first."""
+        return (
+            db.session.query(cls, Player)
+            .join(Player, Player.id == cls.player_id)
+            .order_by(*cls.ordering())
+            .limit(limit)
+            .offset(offset)
+            .all()
+        )
+
+    def rank(self) -> int:
+        """1-based position: entries ahead of this one in leaderboard order, plus one."""
+        cls = type(self)
+        if self.incomplete:
+            # Incomplete players all have completed_at NULL; order within the group by attempts
+            ahead = db.or_(
+                cls.incomplete < self.incomplete,
+                db.and_(cls.incomplete == self.incomplete, db.or_(
+                    cls.total_attempts < self.total_attempts,
+                    db.and_(cls.total_attempts == self.total_attempts, cls.player_id < self.player_id),
+                )),
+            )
+        else:
+            ahead = db.or_(
+                cls.incomplete < self.incomplete,
+                db.and_(cls.incomplete == self.incomplete, db.or_(
+                    cls.completed_at < self.completed_at,
+                    db.and_(cls.completed_at == self.completed_at, db.or_(
+                        cls.total_attempts < self.total_attempts,
+                        db.and_(cls.total_attempts == self.total_attempts, cls.player_id < self.player_id),
+                    )),
+                )),
+            )
+        return (db.session.query(db.func.count(cls.player_id)).filter(ahead).scalar() or 0) + 1
+
+
+def _refresh_leaderboard(connection, player_ids=None):
+    """Recompute LeaderboardEntries for these players (all players when None) with one INSERT ... SELECT."""
+    entries = LeaderboardEntry.__table__
+    players = Player.__table__
+    badges = PlayerBadge.__table__
+
+    delete = entries.delete()
+    totals = (
+        db.select(
+            players.c.id,
+            db.case((players.c.completed_at.is_(None), 1), else_=0),
+            players.c.completed_at,
+            db.func.coalesce(db.func.sum(badges.c.attempts), 0),
+        )
+        .select_from(players.outerjoin(badges, badges.c.player_id == players.c.id))
+        .group_by(players.c.id, players.c.completed_at)
+    )
+    if player_ids is not None:
+        delete = delete.where(entries.c.player_id.in_(player_ids))
+        totals = totals.where(players.c.id.in_(player_ids))
+
+    connection.execute(delete)
+    connection.execute(
+        entries.insert().from_select(["player_id", "incomplete", "completed_at", "total_attempts"], totals)
+    )
+
+
+def rebuild_leaderboard():
+    """Full recompute, for data written outside the ORM (bulk updates, restores)."""
+    _refresh_leaderboard(db.session.connection())
+    db.session.commit()
+
+
+@event.listens_for(Session, "after_flush")
+def _sync_leaderboard(session, flush_context):
+    player_ids = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Player) and obj.id is not None:
+            player_ids.add(obj.id)
+        elif isinstance(obj, PlayerBadge) and obj.player_id is not None:
+            player_ids.add(obj.player_id)
+    if player_ids:
+        _refresh_leaderboard(session.connection(), sorted(player_ids))
+
+
 def _seed_badges():
     default_badges = [
         "Explorer",
@@ -87,3 +287,6 @@ def init_endgame_data():
     with app.app_context():
         db.create_all()
         _seed_badges()
+        # Backfill (or repair) the materialized leaderboard
+        if LeaderboardEntry.query.count() != Player.query.count():
+            rebuild_leaderboard()
@@ -3,6 +3,9 @@ from datetime import datetime
 
 class Feedback(db.Model):
     __tablename__ = 'feedbacks'
+    __table_args__ = (
+        db.Index('ix_feedbacks_github_username_created', 'github_username', 'created_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
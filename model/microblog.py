@@ -3,13 +3,77 @@ Micro Blog Model
 Defines the database schema for micro blog posts with JSON flexibility
 """
 from sqlite3 import IntegrityError
-from sqlalchemy import Text, JSON
+from sqlalchemy import Text, JSON, String, cast, func
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.orm import joinedload
 from sqlalchemy.orm.attributes import flag_modified
 from __init__ import db
+from model import search as search_index
 from datetime import datetime
+import base64
+import binascii
 import json
 
 
+# Feed paging: newest first, continued with an opaque cursor
+FEED_PAGE_SIZE = 20
+FEED_MAX_PAGE_SIZE = 100
+
+# Reply paging: oldest first, same cursor format
+REPLY_PAGE_SIZE = 20
+REPLY_MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(timestamp, microblog_id):
+   """Opaque cursor for the position just after (timestamp, id) in a newest-first feed"""
+   raw = f"{timestamp.isoformat()}|{microblog_id}".encode()
+   return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+   """Inverse of encode_cursor; raises ValueError for anything it did not produce"""
+   try:
+       raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+       timestamp, _, microblog_id = raw.partition('|')
+       return datetime.fromisoformat(timestamp), int(microblog_id)
+   except (ValueError, binascii.Error, UnicodeDecodeError):
+       raise ValueError("Invalid cursor")
+
+
+def _insert(table):
+   """Dialect INSERT construct, for the conflict clauses the portable one lacks"""
+   return (mysql if db.engine.dialect.name == 'mysql' else sqlite).insert(table)
+
+
+def _insert_ignore(table, values, conflict_columns):
+   """INSERT that does nothing if a row with the same unique key exists; returns rows inserted"""
+   stmt = _insert(table).values(**values)
+   if db.engine.dialect.name == 'mysql':
+       stmt = stmt.prefix_with('IGNORE')
+   else:
+       stmt = stmt.on_conflict_do_nothing(index_elements=conflict_columns)
+   return db.session.execute(stmt).rowcount
+
+
+def _increment(table, values, conflict_columns, column, delta):
+   """Insert `values` with `column` = delta, or add delta to the existing row's `column`"""
+   stmt = _insert(table).values(**values, **{column: delta})
+   if db.engine.dialect.name == 'mysql':
+       stmt = stmt.on_duplicate_key_update(**{column: table.c[column] + delta})
+   else:
+       stmt = stmt.on_conflict_do_update(index_elements=conflict_columns, set_={column: table.c[column] + delta})
+   db.session.execute(stmt)
+
+
+def user_names(user_ids):
+   """user id -> display name for a batch of users, in one query"""
+   from model.user import User
+   if not user_ids:
+       return {}
+   # Names only: loading User rows would also pull their eager relationships
+   return dict(db.session.query(User.id, User._name).filter(User.id.in_(set(user_ids))).all())
+
+
 
 
 class MicroBlog(db.Model):
@@ -20,6 +84,12 @@ class MicroBlog(db.Model):
    Supports replies, reactions, and custom frontend attributes through JSON storage.
    """
    __tablename__ = 'microblogs'
+   # Feeds seek on (filter, _timestamp, id) and read the index in order
+   __table_args__ = (
+       db.Index('ix_microblogs_timestamp_id', '_timestamp', 'id'),
+       db.Index('ix_microblogs_topic_timestamp_id', '_topic_id', '_timestamp', 'id'),
+       db.Index('ix_microblogs_user_timestamp_id', '_user_id', '_timestamp', 'id'),
+   )
 
 
    # Primary Key
@@ -38,10 +108,15 @@ class MicroBlog(db.Model):
    # Metadata
    _timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
    _updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+   # Denormalized number of rows in microblog_replies for this post
+   _reply_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
   
    # Relationships
    user = db.relationship('User', foreign_keys=[_user_id], backref=db.backref('microblogs', lazy=True))
    topic = db.relationship('Topic', foreign_keys=[_topic_id], backref=db.backref('microblogs', lazy=True))
+   # Per-type counters are small, so load them alongside any post (one query per batch)
+   reaction_counts = db.relationship('MicroBlogReactionCount', lazy='selectin', viewonly=True)
 
 
    def __init__(self, user_id, content, topic_id=None, data=None):
@@ -78,8 +153,12 @@ class MicroBlog(db.Model):
            raise e
 
 
-   def read(self):
-       """Read micro blog data as a dictionary, including topic key and path if available"""
+   def read(self, my_reactions=None):
+       """
+       Read micro blog data as a dictionary, including topic key and path if available.
+       Reactions are reported as per-type counts; pass `my_reactions` (the viewer's
+       reaction types on this post) to include them as myReactions.
+       """
        # Get topic info if available
        topic_key = None
        topic_path = None
@@ -98,10 +177,17 @@ class MicroBlog(db.Model):
            'timestamp': self._timestamp.isoformat() if self._timestamp else None,
            'updatedAt': self._updated_at.isoformat() if self._updated_at else None,
            'characterCount': len(self._content),
+           'replyCount': self._reply_count or 0,
+           'reactionCounts': self.get_reaction_counts(),
        }
+       if my_reactions is not None:
+           base_data['myReactions'] = sorted(my_reactions)
        # Merge with JSON data, giving priority to base_data for core fields
        if self._data:
            merged_data = {**self._data, **base_data}
+           # Replies and reactions have their own tables; never ship leftovers from old JSON
+           merged_data.pop('replies', None)
+           merged_data.pop('reactions', None)
        else:
            merged_data = base_data
        return merged_data
@@ -130,80 +216,63 @@ class MicroBlog(db.Model):
            raise e
 
 
-   def get_replies(self):
-       """Return replies array; empty list if none or malformed."""
-       if not self._data or 'replies' not in self._data or not isinstance(self._data['replies'], list):
-           return []
-       return self._data['replies']
+   def get_replies(self, limit=REPLY_PAGE_SIZE, cursor=None):
+       """
+       One page of replies, oldest first, with author names looked up in one
+       query. Returns (replies, next_cursor); raises ValueError for a bad cursor.
+       """
+       limit = max(1, min(int(limit or REPLY_PAGE_SIZE), REPLY_MAX_PAGE_SIZE))
+       query = MicroBlogReply.query.filter(MicroBlogReply.microblog_id == self.id)
+       if cursor:
+           timestamp, last_id = decode_cursor(cursor)
+           query = query.filter(
+               MicroBlogReply.created_at >= timestamp,
+               db.or_(MicroBlogReply.created_at > timestamp, MicroBlogReply.id > last_id)
+           )
+       replies = query.order_by(MicroBlogReply.created_at, MicroBlogReply.id).limit(limit + 1).all()
+       next_cursor = None
+       if len(replies) > limit:
+           replies = replies[:limit]
+           next_cursor = encode_cursor(replies[-1].created_at, replies[-1].id)
+       names = user_names(reply.user_id for reply in replies)
+       return [reply.read(names) for reply in replies], next_cursor
 
 
    def add_reply(self, user_id, reply_content):
-       """Add a reply to the JSON data structure, including userName for display."""
+       """Add a reply and bump the post's reply count; returns the reply as a dict."""
        if len(reply_content) > 280:
            raise ValueError("Reply content must be 280 characters or less")
-      
-       if not self._data:
-           self._data = {}
-      
-       if 'replies' not in self._data or not isinstance(self._data['replies'], list):
-           self._data['replies'] = []
-      
-       # Attempt to include userName for frontend display
-       user_name = None
-       try:
-           from model.user import User
-           u = User.query.get(user_id)
-           user_name = u.name if u else None
-       except Exception:
-           user_name = None
-      
-       reply = {
-           'id': len(self._data['replies']) + 1,  # Simple incrementing ID
-           'userId': user_id,
-           'userName': user_name,
-           'content': reply_content,
-           'timestamp': datetime.utcnow().isoformat()
-       }
-      
-       self._data['replies'].append(reply)
-       self._updated_at = datetime.utcnow()
-      
-       flag_modified(self, '_data')
-      
+
+       reply = MicroBlogReply(microblog_id=self.id, user_id=user_id, content=reply_content)
        try:
+           db.session.add(reply)
+           # Increment in SQL so concurrent replies cannot overwrite each other's count
+           MicroBlog.query.filter_by(id=self.id).update(
+               {'_reply_count': MicroBlog._reply_count + 1, '_updated_at': datetime.utcnow()},
+               synchronize_session=False
+           )
            db.session.commit()
-           return reply
        except Exception as e:
            db.session.rollback()
            raise e
+       return reply.read(user_names([user_id]))
 
 
    def add_reaction(self, user_id, reaction_type):
-       """Add a reaction (like, heart, etc.) to the JSON data"""
-       if not self._data:
-           self._data = {}
-          
-       if 'reactions' not in self._data:
-           self._data['reactions'] = {}
-          
-       if reaction_type not in self._data['reactions']:
-           self._data['reactions'][reaction_type] = []
-          
-       # Remove user's previous reaction of this type if exists
-       self._data['reactions'][reaction_type] = [
-           uid for uid in self._data['reactions'][reaction_type] if uid != user_id
-       ]
-      
-       # Add new reaction
-       self._data['reactions'][reaction_type].append(user_id)
-       self._updated_at = datetime.utcnow()
-      
-       # CRITICAL: Mark the _data column as modified for SQLAlchemy
-       flag_modified(self, '_data')
-      
+       """Add a reaction (like, heart, etc.); adding one the user already has is a no-op"""
+       MicroBlogReaction.validate_type(reaction_type)
        try:
+           added = _insert_ignore(
+               MicroBlogReaction.__table__,
+               {'microblog_id': self.id, 'user_id': user_id, 'type': reaction_type,
+                'created_at': datetime.utcnow()},
+               ['microblog_id', 'user_id', 'type']
+           )
+           if added:
+               _increment(MicroBlogReactionCount.__table__,
+                          {'microblog_id': self.id, 'type': reaction_type},
+                          ['microblog_id', 'type'], 'count', 1)
            db.session.commit()
-           db.session.refresh(self)
            return True
        except Exception as e:
            db.session.rollback()
@@ -211,63 +280,57 @@ class MicroBlog(db.Model):
 
 
    def remove_reaction(self, user_id, reaction_type):
-       """Remove a reaction from the JSON data"""
-       if not self._data or 'reactions' not in self._data:
-           return False
-          
-       if reaction_type in self._data['reactions']:
-           self._data['reactions'][reaction_type] = [
-               uid for uid in self._data['reactions'][reaction_type] if uid != user_id
-           ]
-           self._updated_at = datetime.utcnow()
-          
-           flag_modified(self, '_data')
-          
-           try:
-               db.session.commit()
-               db.session.refresh(self)
-               return True
-           except Exception as e:
-               db.session.rollback()
-               raise e
-      
-       return False
+       """Remove a reaction; returns False if the user had not reacted this way"""
+       try:
+           removed = MicroBlogReaction.query.filter_by(
+               microblog_id=self.id, user_id=user_id, type=reaction_type
+           ).delete(synchronize_session=False)
+           if removed:
+               MicroBlogReactionCount.query.filter_by(microblog_id=self.id, type=reaction_type).update(
+                   {'count': MicroBlogReactionCount.count - removed}, synchronize_session=False
+               )
+           db.session.commit()
+           return bool(removed)
+       except Exception as e:
+           db.session.rollback()
+           raise e
   
    def get_reactions(self):
-       """Return reactions dictionary; empty dict if none or malformed."""
-       if not self._data or 'reactions' not in self._data or not isinstance(self._data['reactions'], dict):
-           return {}
-       return self._data['reactions']
+       """Return {reaction type: [user ids]} for this post"""
+       reactions = {}
+       rows = db.session.query(MicroBlogReaction.type, MicroBlogReaction.user_id).filter_by(
+           microblog_id=self.id
+       ).order_by(MicroBlogReaction.id).all()
+       for reaction_type, user_id in rows:
+           reactions.setdefault(reaction_type, []).append(user_id)
+       return reactions
 
 
    def get_reaction_counts(self):
        """Return a dictionary with reaction counts"""
-       reactions = self.get_reactions()
-       reaction_counts = {}
-       for reaction_type, user_ids in reactions.items():
-           reaction_counts[reaction_type] = len(user_ids)
-       return reaction_counts
+       return {row.type: row.count for row in self.reaction_counts if row.count > 0}
 
 
    def user_has_reacted(self, user_id, reaction_type):
        """Check if a user has already reacted with a specific reaction type"""
-       reactions = self.get_reactions()
-       if reaction_type not in reactions:
-           return False
-       return user_id in reactions[reaction_type]
+       return db.session.query(
+           MicroBlogReaction.query.filter_by(microblog_id=self.id, user_id=user_id, type=reaction_type).exists()
+       ).scalar()
 
 
    def toggle_reaction(self, user_id, reaction_type):
        """Toggle a reaction - add if not present, remove if present"""
-       if self.user_has_reacted(user_id, reaction_type):
-           return self.remove_reaction(user_id, reaction_type)
-       else:
-           return self.add_reaction(user_id, reaction_type)
+       if self.remove_reaction(user_id, reaction_type):
+           return True
+       return self.add_reaction(user_id, reaction_type)
 
 
    def delete(self):
        """Delete the micro blog post"""
        try:
+           MicroBlogReply.query.filter_by(microblog_id=self.id).delete(synchronize_session=False)
+           MicroBlogReaction.query.filter_by(microblog_id=self.id).delete(synchronize_session=False)
+           MicroBlogReactionCount.query.filter_by(microblog_id=self.id).delete(synchronize_session=False)
            db.session.delete(self)
            db.session.commit()
            return True
@@ -282,32 +345,258 @@ class MicroBlog(db.Model):
        return MicroBlog.query.get(microblog_id)
 
 
+   @staticmethod
+   def feed(topic_id=None, user_id=None, limit=FEED_PAGE_SIZE, cursor=None, viewer_id=None):
+       """
+       One page of posts, newest first, optionally for a topic or a user.
+
+       Pages are keyed on (timestamp, id) rather than an offset, so each page is
+       an index seek no matter how deep the caller has scrolled. Returns
+       (posts, next_cursor); next_cursor is None on the last page. With
+       `viewer_id`, each post also lists that user's own reactions.
+       Raises ValueError for a malformed cursor.
+       """
+       limit = max(1, min(int(limit or FEED_PAGE_SIZE), FEED_MAX_PAGE_SIZE))
+       query = MicroBlog.query.options(joinedload(MicroBlog.user), joinedload(MicroBlog.topic))
+       if topic_id is not None:
+           query = query.filter(MicroBlog._topic_id == topic_id)
+       if user_id is not None:
+           query = query.filter(MicroBlog._user_id == user_id)
+       if cursor:
+           timestamp, last_id = decode_cursor(cursor)
+           # Leading range on _timestamp keeps this a plain index seek on every backend
+           query = query.filter(
+               MicroBlog._timestamp <= timestamp,
+               db.or_(MicroBlog._timestamp < timestamp, MicroBlog.id < last_id)
+           )
+
+       microblogs = query.order_by(MicroBlog._timestamp.desc(), MicroBlog.id.desc()).limit(limit + 1).all()
+       next_cursor = None
+       if len(microblogs) > limit:
+           microblogs = microblogs[:limit]
+           next_cursor = encode_cursor(microblogs[-1]._timestamp, microblogs[-1].id)
+       return MicroBlog._read_page(microblogs, viewer_id), next_cursor
+
+
+   @staticmethod
+   def _read_page(microblogs, viewer_id=None):
+       """read() a page of posts, adding the viewer's own reactions with one query"""
+       if viewer_id is None or not microblogs:
+           return [microblog.read() for microblog in microblogs]
+
+       mine = {microblog.id: [] for microblog in microblogs}
+       for microblog_id, reaction_type in db.session.query(MicroBlogReaction.microblog_id, MicroBlogReaction.type).filter(
+               MicroBlogReaction.user_id == viewer_id, MicroBlogReaction.microblog_id.in_(mine)):
+           mine[microblog_id].append(reaction_type)
+       return [microblog.read(mine[microblog.id]) for microblog in microblogs]
+
+
    @staticmethod
    def get_all(limit=50):
        """Get all micro blog posts (most recent first)"""
-       microblogs = MicroBlog.query.order_by(MicroBlog._timestamp.desc()).limit(limit).all()
-       return [microblog.read() for microblog in microblogs]
+       return MicroBlog.feed(limit=limit)[0]
 
 
    @staticmethod
    def get_by_topic(topic_id, limit=50):
        """Get all micro blog posts for a specific topic"""
-       microblogs = MicroBlog.query.filter_by(_topic_id=topic_id).order_by(MicroBlog._timestamp.desc()).limit(limit).all()
-       return [microblog.read() for microblog in microblogs]
+       return MicroBlog.feed(topic_id=topic_id, limit=limit)[0]
 
 
    @staticmethod
    def get_by_user(user_id, limit=50):
        """Get all micro blog posts by a specific user"""
-       microblogs = MicroBlog.query.filter_by(_user_id=user_id).order_by(MicroBlog._timestamp.desc()).limit(limit).all()
-       return [microblog.read() for microblog in microblogs]
+       return MicroBlog.feed(user_id=user_id, limit=limit)[0]
+
+
+   @staticmethod
+   def search(search_term, limit=FEED_PAGE_SIZE, offset=0, viewer_id=None):
+       """
+       Posts matching `search_term`, best match first, from the full-text index
+       (see model/search.py). Each post carries searchScore and searchSnippet.
+       Returns (posts, next_offset); next_offset is None on the last page.
+       """
+       limit = max(1, min(int(limit or FEED_PAGE_SIZE), FEED_MAX_PAGE_SIZE))
+       offset = max(0, int(offset or 0))
+       if search_index.available():
+           hits = search_index.search('microblogs', search_term, limit + 1, offset)
+       else:
+           rows = (MicroBlog.query.filter(MicroBlog._content.contains(search_term))
+                   .order_by(MicroBlog._timestamp.desc(), MicroBlog.id.desc())
+                   .offset(offset).limit(limit + 1).all())
+           hits = [(row.id, None, search_index.highlight([row._content], search_term)) for row in rows]
+
+       next_offset = offset + limit if len(hits) > limit else None
+       hits = hits[:limit]
+       found = {microblog.id: microblog for microblog in MicroBlog.query.options(
+           joinedload(MicroBlog.user), joinedload(MicroBlog.topic)
+       ).filter(MicroBlog.id.in_([hit[0] for hit in hits]))} if hits else {}
+       microblogs = [found[hit[0]] for hit in hits if hit[0] in found]
+
+       results = MicroBlog._read_page(microblogs, viewer_id)
+       extras = {hit[0]: hit for hit in hits}
+       for result in results:
+           _, result['searchScore'], result['searchSnippet'] = extras[result['id']]
+       return results, next_offset
 
 
    @staticmethod
    def search_content(search_term, limit=50):
        """Search micro blog posts by content"""
-       microblogs = MicroBlog.query.filter(MicroBlog._content.contains(search_term)).order_by(MicroBlog._timestamp.desc()).limit(limit).all()
-       return [microblog.read() for microblog in microblogs]
+       return MicroBlog.search(search_term, limit=limit)[0]
+
+
+
+
+class MicroBlogReply(db.Model):
+   """A reply to a micro blog post"""
+   __tablename__ = 'microblog_replies'
+   __table_args__ = (
+       db.Index('ix_microblog_replies_post_created_id', 'microblog_id', 'created_at', 'id'),
+   )
+
+   id = db.Column(db.Integer, primary_key=True)
+   microblog_id = db.Column(db.Integer, db.ForeignKey('microblogs.id', ondelete='CASCADE'), nullable=False)
+   user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+   content = db.Column(db.String(280), nullable=False)
+   created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+   def read(self, names=None):
+       """Reply as a dictionary; `names` maps user id -> name (see user_names)"""
+       names = user_names([self.user_id]) if names is None else names
+       return {
+           'id': self.id,
+           'postId': self.microblog_id,
+           'userId': self.user_id,
+           'userName': names.get(self.user_id),
+           'content': self.content,
+           'timestamp': self.created_at.isoformat() if self.created_at else None,
+       }
+
+
+
+
+class MicroBlogReaction(db.Model):
+   """One user's reaction of one type on a micro blog post"""
+   __tablename__ = 'microblog_reactions'
+   __table_args__ = (
+       db.UniqueConstraint('microblog_id', 'user_id', 'type', name='uq_microblog_reactions_post_user_type'),
+       db.Index('ix_microblog_reactions_user_post', 'user_id', 'microblog_id'),
+   )
+
+   MAX_TYPE_LENGTH = 32
+
+   id = db.Column(db.Integer, primary_key=True)
+   microblog_id = db.Column(db.Integer, db.ForeignKey('microblogs.id', ondelete='CASCADE'), nullable=False)
+   user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+   type = db.Column(db.String(MAX_TYPE_LENGTH), nullable=False)
+   created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+   @staticmethod
+   def validate_type(reaction_type):
+       if not isinstance(reaction_type, str) or not reaction_type.strip():
+           raise ValueError("Reaction type is required")
+       if len(reaction_type) > MicroBlogReaction.MAX_TYPE_LENGTH:
+           raise ValueError(f"Reaction type must be {MicroBlogReaction.MAX_TYPE_LENGTH} characters or less")
+
+
+
+
+class MicroBlogReactionCount(db.Model):
+   """
+   Denormalized number of reactions per (post, type), kept in step with
+   microblog_reactions by MicroBlog.add_reaction / remove_reaction.
+   """
+   __tablename__ = 'microblog_reaction_counts'
+
+   microblog_id = db.Column(db.Integer, db.ForeignKey('microblogs.id', ondelete='CASCADE'), primary_key=True)
+   type = db.Column(db.String(MicroBlogReaction.MAX_TYPE_LENGTH), primary_key=True)
+   count = db.Column(db.Integer, nullable=False, default=0)
+
+
+
+
+def migrate_json_reactions():
+   """
+   Move reactions still stored as {type: [user ids]} in MicroBlog._data into
+   microblog_reactions, rebuild those posts' counters, and drop the JSON key.
+   Safe to run repeatedly; posts without JSON reactions are not touched.
+   """
+   pending = MicroBlog.query.filter(cast(MicroBlog._data, String).like('%"reactions"%')).all()
+   migrated = 0
+   for microblog in pending:
+       data = dict(microblog._data or {})
+       reactions = data.pop('reactions', None)
+       if reactions is None:
+           continue
+       if isinstance(reactions, dict):
+           for reaction_type, user_ids in reactions.items():
+               if not isinstance(user_ids, list) or not reaction_type or len(reaction_type) > MicroBlogReaction.MAX_TYPE_LENGTH:
+                   continue
+               for user_id in {uid for uid in user_ids if isinstance(uid, int)}:
+                   _insert_ignore(
+                       MicroBlogReaction.__table__,
+                       {'microblog_id': microblog.id, 'user_id': user_id, 'type': reaction_type,
+                        'created_at': microblog._updated_at or microblog._timestamp},
+                       ['microblog_id', 'user_id', 'type']
+                   )
+       # Counters are recomputed from the rows, so a re-run cannot double count
+       MicroBlogReactionCount.query.filter_by(microblog_id=microblog.id).delete(synchronize_session=False)
+       db.session.execute(MicroBlogReactionCount.__table__.insert().from_select(
+           ['microblog_id', 'type', 'count'],
+           db.select(MicroBlogReaction.microblog_id, MicroBlogReaction.type, func.count())
+           .where(MicroBlogReaction.microblog_id == microblog.id)
+           .group_by(MicroBlogReaction.microblog_id, MicroBlogReaction.type)
+       ))
+       microblog._data = data
+       flag_modified(microblog, '_data')
+       migrated += 1
+   db.session.commit()
+   if migrated:
+       print(f"Moved JSON reactions of {migrated} microblog posts into microblog_reactions")
+   return migrated
+
+
+
+
+def migrate_json_replies():
+   """
+   Move replies still stored as a list in MicroBlog._data into microblog_replies,
+   set those posts' reply counts, and drop the JSON key. Safe to run repeatedly.
+   """
+   pending = MicroBlog.query.filter(cast(MicroBlog._data, String).like('%"replies"%')).all()
+   migrated = 0
+   for microblog in pending:
+       data = dict(microblog._data or {})
+       replies = data.pop('replies', None)
+       if replies is None:
+           continue
+       for item in replies if isinstance(replies, list) else []:
+           if not isinstance(item, dict) or not item.get('userId') or not item.get('content'):
+               continue
+           try:
+               created_at = datetime.fromisoformat(item.get('timestamp') or '')
+           except (TypeError, ValueError):
+               created_at = microblog._timestamp
+           db.session.add(MicroBlogReply(
+               microblog_id=microblog.id, user_id=item['userId'],
+               content=str(item['content'])[:280], created_at=created_at
+           ))
+       db.session.flush()
+       microblog._reply_count = MicroBlogReply.query.filter_by(microblog_id=microblog.id).count()
+       microblog._data = data
+       flag_modified(microblog, '_data')
+       migrated += 1
+   db.session.commit()
+   if migrated:
+       print(f"Moved JSON replies of {migrated} microblog posts into microblog_replies")
+   return migrated
+
+
+def migrate_microblog_data():
+   """Move JSON-embedded replies/reactions into their tables (the _reply_count column is an Alembic migration)"""
+   migrate_json_replies()
+   migrate_json_reactions()
 
 
 
@@ -455,14 +744,11 @@ class Topic(db.Model):
   
    def get_recent_posts(self, limit=10, user_id=None):
        """Get recent posts for this topic"""
-       query = MicroBlog.query.filter_by(_topic_id=self.id)
-      
        # If not allowing anonymous and no user_id, return empty
        if not self._allow_anonymous and not user_id:
            return []
       
-       posts = query.order_by(MicroBlog._timestamp.desc()).limit(limit).all()
-       return [post.read() for post in posts]
+       return MicroBlog.feed(topic_id=self.id, limit=limit)[0]
   
    @staticmethod
    def get_by_page_path(page_path):
@@ -510,15 +796,24 @@ class Topic(db.Model):
        return [topic.read() for topic in topics]
   
    @staticmethod
-   def search_by_title(search_term):
-       """Search topics by title or description"""
-       topics = Topic.query.filter(
-           db.or_(
-               Topic._page_title.contains(search_term),
-               Topic._page_description.contains(search_term)
-           )
-       ).filter_by(_is_active=True).all()
-       return [topic.read() for topic in topics]
+   def search_by_title(search_term, limit=50, offset=0):
+       """Search active topics by title or description, best match first"""
+       if not search_index.available():
+           topics = Topic.query.filter(
+               db.or_(
+                   Topic._page_title.contains(search_term),
+                   Topic._page_description.contains(search_term)
+               )
+           ).filter_by(_is_active=True).offset(offset).limit(limit).all()
+           return [topic.read() for topic in topics]
+
+       hits = search_index.search('topics', search_term, limit, offset, where='t._is_active = 1')
+       found = {topic.id: topic for topic in Topic.query.filter(Topic.id.in_([hit[0] for hit in hits]))} if hits else {}
+       results = []
+       for topic_id, score, snippet in hits:
+           if topic_id in found:
+               results.append({**found[topic_id].read(), 'searchScore': score, 'searchSnippet': snippet})
+       return results
 
 
 
@@ -630,9 +925,7 @@ def initMicroblogs():
                "data": {
                    "lessonProgress": "completed",
                    "rating": 5,
-                   "hashtags": ["flask", "python", "webdev"],
-                   "reactions": {"👍": [], "🎉": []},
-                   "replies": []
+                   "hashtags": ["flask", "python", "webdev"]
                }
            },
            {
@@ -641,9 +934,7 @@ def initMicroblogs():
                "data": {
                    "helpRequested": True,
                    "difficulty": "medium",
-                   "hashtags": ["javascript", "arrays", "help"],
-                   "reactions": {"🤔": [], "💡": []},
-                   "replies": []
+                   "hashtags": ["javascript", "arrays", "help"]
                }
            },
            {
@@ -653,9 +944,7 @@ def initMicroblogs():
                    "projectType": "react",
                    "features": ["dark-mode", "responsive"],
                    "seeking": "feedback",
-                   "hashtags": ["portfolio", "react", "showcase"],
-                   "reactions": {"❤️": [], "🔥": []},
-                   "replies": []
+                   "hashtags": ["portfolio", "react", "showcase"]
                }
            },
            {
@@ -666,9 +955,7 @@ def initMicroblogs():
                    "tasks": ["database-models", "api-planning", "quiz-prep"],
                    "blockers": [],
                    "mood": "productive",
-                   "hashtags": ["standup", "progress"],
-                   "reactions": {"💪": []},
-                   "replies": []
+                   "hashtags": ["standup", "progress"]
                }
            },
            {
@@ -679,9 +966,7 @@ def initMicroblogs():
                    "resourceUrl": "https://developer.mozilla.org",
                    "subject": "javascript",
                    "recommendation": True,
-                   "hashtags": ["resources", "javascript", "documentation"],
-                   "reactions": {"📚": [], "👍": []},
-                   "replies": []
+                   "hashtags": ["resources", "javascript", "documentation"]
                }
            }
        ]
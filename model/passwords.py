@@ -0,0 +1,143 @@
+# model/passwords.py
+"""
+Password hashing off the request thread.
+
+generate_password_hash / check_password_hash are deliberately slow and hold
+the GIL, so a burst of logins serializes every request in the worker. With
+PASSWORD_HASH_WORKERS > 0 they run in a small process pool with a bounded
+number of pending jobs; the default, 0, hashes inline.
+
+The algorithm and cost come from PASSWORD_HASH_METHOD / PASSWORD_SALT_LENGTH
+(werkzeug method strings, e.g. "scrypt:32768:8:1" or "pbkdf2:sha256:1000000");
+the default is werkzeug's own. needs_rehash() tells login code when a stored
+hash is weaker than the current settings (same algorithm at a lower cost, or
+a shorter salt), so it can be upgraded while the plain password is at hand.
+It never asks to switch algorithms or lower a cost.
+
+Accounts that must never log in (guests) store UNUSABLE_PASSWORD, which is
+not a hash and never matches; nothing is hashed for them.
+
+The pool is forked by init_password_pool() at startup, before the logging
+listener, video worker or request threads exist: forking a process that
+already runs threads can copy a lock some thread holds into the child. A
+process that has no pool by the time it has threads hashes inline.
+
+This module avoids importing the app at load time, so pool workers stay light.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import logging
+import multiprocessing
+import os
+import threading
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+UNUSABLE_PASSWORD = "!"
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_pid = None
+_pool_slots = None
+_pool_lock = threading.Lock()
+
+
+def _settings():
+    from __init__ import app
+    return (
+        app.config.get("PASSWORD_HASH_METHOD") or "scrypt",
+        int(app.config.get("PASSWORD_SALT_LENGTH") or 16),
+        int(app.config.get("PASSWORD_HASH_WORKERS") or 0),
+    )
+
+
+def _get_pool(workers):
+    """This process's pool, or None to hash inline."""
+    global _pool, _pool_pid, _pool_slots
+    if workers <= 0 or "fork" not in multiprocessing.get_all_start_methods():
+        return None
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            if threading.active_count() > 1:
+                # Too late to fork safely (e.g. a gunicorn --preload worker): stay inline
+                if _pool_pid != os.getpid():
+                    logger.warning("Password hash pool not started before threads; hashing inline")
+                    _pool, _pool_pid = None, os.getpid()
+                return None
+            # fork: workers only run werkzeug, and must not re-import main.py as spawn would
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork"))
+            _pool_pid = os.getpid()
+            _pool_slots = threading.BoundedSemaphore(workers * 4)
+            # With fork, the first submit launches every worker; do it now, while single-threaded
+            _pool.submit(int).result()
+        return _pool
+
+
+def init_password_pool():
+    """Fork the hashing workers. Call at startup, before anything starts a thread."""
+    return _get_pool(_settings()[2]) is not None
+
+
+def _run(fn, *args):
+    pool = _get_pool(_settings()[2])
+    if pool is None:
+        return fn(*args)
+    # Bound the backlog: callers wait here rather than queueing without limit
+    with _pool_slots:
+        return pool.submit(fn, *args).result()
+
+
+def hash_password(password: str) -> str:
+    method, salt_length, _ = _settings()
+    return _run(generate_password_hash, password, method, salt_length)
+
+
+def check_password(pwhash: str, password: str) -> bool:
+    if not pwhash or pwhash == UNUSABLE_PASSWORD or not password:
+        return False
+    return _run(check_password_hash, pwhash, password)
+
+
+def is_password_hash(value: str) -> bool:
+    """True for a werkzeug hash string (any supported method), as opposed to a plain password."""
+    method, _, rest = (value or "").partition("$")
+    return bool(rest) and method.split(":", 1)[0] in ("pbkdf2", "scrypt")
+
+
+@lru_cache(maxsize=8)
+def _current_prefix(method: str, salt_length: int):
+    # werkzeug fills in default cost parameters, so derive the stored form once
+    stored_method, salt, _ = generate_password_hash("x", method, salt_length).split("$", 2)
+    return stored_method, len(salt)
+
+
+def _cost(stored_method: str):
+    """("scrypt", (n, r, p)) or ("pbkdf2:sha256", (iterations,)) from a stored method string."""
+    name, *params = stored_method.split(":")
+    if name == "pbkdf2":
+        return f"pbkdf2:{params[0]}", tuple(int(p) for p in params[1:])
+    return name, tuple(int(p) for p in params)
+
+
+def needs_rehash(pwhash: str) -> bool:
+    """
+    True when `pwhash` uses the configured algorithm at a lower cost, or a
+    shorter salt, than configured. A different algorithm or a higher cost is
+    left alone, so rehashing on login can only make a hash stronger.
+    """
+    if not is_password_hash(pwhash):
+        return False
+    method, salt_length, _ = _settings()
+    stored_method, salt, _ = pwhash.split("$", 2)
+    current_method, current_salt = _current_prefix(method, salt_length)
+    try:
+        stored_name, stored_cost = _cost(stored_method)
+        name, cost = _cost(current_method)
+    except (IndexError, ValueError):
+        return False
+    if name != stored_name or len(cost) != len(stored_cost) or current_salt < len(salt):
+        return False
+    if any(new < old for new, old in zip(cost, stored_cost)):
+        return False
+    return cost != stored_cost or current_salt > len(salt)
@@ -7,6 +7,13 @@ from sqlalchemy import Text
 from __init__ import db
 from datetime import datetime
 import json
+from model.microblog import encode_cursor, decode_cursor, user_names
+from model import search as search_index
+
+
+# Thread pages: top-level posts, newest first, continued with an opaque cursor
+THREAD_PAGE_SIZE = 50
+THREAD_MAX_PAGE_SIZE = 200
 
 
 class Post(db.Model):
@@ -17,6 +24,12 @@ class Post(db.Model):
     Supports threaded comments through parent-child relationships.
     """
     __tablename__ = 'posts'
+    # Thread pages seek on (filter, _parent_id, _timestamp, id); replies are fetched by _parent_id
+    __table_args__ = (
+        db.Index('ix_posts_parent_timestamp_id', '_parent_id', '_timestamp', 'id'),
+        db.Index('ix_posts_page_parent_timestamp_id', '_page_url', '_parent_id', '_timestamp', 'id'),
+        db.Index('ix_posts_user_parent_timestamp_id', '_user_id', '_parent_id', '_timestamp', 'id'),
+    )
 
     # Primary Key
     id = db.Column(db.Integer, primary_key=True)
@@ -80,15 +93,25 @@ class Post(db.Model):
             db.session.rollback()
             raise e
 
-    def read(self):
-        """Read post data as a dictionary"""
+    def _student_name(self, names=None):
+        if names is not None:
+            return names.get(self._user_id, 'Unknown')
+        return self.user.name if self.user else 'Unknown'
+
+    def read(self, replies=None, names=None):
+        """
+        Read post data as a dictionary
+
+        load_threads() passes the already fetched `replies` and a user id -> name
+        map in `names`; otherwise both are loaded from this post.
+        """
         # Get all replies (child posts)
-        all_replies = self.replies.all()
+        all_replies = self.replies.all() if replies is None else replies
         
         return {
             'id': self.id,
             'userId': self._user_id,
-            'studentName': self.user.name if self.user else 'Unknown',
+            'studentName': self._student_name(names),
             'content': self._content,
             'gradeReceived': self._grade_received,
             'pageUrl': self._page_url,
@@ -97,15 +120,15 @@ class Post(db.Model):
             'updatedAt': self._updated_at.isoformat() if self._updated_at else None,
             'parentId': self._parent_id,
             'replyCount': len(all_replies),
-            'replies': [reply.read_simple() for reply in all_replies]
+            'replies': [reply.read_simple(names) for reply in all_replies]
         }
     
-    def read_simple(self):
+    def read_simple(self, names=None):
         """Read post data as a simple dictionary (for nested replies)"""
         return {
             'id': self.id,
             'userId': self._user_id,
-            'studentName': self.user.name if self.user else 'Unknown',
+            'studentName': self._student_name(names),
             'content': self._content,
             'timestamp': self._timestamp.isoformat() if self._timestamp else None,
         }
@@ -144,22 +167,101 @@ class Post(db.Model):
         return Post.query.get(post_id)
 
     @staticmethod
-    def get_all():
-        """Get all top-level posts (not replies)"""
-        posts = Post.query.filter_by(_parent_id=None).order_by(Post._timestamp.desc()).all()
-        return [post.read() for post in posts]
+    def load_threads(page_url=None, user_id=None, limit=THREAD_PAGE_SIZE, cursor=None):
+        """
+        One page of top-level posts with their replies, newest first.
+
+        Three queries regardless of size: the page of posts, all of their
+        replies, and the authors' names; the tree is assembled in memory.
+        Returns (posts, next_cursor); next_cursor is None on the last page.
+        Raises ValueError for a malformed cursor.
+        """
+        limit = max(1, min(int(limit or THREAD_PAGE_SIZE), THREAD_MAX_PAGE_SIZE))
+        query = Post.query.filter(Post._parent_id.is_(None))
+        if page_url is not None:
+            query = query.filter(Post._page_url == page_url)
+        if user_id is not None:
+            query = query.filter(Post._user_id == user_id)
+        if cursor:
+            timestamp, last_id = decode_cursor(cursor)
+            query = query.filter(
+                Post._timestamp <= timestamp,
+                db.or_(Post._timestamp < timestamp, Post.id < last_id)
+            )
+
+        posts = query.order_by(Post._timestamp.desc(), Post.id.desc()).limit(limit + 1).all()
+        next_cursor = None
+        if len(posts) > limit:
+            posts = posts[:limit]
+            next_cursor = encode_cursor(posts[-1]._timestamp, posts[-1].id)
+        if not posts:
+            return [], None
+
+        replies_by_parent = {post.id: [] for post in posts}
+        replies = (Post.query
+                   .filter(Post._parent_id.in_(replies_by_parent))
+                   .order_by(Post._timestamp, Post.id)
+                   .all())
+        for reply in replies:
+            replies_by_parent[reply._parent_id].append(reply)
+
+        names = user_names([post._user_id for post in posts] + [reply._user_id for reply in replies])
+
+        return [post.read(replies_by_parent[post.id], names) for post in posts], next_cursor
+
+    @staticmethod
+    def search(search_term, limit=THREAD_PAGE_SIZE, offset=0):
+        """
+        Posts and replies whose content matches `search_term`, best match first,
+        from the full-text index (see model/search.py).
+        Returns (results, next_offset); next_offset is None on the last page.
+        """
+        limit = max(1, min(int(limit or THREAD_PAGE_SIZE), THREAD_MAX_PAGE_SIZE))
+        offset = max(0, int(offset or 0))
+        if search_index.available():
+            hits = search_index.search('posts', search_term, limit + 1, offset)
+        else:
+            rows = (Post.query.filter(Post._content.contains(search_term))
+                    .order_by(Post._timestamp.desc(), Post.id.desc())
+                    .offset(offset).limit(limit + 1).all())
+            hits = [(row.id, None, search_index.highlight([row._content], search_term)) for row in rows]
+
+        next_offset = offset + limit if len(hits) > limit else None
+        hits = hits[:limit]
+        if not hits:
+            return [], None
+        found = {post.id: post for post in Post.query.filter(Post.id.in_([hit[0] for hit in hits]))}
+        names = user_names(post._user_id for post in found.values())
+
+        results = []
+        for post_id, score, snippet in hits:
+            post = found.get(post_id)
+            if post is None:
+                continue
+            results.append({
+                **post.read_simple(names),
+                'pageUrl': post._page_url,
+                'pageTitle': post._page_title,
+                'parentId': post._parent_id,
+                'searchScore': score,
+                'searchSnippet': snippet,
+            })
+        return results, next_offset
+
+    @staticmethod
+    def get_all(limit=THREAD_PAGE_SIZE, cursor=None):
+        """Get a page of top-level posts (not replies)"""
+        return Post.load_threads(limit=limit, cursor=cursor)[0]
 
     @staticmethod
-    def get_by_page(page_url):
-        """Get all posts for a specific page"""
-        posts = Post.query.filter_by(_page_url=page_url, _parent_id=None).order_by(Post._timestamp.desc()).all()
-        return [post.read() for post in posts]
+    def get_by_page(page_url, limit=THREAD_PAGE_SIZE, cursor=None):
+        """Get a page of posts for a specific page"""
+        return Post.load_threads(page_url=page_url, limit=limit, cursor=cursor)[0]
 
     @staticmethod
-    def get_by_user(user_id):
-        """Get all posts by a specific user"""
-        posts = Post.query.filter_by(_user_id=user_id, _parent_id=None).order_by(Post._timestamp.desc()).all()
-        return [post.read() for post in posts]
+    def get_by_user(user_id, limit=THREAD_PAGE_SIZE, cursor=None):
+        """Get a page of posts by a specific user"""
+        return Post.load_threads(user_id=user_id, limit=limit, cursor=cursor)[0]
 
 
 def init_posts():
@@ -1,10 +1,42 @@
 # model/robop_user.py
 
 from __init__ import app, db
-from werkzeug.security import generate_password_hash, check_password_hash
+from model.passwords import hash_password, check_password, needs_rehash, UNUSABLE_PASSWORD
 from datetime import datetime, timezone
+from sqlalchemy import String, cast
+from sqlalchemy.dialects import mysql, sqlite
 from sqlalchemy.exc import IntegrityError
 from random import randint, choice
+import re
+
+# Most module completions accepted by one batch progress update
+PROGRESS_BATCH_MAX = 100
+# Most badges accepted by one batch badge update
+BADGE_BATCH_MAX = 100
+
+_PROGRESS_MODULE_KEY = ["user_id", "_sector_id", "_module_id"]
+_MODULE_KEY_RE = re.compile(r"^s(\d+)_m(\d+)$")
+
+
+def _insert(table):
+    """Dialect INSERT construct, for the conflict clauses the portable one lacks"""
+    return (mysql if db.engine.dialect.name == "mysql" else sqlite).insert(table)
+
+
+def _insert_ignore(table, rows, conflict_columns):
+    """Multi-row INSERT that skips rows whose unique key already exists; returns rows inserted"""
+    stmt = _insert(table).values(rows)
+    if db.engine.dialect.name == "mysql":
+        stmt = stmt.prefix_with("IGNORE")
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=conflict_columns)
+    return db.session.execute(stmt).rowcount
+
+
+def module_key(sector_id, module_id):
+    """Client-facing name of a module, e.g. s1_m0"""
+    return f"s{sector_id}_m{module_id}"
+
 
 class RobopUser(db.Model):
     __tablename__ = "RobopUser"
@@ -22,11 +54,12 @@ class RobopUser(db.Model):
     badges = db.relationship("UserBadge", backref="user", lazy=True)
     progress = db.relationship("Progress", backref="user", uselist=False, lazy=True)
 
-    def __init__(self, uid, first_name, last_name, password):
+    def __init__(self, uid, first_name, last_name, password=None):
         self._uid = uid
         self._first_name = first_name
         self._last_name = last_name
-        self._password = generate_password_hash(password)
+        # No password (guest identities) -> unusable marker, nothing to hash
+        self._password = hash_password(password) if password else UNUSABLE_PASSWORD
 
     @property
     def uid(self):
@@ -54,7 +87,16 @@ class RobopUser(db.Model):
 
 
     def is_password(self, password):
-        return check_password_hash(self._password, password)
+        if not check_password(self._password, password):
+            return False
+        if needs_rehash(self._password):
+            # Hash settings changed since this one was made; upgrade it while we have the password
+            self._password = hash_password(password)
+            try:
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+        return True
 
     def create(self):
         db.session.add(self)
@@ -104,9 +146,47 @@ class BadgeThreshold(db.Model):
     def to_dict(self):
         return {"name": self._name, "threshold": self._threshold}
 
+# Badge tier ranking (higher = better)
+# Anything unknown (like "Seed Badge") becomes 0
+BADGE_RANK = {
+    "Gold": 4,
+    "Silver": 3,
+    "Bronze": 2,
+    "Participant": 1,
+}
+
+
+def badge_rank(name: str) -> int:
+    return BADGE_RANK.get((name or "").strip(), 0)
+
+
+def best_badge_key(ub):
+    """
+    Sort key where "best" means:
+    - Higher badge tier is better
+    - Fewer attempts is better
+    - Not using autofill is better
+    - More recent is better
+    """
+    tier = badge_rank(getattr(ub, "_badge_name", ""))
+    attempts = getattr(ub, "_attempts", 10**9)
+    used_autofill = bool(getattr(ub, "_used_autofill", False))
+    dt = getattr(ub, "_date_earned", None) or datetime.min
+
+    # We want max() by this key, so keep "good" values higher:
+    # -attempts: fewer is better -> invert attempts
+    # used_autofill: False better -> invert to 1/0
+    return (tier, -attempts, 0 if used_autofill else 1, dt)
+
+
 class UserBadge(db.Model):
     """Table to store badges earned by specific users with CPT metrics"""
     __tablename__ = "UserBadge"
+    __table_args__ = (
+        db.Index("ix_UserBadge_user_date", "user_id", "_date_earned"),
+        # One row per module: the best badge, see upsert_best_badges()
+        db.Index("uq_UserBadge_user_sector_module", "user_id", "_sector_id", "_module_id", unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("RobopUser.id"), nullable=False)
     _sector_id = db.Column(db.Integer, nullable=False)
@@ -135,6 +215,205 @@ class UserBadge(db.Model):
         }
 
 
+def best_badge_order():
+    """SQL ORDER BY matching best_badge_key(), best first."""
+    tier = db.case(
+        *[(db.func.trim(UserBadge._badge_name) == name, rank) for name, rank in BADGE_RANK.items()],
+        else_=0
+    )
+    return [tier.desc(), UserBadge._attempts.asc(), UserBadge._used_autofill.asc(),
+            UserBadge._date_earned.desc(), UserBadge.id.desc()]
+
+
+class UserBadgeLog(db.Model):
+    """Append-only history of every badge submitted, including ones that did not beat the kept best"""
+    __tablename__ = "UserBadgeLog"
+    __table_args__ = (
+        db.Index("ix_UserBadgeLog_user_date", "user_id", "_date_earned"),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("RobopUser.id"), nullable=False)
+    _sector_id = db.Column(db.Integer, nullable=False)
+    _module_id = db.Column(db.Integer, nullable=False)
+    _attempts = db.Column(db.Integer, nullable=False)
+    _used_autofill = db.Column(db.Boolean, nullable=False, default=False)
+    _badge_name = db.Column(db.String(64), nullable=False)
+    _date_earned = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+def upsert_best_badges(user_id, badges, log=True):
+    """
+    Keep the best badge per (sector, module) for a user, in one transaction.
+
+    `badges` are dicts of sector_id, module_id, attempts, used_autofill and
+    badge_name. Each module's best submission (by best_badge_key) competes
+    with the stored row: the row is updated in place when beaten, inserted
+    when missing, and left alone otherwise. Older duplicate rows for the same
+    module are removed. With `log`, every submission is also appended to
+    UserBadgeLog. Commits; returns [(UserBadge, "created" | "updated" | "kept")]
+    in module order.
+    """
+    for retry in (False, True):
+        now = datetime.utcnow()
+        submitted = {}
+        for badge in badges:
+            candidate = UserBadge(user_id, badge["sector_id"], badge["module_id"], badge["attempts"],
+                                  bool(badge.get("used_autofill")), badge["badge_name"])
+            candidate._date_earned = now
+            key = (candidate._sector_id, candidate._module_id)
+            if key not in submitted or best_badge_key(candidate) > best_badge_key(submitted[key]):
+                submitted[key] = candidate
+        if not submitted:
+            return []
+
+        stored = {}
+        rows = (
+            UserBadge.query
+            .filter(UserBadge.user_id == user_id,
+                    db.tuple_(UserBadge._sector_id, UserBadge._module_id).in_(list(submitted)))
+            .with_for_update()
+            .all()
+        )
+        for row in rows:
+            stored.setdefault((row._sector_id, row._module_id), []).append(row)
+
+        results = []
+        for key in sorted(submitted):
+            candidate = submitted[key]
+            existing = sorted(stored.get(key, []), key=best_badge_key, reverse=True)
+            for duplicate in existing[1:]:
+                db.session.delete(duplicate)
+            if not existing:
+                db.session.add(candidate)
+                results.append((candidate, "created"))
+            elif best_badge_key(candidate) > best_badge_key(existing[0]):
+                row = existing[0]
+                row._attempts = candidate._attempts
+                row._used_autofill = candidate._used_autofill
+                row._badge_name = candidate._badge_name
+                row._date_earned = now
+                results.append((row, "updated"))
+            else:
+                results.append((existing[0], "kept"))
+
+        if log:
+            db.session.add_all([
+                UserBadgeLog(user_id=user_id, _sector_id=badge["sector_id"], _module_id=badge["module_id"],
+                             _attempts=badge["attempts"], _used_autofill=bool(badge.get("used_autofill")),
+                             _badge_name=badge["badge_name"], _date_earned=now)
+                for badge in badges
+            ])
+        try:
+            db.session.commit()
+            return results
+        except IntegrityError:
+            # A concurrent request created one of these modules first; the retry sees its row
+            db.session.rollback()
+            if retry:
+                raise
+
+
+# Sortable columns for the admin summary; badge columns come from the per-user aggregate
+ROBOP_USER_SORTS = ("id", "uid", "first_name", "last_name", "created", "last_login", "badge_count", "last_earned")
+
+
+def robop_user_badge_summary(page=1, per_page=50, sort="id", descending=False):
+    """
+    One page of RobopUsers with badge_count, best badge and last badge each.
+
+    Runs a fixed number of queries however many users/badges there are:
+    page of users (sorted, with a GROUP BY count/latest joined in), then a
+    window-function pass over just that page's badges to pick best and last.
+    Returns (rows, total_users).
+    """
+    counts = (
+        db.session.query(
+            UserBadge.user_id.label("user_id"),
+            db.func.count(UserBadge.id).label("badge_count"),
+            db.func.max(UserBadge._date_earned).label("last_earned"),
+        )
+        .group_by(UserBadge.user_id)
+        .subquery()
+    )
+    sort_columns = {
+        "id": RobopUser.id,
+        "uid": RobopUser._uid,
+        "first_name": RobopUser._first_name,
+        "last_name": RobopUser._last_name,
+        "created": RobopUser._created,
+        "last_login": RobopUser._last_login,
+        "badge_count": db.func.coalesce(counts.c.badge_count, 0),
+        "last_earned": counts.c.last_earned,
+    }
+    column = sort_columns.get(sort, RobopUser.id)
+    order = [column.desc() if descending else column.asc(), RobopUser.id.asc()]
+
+    total = db.session.query(db.func.count(RobopUser.id)).scalar() or 0
+    users = (
+        db.session.query(RobopUser, db.func.coalesce(counts.c.badge_count, 0))
+        .outerjoin(counts, counts.c.user_id == RobopUser.id)
+        .order_by(*order)
+        .limit(per_page)
+        .offset((max(page, 1) - 1) * per_page)
+        .all()
+    )
+    if not users:
+        return [], total
+
+    ids = [u.id for u, _ in users]
+    ranked = (
+        db.select(
+            UserBadge.id.label("badge_id"),
+            db.func.row_number().over(partition_by=UserBadge.user_id, order_by=best_badge_order()).label("best_rn"),
+            db.func.row_number().over(
+                partition_by=UserBadge.user_id,
+                order_by=[UserBadge._date_earned.desc(), UserBadge.id.desc()]
+            ).label("last_rn"),
+        )
+        .where(UserBadge.user_id.in_(ids))
+        .subquery()
+    )
+    picks = (
+        db.session.query(UserBadge, ranked.c.best_rn, ranked.c.last_rn)
+        .join(ranked, ranked.c.badge_id == UserBadge.id)
+        .filter(db.or_(ranked.c.best_rn == 1, ranked.c.last_rn == 1))
+        .all()
+    )
+    best, last = {}, {}
+    for badge, best_rn, last_rn in picks:
+        if best_rn == 1:
+            best[badge.user_id] = badge
+        if last_rn == 1:
+            last[badge.user_id] = badge
+
+    rows = []
+    for u, badge_count in users:
+        best_badge, last_earned = best.get(u.id), last.get(u.id)
+        rows.append({
+            "id": u.id,
+            "uid": u.uid,
+            "first_name": u.first_name,
+            "last_name": u.last_name,
+            "created": u._created.isoformat() if u._created else None,
+            "last_login": u._last_login.isoformat() if u._last_login else None,
+
+            "badge_count": badge_count,
+
+            # best badge details
+            "best_badge": best_badge._badge_name if best_badge else None,
+            "best_sector": best_badge._sector_id if best_badge else None,
+            "best_module": best_badge._module_id if best_badge else None,
+            "best_attempts": best_badge._attempts if best_badge else None,
+            "best_used_autofill": best_badge._used_autofill if best_badge else None,
+            "best_earned": best_badge._date_earned.isoformat() if best_badge and best_badge._date_earned else None,
+
+            # last earned details
+            "last_badge": last_earned._badge_name if last_earned else None,
+            "last_earned": last_earned._date_earned.isoformat() if last_earned and last_earned._date_earned else None,
+        })
+    return rows, total
+
+
 class StationHint(db.Model):
     """Satisfies the 'List' requirement for the Create PT"""
     __tablename__ = "StationHint"
@@ -145,8 +424,24 @@ class StationHint(db.Model):
     def __init__(self, key, hints):
         self.module_key = key
         self.hint_collection = hints
+class ProgressModule(db.Model):
+    """One completed (sector, module) per user; the primary key makes completing it again a no-op"""
+    __tablename__ = "ProgressModules"
+
+    user_id = db.Column(db.Integer, db.ForeignKey("RobopUser.id"), primary_key=True)
+    _sector_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    _module_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    _completed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
 class Progress(db.Model):  # START ADDING HERE
-    """Tracks user's game/level progress"""
+    """
+    Tracks user's game/level progress.
+
+    Completed modules are rows in ProgressModules keyed by (user, sector,
+    module). completed() loads them once into a set for O(1) membership.
+    _completed_modules is the legacy JSON list, emptied by migrate_json_progress().
+    """
     __tablename__ = "Progress"
     
     id = db.Column(db.Integer, primary_key=True)
@@ -164,29 +459,109 @@ class Progress(db.Model):  # START ADDING HERE
         self._current_module = 0
         self._total_score = 0
         self._completed_modules = []
-    
+
+    def completed(self):
+        """Set of completed (sector, module) pairs, in one query"""
+        return set(
+            db.session.query(ProgressModule._sector_id, ProgressModule._module_id)
+            .filter(ProgressModule.user_id == self.user_id)
+            .all()
+        )
+
+    def has_completed(self, sector_id, module_id):
+        return db.session.query(
+            ProgressModule.query.filter_by(user_id=self.user_id, _sector_id=sector_id, _module_id=module_id).exists()
+        ).scalar()
+
+    def complete_modules(self, completions):
+        """
+        Record (sector, module, score) completions in one INSERT; already
+        completed modules are skipped by the primary key, so concurrent
+        requests cannot duplicate them. Every completion's score is added, as
+        before. Does not commit; returns how many modules were newly completed.
+        """
+        completions = list(completions)
+        if not completions:
+            return 0
+        now = datetime.utcnow()
+        rows = {
+            (int(sector_id), int(module_id)): {
+                "user_id": self.user_id, "_sector_id": int(sector_id), "_module_id": int(module_id),
+                "_completed_at": now,
+            }
+            for sector_id, module_id, _ in completions
+        }
+        added = _insert_ignore(ProgressModule.__table__, list(rows.values()), _PROGRESS_MODULE_KEY)
+
+        # Add in SQL, so concurrent updates to the same user are not lost
+        score = sum(int(s or 0) for _, _, s in completions)
+        if score:
+            self._total_score = Progress._total_score + score
+        self._last_played = now
+        return added
+
     def complete_module(self, sector_id, module_id, score=0):
-        """Mark a module as completed"""
-        module_key = f"s{sector_id}_m{module_id}"
-        
-        if self._completed_modules is None:
-            self._completed_modules = []
-        
-        if module_key not in self._completed_modules:
-            self._completed_modules.append(module_key)
-        
-        self._total_score += score
-        self._last_played = datetime.utcnow()
-        db.session.commit()
+        """Mark a module as completed (the caller commits)"""
+        return self.complete_modules([(sector_id, module_id, score)])
     
     def to_dict(self):
         return {
             "current_sector": self._current_sector,
             "current_module": self._current_module,
             "total_score": self._total_score,
-            "completed_modules": self._completed_modules if self._completed_modules else []
+            "completed_modules": [module_key(*key) for key in sorted(self.completed())]
         }
 
+
+def migrate_json_progress():
+    """
+    Move completions still stored as "s<sector>_m<module>" strings in
+    Progress._completed_modules into ProgressModules and empty the JSON list.
+    Safe to run repeatedly; rows with an empty list are not touched.
+    """
+    pending = Progress.query.filter(cast(Progress._completed_modules, String).like(r"%\_m%", escape="\\")).all()
+    for progress in pending:
+        pairs = set()
+        for key in progress._completed_modules or []:
+            match = _MODULE_KEY_RE.match(str(key))
+            if match:
+                pairs.add((int(match.group(1)), int(match.group(2))))
+        if pairs:
+            _insert_ignore(ProgressModule.__table__, [
+                {"user_id": progress.user_id, "_sector_id": sector_id, "_module_id": module_id,
+                 "_completed_at": progress._last_played or datetime.utcnow()}
+                for sector_id, module_id in sorted(pairs)
+            ], _PROGRESS_MODULE_KEY)
+        progress._completed_modules = []
+    db.session.commit()
+    if pending:
+        print(f"Moved JSON completed modules of {len(pending)} users into ProgressModules")
+    return len(pending)
+
+class RobopRevokedToken(db.Model):
+    """Refresh-token ids (jti) that may no longer be used: rotated out or logged out."""
+    __tablename__ = "RobopRevokedTokens"
+
+    jti = db.Column(db.String(32), primary_key=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    @staticmethod
+    def is_revoked(jti):
+        return RobopRevokedToken.query.get(jti) is not None
+
+    @staticmethod
+    def revoke(jti, expires_at):
+        """Record a jti until the token would have expired anyway. Returns False if already revoked."""
+        RobopRevokedToken.query.filter(RobopRevokedToken.expires_at < datetime.utcnow()).delete(synchronize_session=False)
+        db.session.add(RobopRevokedToken(jti=jti, expires_at=expires_at))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return False
+        return True
+
+
 def initRobopUsers():
     """Create RobopUser table and (optionally) seed a demo user."""
     with app.app_context():
@@ -206,30 +581,33 @@ def initRobopUsers():
             db.session.commit()
             print("✅ Badge thresholds seeded.")
 
-        # Optional seed user
-        try:
-            demo = RobopUser(
-                uid="demo_robop",
-                first_name="Demo",
-                last_name="Robop",
-                password=app.config.get("DEFAULT_PASSWORD", "password123")
-            )
-            demo.create()
-            print("✅ RobopUser table ready + seeded demo user.")
-        except IntegrityError:
-            db.session.rollback()
+        # Optional seed user (only hashed when it is actually missing)
+        if not RobopUser.query.filter_by(_uid="demo_robop").first():
+            try:
+                demo = RobopUser(
+                    uid="demo_robop",
+                    first_name="Demo",
+                    last_name="Robop",
+                    password=app.config.get("DEFAULT_PASSWORD", "password123")
+                )
+                demo.create()
+                print("✅ RobopUser table ready + seeded demo user.")
+            except IntegrityError:
+                db.session.rollback()
+                print("✅ RobopUser table ready (demo user already exists).")
+        else:
             print("✅ RobopUser table ready (demo user already exists).")
         
         # Seed test users
         test_users = [
-            RobopUser(uid="alice", first_name="Alice", last_name="Test", password="pass"),
-            RobopUser(uid="bob", first_name="Bob", last_name="Test", password="pass"),
-            RobopUser(uid="charlie", first_name="Charlie", last_name="Test", password="pass"),
+            ("alice", "Alice", "Test", "pass"),
+            ("bob", "Bob", "Test", "pass"),
+            ("charlie", "Charlie", "Test", "pass"),
         ]
 
-        for u in test_users:
-            if not RobopUser.query.filter_by(_uid=u.uid).first():
-                db.session.add(u)
+        for uid, first_name, last_name, password in test_users:
+            if not RobopUser.query.filter_by(_uid=uid).first():
+                db.session.add(RobopUser(uid=uid, first_name=first_name, last_name=last_name, password=password))
         db.session.commit()
 
         # Seed badges for those same users with new model structure
@@ -254,4 +632,5 @@ def initRobopUsers():
                 progress = Progress(user_id=user.id)
                 db.session.add(progress)
         db.session.commit()
+        migrate_json_progress()
         print("✅ Progress created for all users.")
\ No newline at end of file
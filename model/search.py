@@ -0,0 +1,195 @@
+# model/search.py
+"""
+Full-text search over microblog content, post content, and topic titles.
+
+SQLite (development) gets an FTS5 table per source, declared as external
+content over the real table, so it stores only the index. Triggers on the
+source table keep it in step with every INSERT / UPDATE / DELETE, including
+ones made outside the ORM. MySQL (production) gets a FULLTEXT index on the
+same columns, which InnoDB maintains itself.
+
+search() returns one page of (id, score, snippet), best match first. Snippets
+are HTML-escaped text with the matched words wrapped in <mark>...</mark>.
+
+init_search() creates whatever is missing at startup; reindex() rebuilds
+everything (`flask custom reindex_search`). Without FTS5 or MySQL,
+available() is False and callers fall back to a LIKE scan.
+"""
+from collections import namedtuple
+import html
+import logging
+import re
+
+from sqlalchemy import text
+
+from __init__ import db
+
+logger = logging.getLogger(__name__)
+
+Source = namedtuple("Source", "table columns")
+
+SOURCES = {
+    "microblogs": Source("microblogs", ("_content",)),
+    "posts": Source("posts", ("_content",)),
+    "topics": Source("topics", ("_page_title", "_page_description")),
+}
+
+# Private-use characters mark hits in raw snippets, so escaping cannot touch them
+_HIT_START, _HIT_END = "\ue000", "\ue001"
+SNIPPET_TOKENS = 16
+_SNIPPET_CHARS = 120
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+_fts5 = None
+
+
+def _dialect():
+    return db.engine.dialect.name
+
+
+def _fts_table(source):
+    return f"{source.table}_fts"
+
+
+def _fulltext_index(source):
+    return f"ft_{source.table}_search"
+
+
+def has_fts5():
+    global _fts5
+    if _fts5 is None:
+        try:
+            with db.engine.connect() as connection:
+                connection.execute(text("CREATE VIRTUAL TABLE temp._fts5_probe USING fts5(x)"))
+                connection.execute(text("DROP TABLE temp._fts5_probe"))
+            _fts5 = True
+        except Exception:
+            _fts5 = False
+    return _fts5
+
+
+def available():
+    dialect = _dialect()
+    return dialect == "mysql" or (dialect == "sqlite" and has_fts5())
+
+
+def terms(query):
+    """Words in a user query; punctuation and FTS operators are dropped."""
+    return _WORD_RE.findall(query or "")
+
+
+def _fts5_match(words):
+    # Each word quoted (so AND/OR/NEAR are plain words), the last one as a prefix for search-as-you-type
+    quoted = ['"%s"' % w.replace('"', '""') for w in words]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def _render(snippet):
+    return html.escape(snippet).replace(_HIT_START, "<mark>").replace(_HIT_END, "</mark>")
+
+
+def _make_snippet(values, words):
+    """Snippet for backends without one: a window around the first hit, hits marked."""
+    body = " ".join(v for v in values if v)
+    pattern = re.compile("|".join(re.escape(w) for w in sorted(words, key=len, reverse=True)), re.IGNORECASE)
+    first = pattern.search(body)
+    start = max(0, (first.start() if first else 0) - _SNIPPET_CHARS // 3)
+    window = body[start:start + _SNIPPET_CHARS]
+    marked = pattern.sub(lambda m: _HIT_START + m.group(0) + _HIT_END, window)
+    return ("…" if start else "") + marked + ("…" if start + _SNIPPET_CHARS < len(body) else "")
+
+
+def highlight(values, query):
+    """Marked-up snippet of `values` for `query`, for callers that matched without the index."""
+    words = terms(query)
+    return _render(_make_snippet(values, words)) if words else None
+
+
+def search(name, query, limit=20, offset=0, where=None):
+    """
+    One page of matches in SOURCES[name] as [(id, score, snippet)], best first.
+    `where` is an optional SQL condition on the source row, aliased `t`.
+    Returns [] for a query with no words.
+    """
+    source = SOURCES[name]
+    words = terms(query)
+    if not words:
+        return []
+    condition = f" AND ({where})" if where else ""
+
+    if _dialect() == "mysql":
+        columns = ", ".join(f"t.{c}" for c in source.columns)
+        match = f"MATCH({columns}) AGAINST (:q IN NATURAL LANGUAGE MODE)"
+        rows = db.session.execute(text(
+            f"SELECT t.id, {match} AS score, {columns} FROM {source.table} t "
+            f"WHERE {match}{condition} ORDER BY score DESC, t.id DESC LIMIT :limit OFFSET :offset"
+        ), {"q": " ".join(words), "limit": limit, "offset": offset}).all()
+        return [(row[0], float(row[1]), _render(_make_snippet(row[2:], words))) for row in rows]
+
+    fts = _fts_table(source)
+    rows = db.session.execute(text(
+        f"SELECT {fts}.rowid, -bm25({fts}) AS score, snippet({fts}, -1, :start, :end, '…', {SNIPPET_TOKENS}) "
+        f"FROM {fts} JOIN {source.table} t ON t.id = {fts}.rowid "
+        f"WHERE {fts} MATCH :q{condition} ORDER BY bm25({fts}), {fts}.rowid DESC LIMIT :limit OFFSET :offset"
+    ), {"q": _fts5_match(words), "start": _HIT_START, "end": _HIT_END, "limit": limit, "offset": offset}).all()
+    return [(row[0], float(row[1]), _render(row[2])) for row in rows]
+
+
+def _sqlite_ddl(source):
+    fts = _fts_table(source)
+    cols = ", ".join(source.columns)
+    new_values = ", ".join(f"new.{c}" for c in source.columns)
+    old_values = ", ".join(f"old.{c}" for c in source.columns)
+    delete_old = f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values});"
+    insert_new = f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values});"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({cols}, content='{source.table}', "
+        f"content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {source.table} BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {source.table} BEGIN {delete_old} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {source.table} "
+        f"BEGIN {delete_old} {insert_new} END",
+    ]
+
+
+def _mysql_has_index(connection, source):
+    return connection.execute(
+        text(f"SHOW INDEX FROM {source.table} WHERE Key_name = :name"), {"name": _fulltext_index(source)}
+    ).first() is not None
+
+
+def init_search(rebuild=False):
+    """Create missing search indexes (backfilling new ones); rebuild=True re-indexes everything."""
+    if not available():
+        logger.warning("Full-text search unavailable on %s; searches fall back to LIKE", _dialect())
+        return
+
+    with db.engine.begin() as connection:
+        for source in SOURCES.values():
+            if _dialect() == "mysql":
+                exists = _mysql_has_index(connection, source)
+                if exists and rebuild:
+                    connection.execute(text(f"ALTER TABLE {source.table} DROP INDEX {_fulltext_index(source)}"))
+                if rebuild or not exists:
+                    connection.execute(text(
+                        f"ALTER TABLE {source.table} ADD FULLTEXT INDEX {_fulltext_index(source)} "
+                        f"({', '.join(source.columns)})"
+                    ))
+                    logger.info("Built FULLTEXT index for %s", source.table)
+                continue
+
+            fts = _fts_table(source)
+            exists = connection.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": fts}
+            ).first() is not None
+            for statement in _sqlite_ddl(source):
+                connection.execute(text(statement))
+            if rebuild or not exists:
+                connection.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+                logger.info("Built FTS5 index for %s", source.table)
+
+
+def reindex():
+    init_search(rebuild=True)
@@ -0,0 +1,180 @@
+# model/seeding.py
+"""
+Versioned schema creation and seeding.
+
+The seed manifest (SEEDS in main.py) is an ordered list of Seed steps. Each
+step's version is a content hash: the source of the modules that define its
+data, or for the schema step the DDL of every model. SeedVersions stores the
+hash each step last ran with.
+
+At boot, check_seeds() is one SELECT on SeedVersions. When every hash
+matches, nothing else touches the database. Otherwise run_seeds() runs the
+out-of-date steps under a cross-process lock, so a single leader does the
+work while other gunicorn workers wait and then find it done:
+  - `flask custom seed` runs it explicitly (--force reruns every step);
+  - DB_SEED_ON_BOOT=0 makes boot only log what is out of date.
+
+The schema step runs db.create_all(), which adds missing tables only;
+changes to existing tables go through the Alembic migrations, which the
+next step applies (`flask db upgrade`) whenever migrations/ changes.
+"""
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime
+import hashlib
+import inspect
+import logging
+import os
+import time
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from __init__ import app, db
+
+try:
+    import fcntl
+except ImportError:  # Windows: no lock, run seeds from one process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_LOCK_NAME = "app_seed"
+
+# run: callable doing the step; sources: modules or functions whose source files hold
+# the step's data, or directories of .py files (e.g. the Alembic migrations); None for
+# a step versioned by the model schema
+Seed = namedtuple("Seed", "name run sources")
+
+
+class SeedVersion(db.Model):
+    """Content hash each seed step last ran with"""
+    __tablename__ = "SeedVersions"
+
+    name = db.Column(db.String(64), primary_key=True)
+    content_hash = db.Column(db.String(64), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+def schema_hash():
+    """Hash of the CREATE TABLE / CREATE INDEX statements for every model"""
+    digest = hashlib.sha256()
+    for table in db.metadata.sorted_tables:
+        digest.update(str(CreateTable(table).compile(dialect=db.engine.dialect)).encode())
+        for index in sorted(table.indexes, key=lambda i: i.name or ""):
+            digest.update(str(CreateIndex(index).compile(dialect=db.engine.dialect)).encode())
+    return digest.hexdigest()
+
+
+def _source_files(source):
+    if not isinstance(source, str):
+        return [inspect.getsourcefile(source)]
+    return sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(source)
+        for name in names if name.endswith(".py")
+    )
+
+
+def content_hash(seed):
+    if seed.sources is None:
+        return schema_hash()
+    digest = hashlib.sha256()
+    for source in seed.sources:
+        for path in _source_files(source):
+            digest.update(os.path.basename(path).encode())
+            with open(path, "rb") as data:
+                digest.update(data.read())
+    return digest.hexdigest()
+
+
+def manifest(seeds):
+    """seed name -> current content hash"""
+    return {seed.name: content_hash(seed) for seed in seeds}
+
+
+def _stored():
+    """seed name -> hash it last ran with; empty before the first run"""
+    try:
+        return dict(db.session.execute(db.select(SeedVersion.name, SeedVersion.content_hash)).all())
+    except SQLAlchemyError:
+        # No SeedVersions table yet
+        db.session.rollback()
+        return {}
+
+
+def check_seeds(seeds):
+    """Names of the steps whose data changed since they last ran, in manifest order"""
+    stored = _stored()
+    return [name for name, digest in manifest(seeds).items() if stored.get(name) != digest]
+
+
+@contextmanager
+def _leader_lock():
+    """Held by one process at a time (MySQL: GET_LOCK, SQLite: a file in instance/); others wait"""
+    timeout = int(app.config.get("DB_SEED_LOCK_TIMEOUT") or 300)
+    if db.engine.dialect.name == "mysql":
+        with db.engine.connect() as connection:
+            if connection.execute(text("SELECT GET_LOCK(:name, :timeout)"),
+                                  {"name": _LOCK_NAME, "timeout": timeout}).scalar() != 1:
+                raise TimeoutError(f"Timed out waiting {timeout}s for the seed lock")
+            try:
+                yield
+            finally:
+                connection.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": _LOCK_NAME})
+        return
+
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(app.instance_path, exist_ok=True)
+    with open(os.path.join(app.instance_path, f"{_LOCK_NAME}.lock"), "a") as lock_file:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Timed out waiting {timeout}s for the seed lock")
+                time.sleep(0.2)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def run_seeds(seeds, force=False):
+    """
+    Run the out-of-date steps (every step with force) in manifest order,
+    recording each one's hash as it finishes. Returns the names run.
+    """
+    with app.app_context(), _leader_lock():
+        # Re-read under the lock: the previous holder may have just done the work
+        stored = _stored()
+        ran = []
+        for seed in seeds:
+            digest = content_hash(seed)
+            if not force and stored.get(seed.name) == digest:
+                continue
+            started = time.monotonic()
+            seed.run()
+            db.session.merge(SeedVersion(name=seed.name, content_hash=digest, applied_at=datetime.utcnow()))
+            db.session.commit()
+            logger.info("Seed step %s done in %.2fs", seed.name, time.monotonic() - started)
+            ran.append(seed.name)
+        return ran
+
+
+def seed_on_boot(seeds):
+    """Boot-time entry point: one version check, then seed only if needed and allowed"""
+    with app.app_context():
+        pending = check_seeds(seeds)
+    if not pending:
+        logger.info("Database schema and seed data are current")
+        return []
+    if not app.config.get("DB_SEED_ON_BOOT"):
+        logger.warning("Seed steps out of date: %s; run `flask custom seed`", ", ".join(pending))
+        return []
+    return run_seeds(seeds)
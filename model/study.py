@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, Integer, ForeignKey
+from sqlalchemy import Column, String, Boolean, Integer, ForeignKey, case, func
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 import json
@@ -10,6 +10,10 @@ from model.user import User
 
 class Study(db.Model):
     __tablename__ = 'study'
+    # Per-user lookups and the per-topic stats GROUP BY
+    __table_args__ = (
+        db.Index('ix_study_user_topic', 'user_id', 'topic'),
+    )
 
     # Define the study tracker table schema
     id = Column(Integer, primary_key=True)
@@ -74,6 +78,36 @@ class Study(db.Model):
     def __repr__(self):
         return f'Study: {self.topic} - {self.subtopic}'
 
+    # Progress statistics in one GROUP BY (user_id=None covers every record)
+    @staticmethod
+    def stats(user_id=None):
+        query = db.session.query(
+            Study.topic,
+            func.count(Study.id),
+            func.sum(case((Study.studied == True, 1), else_=0))  # noqa: E712
+        )
+        if user_id is not None:
+            query = query.filter(Study.user_id == user_id)
+
+        topic_stats = {}
+        total_count = completed_count = 0
+        for topic, topic_total, topic_completed in query.group_by(Study.topic).all():
+            topic_completed = int(topic_completed or 0)
+            total_count += topic_total
+            completed_count += topic_completed
+            topic_stats[topic] = {
+                'total': topic_total,
+                'completed': topic_completed,
+                'percentage': (topic_completed / topic_total * 100) if topic_total > 0 else 0
+            }
+
+        return {
+            'total_topics': total_count,
+            'completed_topics': completed_count,
+            'completion_percentage': (completed_count / total_count * 100) if total_count > 0 else 0,
+            'topic_stats': topic_stats
+        }
+
 
 # Function to initialize sample study data
 def initStudies():
@@ -3,7 +3,7 @@ from flask import current_app
 from flask_login import UserMixin
 from datetime import date
 from sqlalchemy.exc import IntegrityError
-from werkzeug.security import generate_password_hash, check_password_hash
+from model.passwords import hash_password, check_password, needs_rehash, is_password_hash
 import os
 import json
 
@@ -267,17 +267,23 @@ class User(db.Model, UserMixin):
     # set password, this is conventional setter with business logic
     def set_password(self, password):
         """Set password: hash if not already hashed, else set directly."""
-        if password and password.startswith("pbkdf2:sha256:"):
+        if is_password_hash(password):
             # Already hashed, set directly
             self._password = password
         else:
-            # Not hashed, hash it
-            self._password = generate_password_hash(password, "pbkdf2:sha256", salt_length=10)            
+            # Not hashed, hash it (method and cost from PASSWORD_HASH_METHOD)
+            self._password = hash_password(password)
 
     # check password parameter versus stored/encrypted password
     def is_password(self, password):
-        """Check against hashed password."""
-        result = check_password_hash(self._password, password)
+        """Check against hashed password, upgrading the hash if the hash settings changed."""
+        result = check_password(self._password, password)
+        if result and needs_rehash(self._password):
+            self._password = hash_password(password)
+            try:
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
         return result
 
     # output content using str(object) in human readable form, uses getter
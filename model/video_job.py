@@ -0,0 +1,57 @@
+from datetime import datetime
+import hashlib
+
+from __init__ import app, db
+
+
+def prompt_key(prompt: str, model: str = "") -> str:
+    """Stable key used to collapse duplicate video prompts onto one job."""
+    normalized = " ".join((prompt or "").split()).lower()
+    return hashlib.sha256(f"{model or ''}\n{normalized}".encode("utf-8")).hexdigest()
+
+
+class VideoJob(db.Model):
+    """A Pika video generation request tracked outside the request thread."""
+    __tablename__ = "VideoJobs"
+
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_READY = "ready"
+    STATUS_FAILED = "failed"
+
+    id = db.Column(db.Integer, primary_key=True)
+    prompt_hash = db.Column(db.String(64), unique=True, nullable=False, index=True)
+    prompt = db.Column(db.Text, nullable=False)
+    model = db.Column(db.String(80), nullable=True)
+
+    status = db.Column(db.String(16), default=STATUS_QUEUED, nullable=False, index=True)
+    provider_request_id = db.Column(db.String(128), nullable=True)
+    status_url = db.Column(db.String(512), nullable=True)
+    video_url = db.Column(db.String(1024), nullable=True)
+    error = db.Column(db.String(255), nullable=True)
+
+    polls = db.Column(db.Integer, default=0, nullable=False)
+    next_poll_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    @property
+    def is_done(self):
+        return self.status in (self.STATUS_READY, self.STATUS_FAILED)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "video_url": self.video_url,
+            "provider_request_id": self.provider_request_id,
+            "error": self.error,
+            "polls": self.polls,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+
+def init_video_jobs():
+    with app.app_context():
+        db.create_all()
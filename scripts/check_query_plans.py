@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Check that the hot lookups use an index.
+
+Runs EXPLAIN QUERY PLAN (SQLite) against the main per-user / per-player
+query shapes and fails if any of them scans its table instead of searching
+an index. Run it after `flask db upgrade`, or after adding a query shape
+that should be indexed.
+
+Usage, from the root of the project:
+> scripts/check_query_plans.py
+
+Exits 1 and lists the offending plans when a query falls back to a scan.
+"""
+import re
+import sys
+import os
+
+# Add the directory containing main.py to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from main import app, db
+
+# name -> query shape, with the same filters and ordering the API uses
+QUERIES = {
+    "user badges": 'SELECT * FROM "UserBadge" WHERE user_id = 1 ORDER BY _date_earned',
+    "player badges": 'SELECT * FROM "PlayerBadges" WHERE player_id = 1 ORDER BY timestamp',
+    "player badge lookup": 'SELECT * FROM "PlayerBadges" WHERE player_id = 1 AND badge_id = 1',
+    "debug badges earned": 'SELECT * FROM "DebugBadgeEarned" WHERE player_id = 1 ORDER BY timestamp',
+    "debug badge lookup": 'SELECT * FROM "DebugBadgeEarned" WHERE player_id = 1 AND badge_id = 1',
+    "hint usage": 'SELECT * FROM "DebugHintUsage" WHERE player_id = 1 AND level = \'x\' AND challenge_id = 1',
+    "latest hint usage": 'SELECT * FROM "DebugHintUsage" WHERE player_id = 1 AND level = \'x\' '
+                         'ORDER BY updated_at DESC LIMIT 1',
+    "microblog feed": "SELECT * FROM microblogs ORDER BY _timestamp DESC, id DESC LIMIT 21",
+    "microblog topic feed": "SELECT * FROM microblogs WHERE _topic_id = 1 ORDER BY _timestamp DESC, id DESC LIMIT 21",
+    "microblog user feed": "SELECT * FROM microblogs WHERE _user_id = 1 ORDER BY _timestamp DESC, id DESC LIMIT 21",
+    "microblog replies": "SELECT * FROM microblog_replies WHERE microblog_id = 1 ORDER BY created_at, id LIMIT 21",
+    "thread page": "SELECT * FROM posts WHERE _page_url = 'x' AND _parent_id IS NULL "
+                   "ORDER BY _timestamp DESC, id DESC LIMIT 51",
+    "thread replies": "SELECT * FROM posts WHERE _parent_id IN (1, 2, 3) ORDER BY _timestamp",
+    "study by user": "SELECT * FROM study WHERE user_id = 1",
+    "study stats": "SELECT topic, count(id) FROM study WHERE user_id = 1 GROUP BY topic",
+    "feedback by user": "SELECT * FROM feedbacks WHERE github_username = 'x' ORDER BY created_at DESC",
+    "progress by user": 'SELECT * FROM "Progress" WHERE user_id = 1',
+    "completed modules": 'SELECT _sector_id, _module_id FROM "ProgressModules" WHERE user_id = 1',
+}
+
+# "SCAN t" without "USING ... INDEX" reads the whole table
+_FULL_SCAN = re.compile(r"^SCAN (\S+)(?!.*USING (COVERING )?INDEX)")
+
+
+def check():
+    failures = []
+    with db.engine.connect() as connection:
+        for name, query in QUERIES.items():
+            plan = [row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {query}")]
+            scans = [step for step in plan if _FULL_SCAN.match(step)]
+            status = "FULL SCAN" if scans else "ok"
+            print(f"{status:9} {name}: {' / '.join(plan)}")
+            if scans:
+                failures.append(name)
+    return failures
+
+
+def main():
+    with app.app_context():
+        if db.engine.dialect.name != "sqlite":
+            print("EXPLAIN QUERY PLAN check only runs on SQLite")
+            return 0
+        failures = check()
+    if failures:
+        print(f"\n{len(failures)} query shape(s) fall back to a full scan: {', '.join(failures)}")
+        return 1
+    print(f"\nAll {len(QUERIES)} query shapes use an index")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+
+""" llm_stub.py
+Local stand-in for the paid AI providers used by the backend, for load tests.
+
+Serves OpenAI-compatible chat completions (also used for DeepSeek and Groq),
+OpenAI image generation, and the Pika submit/status pair. Every route sleeps
+for a latency drawn from a configurable distribution and fails at a
+configurable rate, so worker saturation and timeouts can be tuned offline.
+
+Usage: Run from the root of the project:
+> scripts/llm_stub.py --port 8400 --latency lognormal:0.0,0.5 --error-rate 0.05
+
+Per-provider overrides (repeatable), with an optional error rate after "@":
+> scripts/llm_stub.py --provider deepseek=uniform:2,6@0.2 --provider pika=fixed:0.1
+
+Latency specs:
+  fixed:S            always S seconds
+  uniform:A,B        uniformly between A and B seconds
+  normal:MEAN,SD     normal, clipped at 0
+  lognormal:MU,SIGMA exp(N(MU, SIGMA)) seconds, a long-tailed upstream
+
+Then start the backend pointed at the stub (the printed exports do this):
+> DEEPSEEK_SERVER=http://localhost:8400/deepseek/v1/chat/completions ... python main.py
+
+Chat requests with "stream": true get server-sent events chunks like the real APIs.
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import uuid
+
+from flask import Flask, Response, jsonify, request
+
+PROVIDERS = ("openai", "deepseek", "groq", "pika")
+
+stub = Flask(__name__)
+settings = {
+    "default": {"latency": ("fixed", [0.0]), "error_rate": 0.0},
+    "error_codes": [500, 503, 429],
+    "video_ready_after": 5.0,
+}
+pika_jobs = {}
+pika_lock = threading.Lock()
+
+
+def parse_latency(spec: str):
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v.strip()] if args else []
+    expected = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+    if kind not in expected or len(values) != expected[kind]:
+        raise argparse.ArgumentTypeError(f"Bad latency spec: {spec}")
+    return kind, values
+
+
+def sample_latency(latency) -> float:
+    kind, values = latency
+    if kind == "fixed":
+        return values[0]
+    if kind == "uniform":
+        return random.uniform(values[0], values[1])
+    if kind == "normal":
+        return max(0.0, random.gauss(values[0], values[1]))
+    return math.exp(random.gauss(values[0], values[1]))
+
+
+def profile(provider: str) -> dict:
+    return settings.get(provider) or settings["default"]
+
+
+def simulate(provider: str):
+    """Sleep for a sampled latency; return an error response or None."""
+    prof = profile(provider)
+    time.sleep(sample_latency(prof["latency"]))
+    if random.random() < prof["error_rate"]:
+        code = random.choice(settings["error_codes"])
+        return jsonify({"error": {"message": f"stub {provider} error", "code": code}}), code
+    return None
+
+
+def canned_reply(messages: list) -> str:
+    """Pick a reply whose shape matches what the calling code parses."""
+    prompt = " ".join(str(m.get("content") or "") for m in messages if isinstance(m, dict))
+    if "JSON array of strings" in prompt:
+        return json.dumps([
+            "Break the task into small steps.",
+            "Trace the loop by hand with a tiny input.",
+            "Check the condition at the boundary values."
+        ])
+    if "\"verdict\"" in prompt:
+        verdict = random.choice(["Correct", "Incorrect"])
+        steps = [] if verdict == "Correct" else ["Re-read the task.", "Loop once per action.", "Output the result."]
+        return json.dumps({"verdict": verdict, "explanation": verdict, "steps": steps})
+    if "\"ui_steps\"" in prompt:
+        steps = ["Gather the actions.", "Loop once per action.", "Decide with if/else.", "Update the result.", "Output it."]
+        return json.dumps({
+            "title": "Walkthrough",
+            "steps": steps,
+            "ui_steps": ["Type your answer.", "Press Check Answer."],
+            "video": {"title": "Walkthrough Video", "scenes": [
+                {"title": f"Step {i + 1}", "narration": s, "on_screen": s} for i, s in enumerate(steps)
+            ]}
+        })
+    return "This is a stub reply. Try breaking the problem into smaller steps! 😊"
+
+
+def completion_body(model: str, content: str) -> dict:
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": len(content.split()), "total_tokens": len(content.split())},
+    }
+
+
+def stream_body(model: str, content: str):
+    words = content.split(" ")
+    for i, word in enumerate(words):
+        chunk = {
+            "object": "chat.completion.chunk",
+            "model": model,
+            "choices": [{"index": 0, "delta": {"content": word + (" " if i < len(words) - 1 else "")}}],
+        }
+        yield f"data: {json.dumps(chunk)}\n\n"
+        time.sleep(0.01)
+    yield "data: [DONE]\n\n"
+
+
+@stub.route("/<provider>/v1/chat/completions", methods=["POST"])
+@stub.route("/<provider>/openai/v1/chat/completions", methods=["POST"])
+def chat_completions(provider):
+    if provider not in PROVIDERS:
+        return jsonify({"error": {"message": "unknown provider"}}), 404
+    failure = simulate(provider)
+    if failure:
+        return failure
+
+    body = request.get_json(silent=True) or {}
+    model = body.get("model") or "stub-model"
+    content = canned_reply(body.get("messages") or [])
+    if body.get("stream"):
+        return Response(stream_body(model, content), mimetype="text/event-stream")
+    return jsonify(completion_body(model, content))
+
+
+@stub.route("/openai/v1/images/generations", methods=["POST"])
+def image_generations():
+    failure = simulate("openai")
+    if failure:
+        return failure
+    # 1x1 transparent PNG
+    pixel = "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII="
+    return jsonify({"data": [{"b64_json": pixel}]})
+
+
+@stub.route("/pika/generate", methods=["POST"])
+def pika_generate():
+    failure = simulate("pika")
+    if failure:
+        return failure
+    job_id = uuid.uuid4().hex
+    with pika_lock:
+        pika_jobs[job_id] = time.time() + settings["video_ready_after"]
+    return jsonify({"id": job_id, "status": "queued"})
+
+
+@stub.route("/pika/status/<job_id>", methods=["GET"])
+def pika_status(job_id):
+    failure = simulate("pika")
+    if failure:
+        return failure
+    with pika_lock:
+        ready_at = pika_jobs.get(job_id)
+    if ready_at is None:
+        return jsonify({"error": "not found"}), 404
+    if time.time() < ready_at:
+        return jsonify({"id": job_id, "status": "processing"})
+    return jsonify({"id": job_id, "status": "finished", "video": {"url": f"http://localhost/stub/{job_id}.mp4"}})
+
+
+@stub.route("/health", methods=["GET"])
+def health():
+    return jsonify({"ok": True, "settings": {k: str(v) for k, v in settings.items()}})
+
+
+def print_exports(port: int):
+    base = f"http://localhost:{port}"
+    print("# Point the backend at this stub:")
+    print(f"export OPENAI_SERVER={base}/openai/v1/chat/completions")
+    print(f"export OPENAI_IMAGE_SERVER={base}/openai/v1/images/generations")
+    print(f"export DEEPSEEK_SERVER={base}/deepseek/v1/chat/completions")
+    print(f"export GROQ_SERVER={base}/groq/openai/v1/chat/completions")
+    print(f"export PIKA_SERVER={base}/pika/generate")
+    print(f"export PIKA_STATUS_SERVER={base}/pika/status")
+    print("export OPENAI_API_KEY=stub DEEPSEEK_API_KEY=stub GROQ_API_KEY=stub PIKA_API_KEY=stub")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for OpenAI, DeepSeek, Groq and Pika.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8400)
+    parser.add_argument("--latency", type=parse_latency, default=parse_latency("fixed:0.2"),
+                        help="default latency spec, e.g. lognormal:0.0,0.5")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls that fail (0-1)")
+    parser.add_argument("--error-codes", default="500,503,429", help="status codes used for failures")
+    parser.add_argument("--provider", action="append", default=[],
+                        help="override for one provider: NAME=SPEC[@ERROR_RATE]")
+    parser.add_argument("--video-ready-after", type=float, default=5.0,
+                        help="seconds before a Pika job reports a video URL")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    settings["default"] = {"latency": args.latency, "error_rate": args.error_rate}
+    settings["error_codes"] = [int(code) for code in args.error_codes.split(",") if code.strip()]
+    settings["video_ready_after"] = args.video_ready_after
+    for override in args.provider:
+        name, _, rest = override.partition("=")
+        spec, _, rate = rest.partition("@")
+        if name not in PROVIDERS:
+            parser.error(f"Unknown provider '{name}', expected one of {', '.join(PROVIDERS)}")
+        settings[name] = {
+            "latency": parse_latency(spec),
+            "error_rate": float(rate) if rate else args.error_rate,
+        }
+
+    print_exports(args.port)
+    stub.run(host=args.host, port=args.port, threaded=True, debug=False, use_reloader=False)
+
+
+if __name__ == "__main__":
+    main()
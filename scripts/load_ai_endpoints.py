@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+""" load_ai_endpoints.py
+Load profile for the AI-backed endpoints, meant to run against the backend
+while it is pointed at scripts/llm_stub.py (so no real provider is billed).
+
+Exercises, with a weighted mix:
+  - POST /api/robop/ai_chat          (DeepSeek)
+  - POST /api/robop/generate_hints   (Groq, unique module keys so the cache is missed)
+  - POST /api/endgame/final-check    (OpenAI grading)
+  - POST /api/endgame/player/<id>/guidance (OpenAI + Pika)
+
+Usage: Run from the root of the project:
+> scripts/llm_stub.py --latency lognormal:0.0,0.6 --error-rate 0.05 &
+> python main.py   # with the exports printed by the stub
+> scripts/load_ai_endpoints.py --base http://localhost:8320 --users 32 --duration 60
+
+Reports throughput, status codes and p50/p95/p99 latency per endpoint.
+"""
+import argparse
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import random
+import threading
+import time
+import uuid
+
+import requests
+
+
+def _ai_chat(state):
+    body = {
+        "sector_id": random.randint(1, 5),
+        "question_num": random.randint(0, 2),
+        "user_message": random.choice(["Can I get a hint?", "Why does my loop stop early?", "What is abstraction?"]),
+    }
+    if state.get("conversation_id"):
+        body["conversation_id"] = state["conversation_id"]
+    return "POST", "/api/robop/ai_chat", body
+
+
+def _generate_hints(state):
+    return "POST", "/api/robop/generate_hints", {
+        "module_key": f"load_{uuid.uuid4().hex[:12]}",
+        "question_text": "Write pseudocode that displays the largest number in a list.",
+    }
+
+
+def _final_check(state):
+    return "POST", "/api/endgame/final-check", {
+        "answer": random.choice([
+            "Loop once per action and update the result, then output it.",
+            "Gather every action in order. Create a loop that runs once per action.",
+            "I am not sure.",
+        ])
+    }
+
+
+def _guidance(state):
+    return "POST", f"/api/endgame/player/{state['player_id']}/guidance", {
+        "answer": "I loop over the actions but my result is wrong."
+    }
+
+
+# (name, weight, request builder) - builders return (method, path, json body)
+PROFILE = [
+    ("ai_chat", 5, _ai_chat),
+    ("generate_hints", 2, _generate_hints),
+    ("final_check", 3, _final_check),
+    ("guidance", 1, _guidance),
+]
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.codes = defaultdict(lambda: defaultdict(int))
+
+    def add(self, name, latency, code):
+        with self.lock:
+            self.latencies[name].append(latency)
+            self.codes[name][code] += 1
+
+    @staticmethod
+    def _pct(values, pct):
+        if not values:
+            return 0.0
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+    def report(self, elapsed):
+        print(f"\n{'endpoint':<16}{'reqs':>7}{'rps':>8}{'p50':>8}{'p95':>8}{'p99':>8}  status codes")
+        for name, _, _ in PROFILE:
+            values = self.latencies.get(name, [])
+            codes = ", ".join(f"{code}:{count}" for code, count in sorted(self.codes[name].items(), key=str))
+            print(
+                f"{name:<16}{len(values):>7}{len(values) / elapsed:>8.1f}"
+                f"{self._pct(values, 0.50):>8.2f}{self._pct(values, 0.95):>8.2f}{self._pct(values, 0.99):>8.2f}  {codes}"
+            )
+
+
+def user_loop(base, deadline, stats, think_time, timeout, player_id):
+    session = requests.Session()
+    state = {"player_id": player_id, "conversation_id": None}
+    names = [name for name, _, _ in PROFILE]
+    weights = [weight for _, weight, _ in PROFILE]
+    builders = {name: builder for name, _, builder in PROFILE}
+
+    while time.monotonic() < deadline:
+        name = random.choices(names, weights=weights)[0]
+        method, path, body = builders[name](state)
+        started = time.monotonic()
+        try:
+            response = session.request(method, base + path, json=body, timeout=timeout)
+            code = response.status_code
+            if name == "ai_chat" and code == 200:
+                state["conversation_id"] = (response.json() or {}).get("conversation_id")
+        except requests.Timeout:
+            code = "timeout"
+        except requests.RequestException:
+            code = "conn_error"
+        stats.add(name, time.monotonic() - started, code)
+        if think_time:
+            time.sleep(random.uniform(0, think_time))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load profile for the AI endpoints.")
+    parser.add_argument("--base", default="http://localhost:8320", help="backend base URL")
+    parser.add_argument("--users", type=int, default=16, help="concurrent simulated users")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds to run")
+    parser.add_argument("--think-time", type=float, default=0.5, help="max random pause between requests")
+    parser.add_argument("--timeout", type=float, default=60.0, help="client-side request timeout")
+    parser.add_argument("--player-base", type=int, default=900000, help="first endgame player id to use")
+    args = parser.parse_args()
+
+    stats = Stats()
+    base = args.base.rstrip("/")
+    started = time.monotonic()
+    deadline = started + args.duration
+    print(f"Running {args.users} users for {args.duration:.0f}s against {base} ...")
+
+    with ThreadPoolExecutor(max_workers=args.users) as pool:
+        for i in range(args.users):
+            pool.submit(user_loop, base, deadline, stats, args.think_time, args.timeout, args.player_base + i)
+
+    stats.report(time.monotonic() - started)
+
+
+if __name__ == "__main__":
+    main()
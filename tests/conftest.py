@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Import app modules the way main.py does, from the root of the project
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -0,0 +1,74 @@
+"""Token bucket refill and denial, and limit parsing."""
+import pytest
+
+from api import rate_limit
+from api.rate_limit import TokenBucketStore, parse_limit
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = {"t": 1_000_000.0}
+    monkeypatch.setattr(rate_limit.time, "time", lambda: now["t"])
+    return now
+
+
+@pytest.fixture
+def store(tmp_path):
+    return TokenBucketStore(str(tmp_path / "buckets.db"))
+
+
+def test_bucket_denies_once_empty(clock, store):
+    for left in (2, 1, 0):
+        allowed, tokens, wait = store.take("k", capacity=3, refill_per_second=1.0)
+        assert allowed
+        assert tokens == pytest.approx(left)
+
+    allowed, tokens, wait = store.take("k", capacity=3, refill_per_second=1.0)
+    assert not allowed
+    assert wait == pytest.approx(1.0)
+
+
+def test_bucket_refills_over_time(clock, store):
+    for _ in range(3):
+        store.take("k", capacity=3, refill_per_second=0.5)
+
+    clock["t"] += 1
+    allowed, _, wait = store.take("k", capacity=3, refill_per_second=0.5)
+    assert not allowed
+    assert wait == pytest.approx(1.0)
+
+    clock["t"] += 1
+    allowed, tokens, _ = store.take("k", capacity=3, refill_per_second=0.5)
+    assert allowed
+    assert tokens == pytest.approx(0.0)
+
+
+def test_bucket_refill_is_capped(clock, store):
+    store.take("k", capacity=3, refill_per_second=1.0)
+    clock["t"] += 3600
+    _, tokens, _ = store.take("k", capacity=3, refill_per_second=1.0)
+    assert tokens == pytest.approx(2.0)
+
+
+def test_buckets_are_per_key(clock, store):
+    store.take("a", capacity=1, refill_per_second=0.1)
+    assert not store.take("a", capacity=1, refill_per_second=0.1)[0]
+    assert store.take("b", capacity=1, refill_per_second=0.1)[0]
+
+
+@pytest.mark.parametrize("spec, expected", [
+    ("12/minute", (12, 0.2)),
+    ("5/s", (5, 5.0)),
+    ("36/hr", (36, 0.01)),
+    ("30", (30, 0.5)),
+])
+def test_parse_limit(spec, expected):
+    capacity, refill = parse_limit(spec)
+    assert capacity == expected[0]
+    assert refill == pytest.approx(expected[1])
+
+
+@pytest.mark.parametrize("spec", ["12/fortnight", "many/minute", ""])
+def test_parse_limit_rejects_bad_specs(spec):
+    with pytest.raises(ValueError):
+        parse_limit(spec)
@@ -0,0 +1,131 @@
+"""CircuitBreaker state transitions and ConcurrencyGate queueing."""
+import threading
+import time
+
+import pytest
+
+from api import upstream
+from api.upstream import (
+    STATE_CLOSED, STATE_HALF_OPEN, STATE_OPEN,
+    CircuitBreaker, ConcurrencyGate, ProviderBusyError,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(upstream.time, "monotonic", clock)
+    return clock
+
+
+def _breaker():
+    return CircuitBreaker("test", window_seconds=60, min_calls=4, error_rate=0.5,
+                          slow_call_seconds=5, slow_call_rate=0.5, cooldown_seconds=30)
+
+
+def test_breaker_opens_on_errors(clock):
+    breaker = _breaker()
+    for ok in (True, False, True):
+        assert breaker.allow()
+        breaker.record(ok, 0.1)
+    assert breaker.snapshot()["state"] == STATE_CLOSED
+
+    breaker.record(False, 0.1)
+    assert breaker.snapshot()["state"] == STATE_OPEN
+    assert not breaker.allow()
+
+
+def test_breaker_opens_on_slow_calls(clock):
+    breaker = _breaker()
+    for latency in (0.1, 0.1, 6.0, 6.0):
+        breaker.record(True, latency)
+    assert breaker.snapshot()["state"] == STATE_OPEN
+
+
+def test_breaker_half_open_lets_one_trial_through(clock):
+    breaker = _breaker()
+    for _ in range(4):
+        breaker.record(False, 0.1)
+    clock.now += 29
+    assert not breaker.allow()
+
+    clock.now += 1
+    assert breaker.allow()
+    assert breaker.snapshot()["state"] == STATE_HALF_OPEN
+    # Only the one trial call until it reports back
+    assert not breaker.allow()
+
+    breaker.record(True, 0.1)
+    assert breaker.snapshot()["state"] == STATE_CLOSED
+    assert breaker.allow()
+
+
+def test_breaker_failed_trial_reopens(clock):
+    breaker = _breaker()
+    for _ in range(4):
+        breaker.record(False, 0.1)
+    clock.now += 30
+    assert breaker.allow()
+
+    breaker.record(False, 0.1)
+    snapshot = breaker.snapshot()
+    assert snapshot["state"] == STATE_OPEN
+    assert snapshot["times_opened"] == 2
+    assert not breaker.allow()
+
+
+def _wait_for_queue(gate, queued):
+    deadline = time.monotonic() + 2
+    while gate.snapshot()["queued"] < queued:
+        assert time.monotonic() < deadline, "waiter never queued"
+        time.sleep(0.005)
+
+
+def test_gate_serves_waiters_in_arrival_order():
+    gate = ConcurrencyGate("test", max_in_flight=1, max_queue=3, queue_timeout=5)
+    gate.acquire()
+    order = []
+
+    def worker(i):
+        gate.acquire()
+        order.append(i)
+        gate.release()
+
+    threads = []
+    for i in range(3):
+        thread = threading.Thread(target=worker, args=(i,))
+        thread.start()
+        _wait_for_queue(gate, i + 1)
+        threads.append(thread)
+
+    gate.release()
+    for thread in threads:
+        thread.join(timeout=5)
+    assert order == [0, 1, 2]
+    assert gate.snapshot()["in_flight"] == 0
+
+
+def test_gate_rejects_when_queue_is_full():
+    gate = ConcurrencyGate("test", max_in_flight=1, max_queue=0, queue_timeout=5)
+    gate.acquire()
+    with pytest.raises(ProviderBusyError):
+        gate.acquire()
+    assert gate.snapshot()["rejected_queue_full"] == 1
+
+
+def test_gate_times_out_waiting():
+    gate = ConcurrencyGate("test", max_in_flight=1, max_queue=1, queue_timeout=5)
+    gate.acquire()
+    with pytest.raises(ProviderBusyError):
+        gate.acquire(timeout=0.05)
+    snapshot = gate.snapshot()
+    assert snapshot["rejected_timeout"] == 1
+    assert snapshot["queued"] == 0